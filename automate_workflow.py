@@ -1,43 +1,148 @@
 import argparse
-import subprocess
 import sys
 import os
+import glob
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-def run_generate_json(generate_type, file_type, input_file, custom_prompt):
-    """Runs generate_json.py with the specified arguments."""
-    # Build the base command
-    cmd = ['python', 'scripts/generate_json.py', '-g', generate_type, '-f', file_type, '-i', input_file]
-    
-    # If a custom prompt is provided, add it to the command
-    if custom_prompt:
-        cmd.extend(['-c', custom_prompt])
-    
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error running generate_json.py: {e}")
-        sys.exit(1)
+# The stage scripts live in scripts/ and import each other as top-level modules.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+import generate_json
+import tracing
+from batch_api import (
+    BATCH_PROVIDERS, BATCH_STATE_FILE, BATCH_STATUSES_FINISHED, check_batch, collect_batch, load_state,
+    resubmit_batch, submit_batch,
+)
+from disk_cache import sha256_file
+from html_assets import add_asset_arguments, assets_from_args
+from job_output import Job, add_job_arguments, input_stem, job_from_args
+from pipeline import Pipeline
+from question_bank import QUESTION_BANK_FILE, QuestionBank
+from token_budget import load_routing_rules
+from watch_folder import (
+    DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, WATCH_QUEUE_FILE, FileQueue, FolderScanner, create_watcher, try_watch,
+)
+
+SUPPORTED_EXTENSIONS = {".pdf": "pdf", ".pptx": "pptx"}
+# Trace events kept by --watch; the trace written on exit covers the most recent files.
+WATCH_TRACE_EVENTS = 100000
 
-def determine_html_script(generate_type):
-    """Determines which HTML generation script to use based on the generate_type argument."""
-    if generate_type == "test":
-        return "scripts/generate_test_html_from_json.py"
-    elif generate_type == "summary":
-        return "scripts/generate_summary_html_from_json.py"
+def infer_file_type(input_file):
+    """Returns 'pdf' or 'pptx' based on the file extension, or None if unsupported."""
+    return SUPPORTED_EXTENSIONS.get(os.path.splitext(input_file)[1].lower())
+
+def collect_input_files(input_dir, pattern=None):
+    """Lists the PDF/PPTX files in input_dir, optionally filtered by a glob pattern."""
+    if pattern:
+        candidates = glob.glob(os.path.join(input_dir, pattern), recursive=True)
     else:
-        print("Error: Invalid generate_type. Must be 'test' or 'summary'.")
-        sys.exit(1)
+        candidates = [os.path.join(input_dir, name) for name in os.listdir(input_dir)]
+    return sorted(path for path in candidates if os.path.isfile(path) and infer_file_type(path))
 
-def run_html_generation(html_script, json_file, output_file):
-    """Runs the selected HTML generation script with the JSON input and HTML output."""
-    try:
-        subprocess.run(
-            ['python', html_script, '--input-file', json_file, '--output-file', output_file],
-            check=True
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {html_script}: {e}")
-        sys.exit(1)
+def output_basenames(input_files):
+    """Maps each input file to an output base name, disambiguating equal stems by extension."""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in input_files]
+    names = {}
+    for path, stem in zip(input_files, stems):
+        if stems.count(stem) > 1:
+            stem = f"{stem}_{infer_file_type(path)}"
+        names[path] = stem
+    return names
+
+def generate_and_render(pipeline, generate_type, input_file, pages, custom_prompt, output_json, output_file):
+    """Sends the extracted text to the model and renders the HTML as soon as the JSON lands."""
+    with tracing.span("document", file=input_file):
+        pages = pipeline.compact(pages, input_file)
+        data = pipeline.generate(generate_type, pages, custom_prompt, output_json=output_json, source=input_file)
+        pipeline.render(generate_type, data, output_file)
+
+def extract_in_worker(path, **kwargs):
+    """Extracts a file on a worker process; returns (seconds the extraction took, pages, trace events)."""
+    start = time.perf_counter()
+    pages, events = tracing.call_traced(generate_json.extract_pages, infer_file_type(path), path, **kwargs)
+    return time.perf_counter() - start, pages, events
+
+def process_batch(pipeline, generate_type, input_files, custom_prompt, extract_workers, llm_workers, job):
+    """
+    Runs the extract, LLM and render stages for many documents at once.
+    Extraction runs on a process pool; each extracted document is handed to a bounded
+    thread pool that calls the model through the shared pipeline and renders its HTML
+    into the job directory. Returns one result per file.
+    """
+    basenames = output_basenames(input_files)
+    results = {path: {"status": "pending"} for path in input_files}
+
+    def fail(path, stage, error):
+        results[path].update(status="failed", error=f"{stage}: {error}")
+
+    def generate(path, extract_seconds, *args):
+        # A file's time is the work done on it: extraction, generation and rendering,
+        # without the time it spent queued for a worker.
+        start = time.perf_counter()
+        try:
+            generate_and_render(pipeline, generate_type, path, *args)
+        finally:
+            results[path]["elapsed"] = extract_seconds + time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+        extract_futures = {
+            # Files are already extracted in parallel, so each one uses a single process.
+            # The worker's trace events come back with its pages.
+            extract_pool.submit(
+                extract_in_worker, path, use_cache=pipeline.use_cache, workers=1,
+                strip_annotations=pipeline.strip_annotations, ocr_dpi=pipeline.ocr_dpi,
+            ): path
+            for path in input_files
+        }
+        llm_futures = {}
+        for future in as_completed(extract_futures):
+            path = extract_futures[future]
+            try:
+                extract_seconds, pages, events = future.result()
+            except Exception as e:
+                # The worker's timing is lost with the error, so the file gets no time.
+                fail(path, "extract", e)
+                continue
+            tracing.tracer.merge(events)
+            print(f"Extracted {path} ({len(pages)} pages)")
+            output_json = job.path(basenames[path], ".json")
+            output_file = job.path(basenames[path], ".html")
+            results[path]["output"] = output_file
+            llm_future = llm_pool.submit(
+                generate, path, extract_seconds, pages, custom_prompt, output_json, output_file
+            )
+            llm_futures[llm_future] = path
+
+        for future in as_completed(llm_futures):
+            path = llm_futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                fail(path, "generate", e)
+                continue
+            results[path]["status"] = "ok"
+
+    return results
+
+def print_results_table(results):
+    """Prints a per-file success/failure table."""
+    rows = [
+        (path, result["status"], f"{result['elapsed']:.1f}s" if "elapsed" in result else "-",
+         result.get("error") or result.get("output", ""))
+        for path, result in results.items()
+    ]
+    headers = ("File", "Status", "Time", "Output / Error")
+    widths = [max(len(str(row[i])) for row in rows + [headers]) for i in range(3)]
+    line = f"{{:<{widths[0]}}}  {{:<{widths[1]}}}  {{:>{widths[2]}}}  {{}}"
+    print(line.format(*headers))
+    print(line.format(*("-" * w for w in widths), "-" * len(headers[3])))
+    for row in rows:
+        print(line.format(*row))
+    succeeded = sum(1 for result in results.values() if result["status"] == "ok")
+    print(f"\n{succeeded}/{len(results)} files processed successfully.")
 
 def parse_arguments():
     """Parses command-line arguments for the automation script."""
@@ -46,50 +151,441 @@ def parse_arguments():
     parser.add_argument(
         "--generate-type", "-g",
         choices=["test", "summary"],
-        required=True,
         help="Specify whether to generate a 'test' or a 'summary'."
     )
     
     parser.add_argument(
         "--file-type", "-f",
         choices=["pdf", "pptx"],
-        required=True,
-        help="Specify the file type (pdf or pptx)."
+        help="Specify the file type (pdf or pptx). Inferred from the extension if omitted."
     )
 
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group()
+    inputs.add_argument(
         "--input-file", "-i",
-        required=True,
         help="Path to the input PDF or PPTX file."
     )
+    inputs.add_argument(
+        "--input-dir", "-d",
+        help="Process every PDF/PPTX file in this directory concurrently."
+    )
+
+    parser.add_argument(
+        "--pattern", "-p",
+        help="Glob pattern (relative to --input-dir) selecting the files to process, e.g. '**/*.pdf'."
+    )
+
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes used for text extraction: files in parallel in batch mode, "
+             "pages of a large PDF otherwise (default: CPU count)."
+    )
+
+    parser.add_argument(
+        "--strip-annotations",
+        action="store_true",
+        help="Delete PDF annotations and clean each page's contents before extracting its text."
+    )
+
+    parser.add_argument(
+        "--ocr-dpi",
+        type=int,
+        help="OCR PDF pages that have no text layer (scanned pages), rendering them at this DPI, "
+             "e.g. 300. Pages with text are never OCR'd (default: no OCR)."
+    )
+
+    parser.add_argument(
+        "--no-compact",
+        action="store_true",
+        help="Send the extracted text as-is, without removing repeated headers/footers, page "
+             "numbers, extra whitespace and near-duplicate pages."
+    )
+
+    parser.add_argument(
+        "--llm-workers",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent model requests in batch mode (default: 4)."
+    )
     
     parser.add_argument(
         "--custom-prompt", "-c",
         help="Optional custom prompt to override the default prompt instructions."
     )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-extract input files even if their text is already cached."
+    )
+
+    parser.add_argument(
+        "--question-bank",
+        nargs="?",
+        const=QUESTION_BANK_FILE,
+        default=None,
+        help=f"Keep generated exam questions in a local SQLite bank (default path: {QUESTION_BANK_FILE}) "
+             "and assemble exams from it, asking the model only for the questions it lacks."
+    )
+
+    parser.add_argument(
+        "--batch-api",
+        choices=["submit", "status", "collect"],
+        help="Use the provider's batch interface instead of interactive requests: 'submit' writes the "
+             "requests for every file in --input-dir to one JSONL file and submits it, 'status' polls "
+             "the batch once and 'collect' downloads the results and writes the JSON and HTML outputs. "
+             "Progress is kept in --batch-state, so every step can be re-run after an interruption."
+    )
+
+    parser.add_argument(
+        "--batch-provider",
+        choices=sorted(BATCH_PROVIDERS),
+        default="openai",
+        help="Batch interface used by --batch-api submit: 'openai' (the Batch API) or 'local', an "
+             "offline stand-in that answers with canned JSON (default: openai)."
+    )
+
+    parser.add_argument(
+        "--batch-state",
+        default=BATCH_STATE_FILE,
+        help=f"State file of the --batch-api steps (default: {BATCH_STATE_FILE})."
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With --batch-api submit, start a new batch even if the state file holds one that was not collected."
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and process every PDF/PPTX file that appears in --input-dir, each in a job "
+             "directory of its own. Files are queued in --watch-queue, so a restart resumes the queue "
+             "and skips the files already processed."
+    )
+
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="With --watch, seconds a file must stay unchanged before it is queued, so files that are "
+             f"still being copied are not picked up (default: {DEFAULT_DEBOUNCE:g})."
+    )
+
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="With --watch, seconds between scans of --input-dir. inotify wakes the scan earlier on "
+             f"Linux (default: {DEFAULT_POLL_INTERVAL:g})."
+    )
+
+    parser.add_argument(
+        "--no-inotify",
+        action="store_true",
+        help="With --watch, only poll --input-dir, e.g. on network shares where inotify sees no remote changes."
+    )
+
+    parser.add_argument(
+        "--watch-queue",
+        default=WATCH_QUEUE_FILE,
+        help=f"SQLite queue of the files found by --watch (default: {WATCH_QUEUE_FILE})."
+    )
+
+    generate_json.add_llm_arguments(parser)
+    add_asset_arguments(parser)
+    add_job_arguments(parser)
+    tracing.add_trace_arguments(parser)
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.batch_api in ("status", "collect"):
+        return args
+    if not args.generate_type:
+        parser.error("the following arguments are required: --generate-type/-g")
+    if args.batch_api and not args.input_dir:
+        parser.error("--batch-api submit requires --input-dir")
+    if args.watch and (args.batch_api or not args.input_dir):
+        parser.error("--watch requires --input-dir and cannot be combined with --batch-api")
+    if args.watch and args.job_id:
+        parser.error("--watch gives every file a job directory of its own; --job-id cannot be used with it")
+    if not args.input_file and not args.input_dir:
+        parser.error("one of the arguments --input-file/-i --input-dir/-d is required")
+    return args
+
+def pipeline_from_args(args):
+    """Builds the in-process pipeline configured on the command line."""
+    return Pipeline(
+        use_cache=not args.no_cache,
+        response_cache=generate_json.response_cache_from_args(args),
+        api_mode=args.api_mode,
+        stream=not args.no_stream,
+        chunk_tokens=args.chunk_tokens,
+        chunk_workers=args.chunk_workers,
+        extract_workers=args.extract_workers,
+        strip_annotations=args.strip_annotations,
+        ocr_dpi=args.ocr_dpi,
+        compaction=not args.no_compact,
+        routing_rules=load_routing_rules(args.routing_config),
+        on_overflow=args.on_overflow,
+        assets=assets_from_args(args),
+        question_bank=QuestionBank(args.question_bank) if args.question_bank else None,
+        structured_output=not args.no_structured_output,
+        scheduler=generate_json.scheduler_from_args(args),
+        backend=generate_json.backend_from_args(args),
+    )
+
+def main_batch(args):
+    input_files = collect_input_files(args.input_dir, args.pattern)
+    if not input_files:
+        print(f"Error: No PDF or PPTX files found in {args.input_dir}.")
+        sys.exit(1)
+
+    print(f"Processing {len(input_files)} files from {args.input_dir} as {args.generate_type}...")
+    if args.custom_prompt:
+        print(f"Custom prompt provided: {args.custom_prompt}")
+
+    pipeline = pipeline_from_args(args)
+    job = job_from_args(args)
+    results = process_batch(
+        pipeline, args.generate_type, input_files, args.custom_prompt, args.extract_workers, args.llm_workers, job
+    )
+    job.finish(
+        "done" if all(result["status"] == "ok" for result in results.values()) else "failed",
+        generate_type=args.generate_type, results=results,
+    )
+    print_results_table(results)
+    print(pipeline.scheduler.format_metrics())
+    print()
+    print(tracing.tracer.format_summary())
+    tracing.export_from_args(args)
+
+    if any(result["status"] != "ok" for result in results.values()):
+        sys.exit(1)
+
+def extract_documents(args, input_files, job):
+    """
+    Extracts and compacts every input file for a batch submission, with their outputs
+    in the job directory; exits if any of them fails.
+    """
+    pipeline = Pipeline(
+        use_cache=not args.no_cache, strip_annotations=args.strip_annotations, ocr_dpi=args.ocr_dpi,
+        compaction=not args.no_compact,
+    )
+    basenames = output_basenames(input_files)
+    documents = {}
+    with ProcessPoolExecutor(max_workers=args.extract_workers) as extract_pool:
+        extract_futures = {
+            extract_pool.submit(
+                generate_json.extract_pages, infer_file_type(path), path, use_cache=pipeline.use_cache,
+                workers=1, strip_annotations=pipeline.strip_annotations, ocr_dpi=pipeline.ocr_dpi,
+            ): path
+            for path in input_files
+        }
+        for future in as_completed(extract_futures):
+            path = extract_futures[future]
+            try:
+                pages = future.result()
+            except Exception as e:
+                print(f"Error: Could not extract {path}: {e}")
+                sys.exit(1)
+            print(f"Extracted {path} ({len(pages)} pages)")
+            documents[basenames[path]] = {
+                "input_file": path,
+                "pages": pipeline.compact(pages, path),
+                "output_json": job.path(basenames[path], ".json"),
+                "output_file": job.path(basenames[path], ".html"),
+            }
+    return dict(sorted(documents.items()))
+
+def main_batch_api(args):
+    """Runs one --batch-api step against the state file."""
+    state = load_state(args.batch_state)
+    if args.batch_api == "submit":
+        provider = BATCH_PROVIDERS[args.batch_provider]()
+        if state and state["status"] == "prepared" and not args.force:
+            print(f"Resuming the submission prepared in {args.batch_state}...")
+            resubmit_batch(BATCH_PROVIDERS[state["provider"]](), state, args.batch_state)
+            return
+        if state and state["status"] != "collected" and not args.force:
+            print(f"Error: Batch {state['batch_id']} in {args.batch_state} has not been collected yet. "
+                  "Run --batch-api collect first, or use --force to start a new batch.")
+            sys.exit(1)
+        input_files = collect_input_files(args.input_dir, args.pattern)
+        if not input_files:
+            print(f"Error: No PDF or PPTX files found in {args.input_dir}.")
+            sys.exit(1)
+        print(f"Preparing a {args.batch_provider} batch of {len(input_files)} files as {args.generate_type}...")
+        job = job_from_args(args)
+        try:
+            submit_batch(
+                provider, args.generate_type, extract_documents(args, input_files, job), args.batch_state,
+                args.custom_prompt, load_routing_rules(args.routing_config), args.chunk_tokens,
+                not args.no_structured_output, job,
+            )
+        except generate_json.TokenBudgetExceeded as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+
+    if not state or not state.get("batch_id"):
+        print(f"Error: No submitted batch in {args.batch_state}. Run --batch-api submit first.")
+        sys.exit(1)
+    provider = BATCH_PROVIDERS[state["provider"]]()
+    if args.batch_api == "status":
+        check_batch(provider, state, args.batch_state)
+        return
+
+    pipeline = Pipeline(assets=assets_from_args(args))
+    collected = collect_batch(provider, state, pipeline.render, args.batch_state)
+    job = Job(state["job"]["job_id"], state["job"]["output_dir"], create=False) if state.get("job") else None
+    if not collected:
+        if state["status"] in BATCH_STATUSES_FINISHED:
+            failed = [name for name, document in state["documents"].items() if document["status"] == "failed"]
+            if job:
+                job.finish("failed", started=state["submitted"], batch_id=state["batch_id"], failed=failed)
+            print(f"{len(failed)} documents could not be collected: {', '.join(failed)}")
+            sys.exit(1)
+        return
+    if job:
+        job.finish(started=state["submitted"], batch_id=state["batch_id"], generate_type=state["generate_type"])
+    print(f"Collected {len(state['documents'])} documents from batch {state['batch_id']}.")
+
+def process_watched_file(pipeline, extract_pool, queue, file_id, path, args):
+    """Extracts, generates and renders one queued file into a new job directory and records the outcome."""
+    job = Job(output_dir=args.output_dir)
+    output_file = job.path(input_stem(path), ".html")
+    try:
+        pages, events = extract_pool.submit(
+            tracing.call_traced, generate_json.extract_pages, infer_file_type(path), path,
+            use_cache=pipeline.use_cache, workers=1, strip_annotations=pipeline.strip_annotations,
+            ocr_dpi=pipeline.ocr_dpi,
+        ).result()
+        tracing.tracer.merge(events)
+        generate_and_render(
+            pipeline, args.generate_type, path, pages, args.custom_prompt, job.path(input_stem(path), ".json"),
+            output_file,
+        )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        job.finish("failed", generate_type=args.generate_type, input_file=path, error=error)
+        queue.finish(file_id, "failed", job.directory, error)
+        print(f"Failed {path}: {error}")
+        return
+    job.finish(generate_type=args.generate_type, input_file=path)
+    queue.finish(file_id, "done", job.directory)
+    print(f"Done {path}: {output_file}")
+
+def ignore_interrupts():
+    """Leaves stopping to the watcher: extraction workers finish their file instead of failing it."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def main_watch(args):
+    """
+    Watches --input-dir until interrupted. Settled files go into the persistent queue,
+    and a warm pool works through it: one pipeline (model client, caches, scheduler)
+    and one extraction process pool serve every file.
+    """
+    queue = FileQueue(args.watch_queue)
+    recovered = queue.recover()
+    if recovered:
+        print(f"Queued {recovered} files again that were in progress when the watcher last stopped.")
+    pipeline = pipeline_from_args(args)
+    scanner = FolderScanner(lambda: collect_input_files(args.input_dir, args.pattern), args.debounce)
+    watcher = create_watcher(polling=args.no_inotify)
+    unwatched = set()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    # The watcher runs for days: keep the trace of the most recent files only.
+    tracing.tracer.limit(WATCH_TRACE_EVENTS)
+    print(f"Watching {args.input_dir} ({watcher.name}) for files to process as {args.generate_type}; "
+          "Ctrl+C to stop.")
+    running = set()
+    try:
+        with ProcessPoolExecutor(max_workers=args.extract_workers, initializer=ignore_interrupts) as extract_pool, \
+                ThreadPoolExecutor(max_workers=args.llm_workers) as llm_pool:
+            try:
+                while True:
+                    for path in scanner.scan():
+                        try_watch(watcher, os.path.dirname(path), unwatched)
+                        try:
+                            digest = sha256_file(path)
+                        except OSError as e:
+                            # E.g. deleted or made unreadable since the scan; queued once it changes again.
+                            print(f"Skipping {path}: {e}")
+                            continue
+                        if queue.add(path, digest):
+                            print(f"Queued {path}")
+                    while len(running) < args.llm_workers:
+                        claimed = queue.claim()
+                        if claimed is None:
+                            break
+                        running.add(llm_pool.submit(
+                            process_watched_file, pipeline, extract_pool, queue, *claimed, args
+                        ))
+                    for future in [future for future in running if future.done()]:
+                        running.remove(future)
+                        if future.exception():
+                            print(f"Error: {future.exception()}")
+                    try_watch(watcher, args.input_dir, unwatched)
+                    watcher.wait(scanner.timeout(args.poll_interval))
+            except KeyboardInterrupt:
+                # Files not finished yet stay 'running' in the queue and are picked up on the next start.
+                in_progress = sum(not future.done() for future in running)
+                print(f"Stopping: waiting for {in_progress} files in progress (Ctrl+C again to abort).")
+    except KeyboardInterrupt:
+        print("Aborted; the files in progress are queued again on the next start.")
+        os._exit(1)
+    finally:
+        watcher.close()
+    counts = queue.counts()
+    print(", ".join(f"{counts[status]} {status}" for status in sorted(counts)) or "The queue is empty.")
+    tracing.export_from_args(args)
 
 def main():
     args = parse_arguments()
+    if args.batch_api:
+        main_batch_api(args)
+        return
+    if args.watch:
+        main_watch(args)
+        return
+    if args.input_dir:
+        main_batch(args)
+        return
+
     generate_type = args.generate_type
-    file_type = args.file_type
     input_file = args.input_file
+    file_type = args.file_type or infer_file_type(input_file)
     custom_prompt = args.custom_prompt
 
-    # Generate output filenames based on input file and output folder
-    output_json = "output/response.json"
-    output_file = os.path.join("output", os.path.splitext(os.path.basename(input_file))[0] + ".html")
+    if not file_type:
+        print("Error: Could not infer the file type. Use --file-type.")
+        sys.exit(1)
+
+    # Generate output filenames based on input file, in a job directory of their own
+    job = job_from_args(args)
+    output_json = job.path(input_stem(input_file), ".json")
+    output_file = job.path(input_stem(input_file), ".html")
 
     print(f"Processing {input_file} as {generate_type} ({file_type})...")
     if custom_prompt:
         print(f"Custom prompt provided: {custom_prompt}")
     
-    run_generate_json(generate_type, file_type, input_file, custom_prompt)
-    
-    html_script = determine_html_script(generate_type)
-    
-    run_html_generation(html_script, output_json, output_file)
+    try:
+        pipeline_from_args(args).run(generate_type, input_file, file_type, output_file, custom_prompt, output_json=output_json)
+    except Exception as e:
+        job.finish("failed", generate_type=generate_type, input_file=input_file, error=f"{type(e).__name__}: {e}")
+        print(f"Error processing {input_file}: {e}")
+        sys.exit(1)
+    job.finish(generate_type=generate_type, input_file=input_file)
+    tracing.export_from_args(args)
 
     print(f"HTML generation complete. Output saved to {output_file}")
 
@@ -0,0 +1,158 @@
+import random
+import struct
+import zlib
+
+# Synthetic inputs for the benchmarks. The same seed and sizes always give the same
+# corpus, so timings can be compared between releases.
+WORDS = {
+    "en": (
+        "model data learning function value error training network layer gradient vector matrix "
+        "probability class feature sample test kernel margin tree node loss weight input output "
+        "algorithm regression cluster distance optimization parameter accuracy variance bias"
+    ).split(),
+    "he": (
+        "מודל נתונים למידה פונקציה ערך שגיאה אימון רשת שכבה גרדיאנט וקטור מטריצה הסתברות מחלקה "
+        "תכונה דגימה מבחן גרעין מרווח עץ צומת הפסד משקל קלט פלט אלגוריתם רגרסיה אשכול מרחק "
+        "אופטימיזציה פרמטר דיוק שונות הטיה"
+    ).split(),
+}
+LANGUAGES = tuple(WORDS)
+CODE_SNIPPET = "def train(model, data):\n    for x, y in data:\n        model.update(x, y)\n    return model"
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+IMAGE_WIDTH, IMAGE_HEIGHT = 640, 240
+
+
+def sentence(rng, language, words=12):
+    return " ".join(rng.choice(WORDS[language]) for _ in range(words)) + "."
+
+
+def paragraph(rng, language, sentences=5):
+    return " ".join(sentence(rng, language, rng.randint(8, 16)) for _ in range(sentences))
+
+
+def png_bytes(width, height, pixels):
+    """Encodes rows of RGB byte strings as a PNG, without an imaging library."""
+    raw = b"".join(b"\x00" + row for row in pixels)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def text_like_image(rng, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    """
+    Returns a PNG of dark word-shaped blocks on lines over a white background, so OCR
+    does the work of a scanned text image. Every call gives a different image, so
+    no picture is deduplicated or served from the OCR cache.
+    """
+    white, black = b"\xff\xff\xff", b"\x20\x20\x20"
+    rows = [bytearray(white * width) for _ in range(height)]
+    line_height, glyph_height = 30, 14
+    for top in range(16, height - line_height, line_height):
+        x = 16
+        while x < width - 40:
+            word = rng.randint(12, 70)
+            for y in range(top, top + glyph_height):
+                rows[y][x * 3:(x + word) * 3] = black * word
+            x += word + rng.randint(8, 16)
+    return png_bytes(width, height, [bytes(row) for row in rows])
+
+
+def write_pdf(path, pages, language="en", images_per_page=0, seed=0, font_file=None):
+    """
+    Writes a PDF of text pages with images_per_page pictures each. Hebrew text needs
+    a font_file with Hebrew glyphs (e.g. a TTF of the Assistant font); the built-in
+    Helvetica only covers Latin text.
+    """
+    import fitz
+
+    rng = random.Random(seed)
+    font = {"fontname": "body", "fontfile": font_file} if font_file else {"fontname": "helv"}
+    with fitz.open() as doc:
+        for number in range(1, pages + 1):
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            page.insert_text((50, 40), f"{sentence(rng, language, 4)} {number}", fontsize=14, **font)
+            y = 70
+            for _ in range(images_per_page):
+                page.insert_image(fitz.Rect(50, y, 50 + IMAGE_WIDTH / 2, y + IMAGE_HEIGHT / 2),
+                                  stream=text_like_image(rng))
+                y += IMAGE_HEIGHT / 2 + 10
+            lines = [sentence(rng, language, 10) for _ in range(max(0, int((PAGE_HEIGHT - y - 60) // 14)))]
+            page.insert_text((50, y + 14), "\n".join(lines), fontsize=10, **font)
+            page.insert_text((PAGE_WIDTH / 2, PAGE_HEIGHT - 30), str(number), fontsize=9, **font)
+        doc.save(path)
+    return path
+
+
+def write_pptx(path, slides, language="en", images_per_slide=0, seed=0):
+    """Writes a deck of title-and-content slides with images_per_slide pictures each."""
+    import io
+
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    rng = random.Random(seed)
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    for number in range(1, slides + 1):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"{sentence(rng, language, 4)} {number}"
+        body = slide.placeholders[1].text_frame
+        body.text = sentence(rng, language)
+        for _ in range(4):
+            body.add_paragraph().text = sentence(rng, language)
+        for index in range(images_per_slide):
+            slide.shapes.add_picture(
+                io.BytesIO(text_like_image(rng)), Inches(0.5 + 3 * (index % 3)), Inches(5), width=Inches(2.8)
+            )
+    presentation.save(path)
+    return path
+
+
+def summary_json(sections, language="en", seed=0):
+    """
+    Returns a summary response with the given number of sections, cycling through
+    every value shape the renderer handles: paragraphs, numbered text, lists, code
+    and nested sections.
+    """
+    rng = random.Random(seed)
+    data = {}
+    for index in range(sections):
+        title = f"{sentence(rng, language, 3)[:-1]} {index + 1}"
+        shape = index % 5
+        if shape == 0:
+            value = paragraph(rng, language, 8)
+        elif shape == 1:
+            value = " ".join(f"{n}. {sentence(rng, language)}" for n in range(1, 7))
+        elif shape == 2:
+            value = [sentence(rng, language) for _ in range(8)]
+        elif shape == 3:
+            value = CODE_SNIPPET
+        else:
+            value = {
+                sentence(rng, language, 2)[:-1]: paragraph(rng, language, 3),
+                sentence(rng, language, 2)[:-1]: [sentence(rng, language) for _ in range(4)],
+            }
+        data[title] = value
+    return data
+
+
+def exam_json(multiple_choice, open_questions, language="en", seed=0):
+    """Returns an exam response with the given number of questions of each kind."""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(multiple_choice):
+        options = [sentence(rng, language, 6) for _ in range(4)]
+        questions.append({"question": sentence(rng, language, 14), "options": options, "answer": options[0]})
+    return {
+        "exam": {
+            "multiple_choice": questions,
+            "open_questions": [
+                {"question": sentence(rng, language, 14), "answer": paragraph(rng, language, 3)}
+                for _ in range(open_questions)
+            ],
+        }
+    }
@@ -0,0 +1,441 @@
+import argparse
+import contextlib
+import datetime
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+# The stage scripts live in scripts/ and import each other as top-level modules.
+sys.path.insert(0, os.path.join(REPO_DIR, "scripts"))
+
+import corpus
+
+# Bump when the layout of the results file changes.
+RESULTS_VERSION = 1
+STAGES = ("pdf_extract", "pptx_extract", "pptx_ocr", "generation", "summary_html", "test_html")
+
+
+class Skip(Exception):
+    """Raised while setting up a benchmark that cannot run here (e.g. a missing dependency)."""
+
+
+def import_stage(module_name):
+    """Imports a stage module, turning a missing dependency into Skip."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise Skip(f"missing dependency: {e.name or e}")
+
+
+class Corpus:
+    """
+    Writes the synthetic input files on first use, so stages sharing a file generate it
+    once. The fake model server of the generation stage is started the same way and
+    stopped by close().
+    """
+
+    def __init__(self, directory, args):
+        self.directory = directory
+        self.args = args
+        self._files = {}
+        self._server = None
+
+    def llm_url(self):
+        """Starts the fake model server on a free port, with a fixed latency and no streaming delay."""
+        if self._server is None:
+            fake_llm_server = import_stage("fake_llm_server")
+            self._server = fake_llm_server.FakeLLMServer(
+                ("127.0.0.1", 0), latency=self.args.llm_latency, tokens_per_second=0, seed=self.args.seed
+            )
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def pdf(self, language):
+        if ("pdf", language) not in self._files:
+            import_stage("fitz")
+            path = os.path.join(self.directory, f"corpus_{language}.pdf")
+            self._files["pdf", language] = corpus.write_pdf(
+                path, self.args.pages, language, self.args.images_per_page, self.args.seed, self.args.pdf_font
+            )
+        return self._files["pdf", language]
+
+    def pptx(self, language):
+        if ("pptx", language) not in self._files:
+            import_stage("pptx")
+            path = os.path.join(self.directory, f"corpus_{language}.pptx")
+            self._files["pptx", language] = corpus.write_pptx(
+                path, self.args.slides, language, self.args.images_per_slide, self.args.seed
+            )
+        return self._files["pptx", language]
+
+
+def setup_pdf_extract(files, args, language):
+    generate_json = import_stage("generate_json")
+    path = files.pdf(language)
+    return (lambda: generate_json.compress_pdf_to_text(path, workers=args.workers)), args.pages, "pages"
+
+
+def setup_pptx_extract(files, args, language):
+    generate_json = import_stage("generate_json")
+    path = files.pptx(language)
+    return (lambda: generate_json.extract_text_from_pptx(path)), args.slides, "slides"
+
+
+def setup_pptx_ocr(files, args, language):
+    images = args.slides * args.images_per_slide
+    if not images:
+        raise Skip("the decks have no images (--images-per-slide 0)")
+    pptx_to_text = import_stage("pptx_to_text")
+    if not shutil.which("tesseract"):
+        raise Skip("the tesseract binary is not installed")
+    path = files.pptx(language)
+    # The OCR cache is bypassed so every run does the full OCR.
+    return (lambda: pptx_to_text.extract_text_from_pptx(path, workers=args.workers, use_cache=False)), images, "images"
+
+
+def setup_generation(files, args, language):
+    generate_json = import_stage("generate_json")
+    chunking = import_stage("chunking")
+    scheduler = import_stage("scheduler")
+    rng = random.Random(args.seed)
+    pages = [corpus.paragraph(rng, language, 20) for _ in range(args.generation_pages)]
+    with open(os.path.join(REPO_DIR, "test_json_structure.json"), "r", encoding="utf-8") as f:
+        response_structure = json.load(f)
+    params = generate_json.default_prompt_params("test")
+    requests = len(chunking.question_chunks(chunking.split_into_chunks(pages, args.chunk_tokens), params))
+    backend = generate_json.HTTPBackend(files.llm_url())
+
+    def generate():
+        # A fresh scheduler per run, so no run starts with the buckets or metrics of the last.
+        return generate_json.generate_document(
+            "test", params, None, response_structure, pages, chunk_tokens=args.chunk_tokens,
+            chunk_workers=args.chunk_workers, backend=backend, response_cache=None,
+            scheduler=scheduler.RequestScheduler(is_transient=generate_json.is_transient_error),
+        )
+
+    return generate, requests, "requests"
+
+
+def setup_summary_html(files, args, language):
+    generate_summary_html_from_json = import_stage("generate_summary_html_from_json")
+    data = corpus.summary_json(args.summary_sections, language, args.seed)
+    output_file = os.path.join(files.directory, f"summary_{language}.html")
+    return (
+        (lambda: generate_summary_html_from_json.json_to_html(data, output_file=output_file)),
+        args.summary_sections, "sections",
+    )
+
+
+def setup_test_html(files, args, language):
+    generate_test_html_from_json = import_stage("generate_test_html_from_json")
+    data = corpus.exam_json(args.multiple_choice, args.open_questions, language, args.seed)
+    return (
+        (lambda: generate_test_html_from_json.generate_html(data)),
+        args.multiple_choice + args.open_questions, "questions",
+    )
+
+
+SETUPS = {
+    "pdf_extract": setup_pdf_extract,
+    "pptx_extract": setup_pptx_extract,
+    "pptx_ocr": setup_pptx_ocr,
+    "generation": setup_generation,
+    "summary_html": setup_summary_html,
+    "test_html": setup_test_html,
+}
+
+
+def measure(function, repeat):
+    """
+    Runs function once under tracemalloc (which also warms it up), then repeat times
+    untraced. Returns (timings, peak bytes). The peak covers this process only, not
+    the worker processes of parallel extraction or OCR.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    return timings, peak
+
+
+def run_benchmark(files, args, stage, language):
+    """Sets up and measures one stage on one language; returns its result entry."""
+    result = {"name": f"{stage}[{language}]", "stage": stage, "language": language}
+    try:
+        function, units, unit = SETUPS[stage](files, args, language)
+        timings, peak = measure(function, args.repeat)
+    except Skip as e:
+        result["skipped"] = str(e)
+        return result
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    median = statistics.median(timings)
+    result.update(
+        units=units,
+        unit=unit,
+        runs=len(timings),
+        seconds={"min": min(timings), "median": median, "max": max(timings)},
+        throughput=units / median if median else None,
+        peak_memory_bytes=peak,
+    )
+    if stage == "pdf_extract" and language != "en" and not args.pdf_font:
+        result["note"] = "no --pdf-font: the text was written with Helvetica, which has no glyphs for it"
+    return result
+
+
+def git_commit():
+    """Returns the commit of the checkout being measured, or None outside a git repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args, directory):
+    """Runs every selected stage for every selected language and returns the results document."""
+    files = Corpus(directory, args)
+    results = []
+    try:
+        for stage in args.stages:
+            for language in args.languages:
+                print(f"Running {stage}[{language}]...")
+                results.append(run_benchmark(files, args, stage, language))
+    finally:
+        files.close()
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            key: getattr(args, key) for key in (
+                "pages", "slides", "images_per_page", "images_per_slide", "summary_sections",
+                "multiple_choice", "open_questions", "generation_pages", "chunk_tokens", "chunk_workers",
+                "llm_latency", "repeat", "workers", "seed",
+            )
+        },
+        "results": results,
+    }
+
+
+def format_bytes(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def print_results(document):
+    """Prints one line per benchmark."""
+    for result in document["results"]:
+        if "skipped" in result:
+            print(f"{result['name']:<22} skipped: {result['skipped']}")
+        elif "error" in result:
+            print(f"{result['name']:<22} failed: {result['error']}")
+        else:
+            print(
+                f"{result['name']:<22} {result['seconds']['median']:8.3f}s  "
+                f"{result['throughput']:10.1f} {result['unit']}/s  peak {format_bytes(result['peak_memory_bytes'])}"
+            )
+
+
+def compare_results(document, baseline, threshold):
+    """
+    Prints the change of every benchmark against a baseline results file and returns
+    the names of those whose best time or peak memory grew by more than threshold percent.
+    The best of the runs is compared because it is the least disturbed by other load.
+    """
+    previous = {result["name"]: result for result in baseline.get("results", []) if "seconds" in result}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'the baseline'} ({baseline.get('created')}):")
+    for result in document["results"]:
+        old = previous.get(result["name"])
+        if "seconds" not in result or old is None:
+            continue
+        if result["units"] != old["units"]:
+            print(f"{result['name']:<22} not comparable: {old['units']} -> {result['units']} {result['unit']}")
+            continue
+        time_change = (result["seconds"]["min"] / old["seconds"]["min"] - 1) * 100
+        memory_change = (result["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1) - 1) * 100
+        regressed = time_change > threshold or memory_change > threshold
+        if regressed:
+            regressions.append(result["name"])
+        print(
+            f"{result['name']:<22} time {time_change:+6.1f}%  memory {memory_change:+6.1f}%"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def parse_arguments():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark extraction, OCR, generation and HTML rendering on synthetic corpora."
+    )
+    parser.add_argument(
+        "--output", "-o",
+        default="benchmark_results.json",
+        help="Where to write the results JSON (default: 'benchmark_results.json')."
+    )
+    parser.add_argument(
+        "--stages", "-s",
+        nargs="+",
+        choices=STAGES,
+        default=list(STAGES),
+        help="Stages to benchmark (default: all). Stages whose dependencies are missing are skipped."
+    )
+    parser.add_argument(
+        "--languages", "-l",
+        nargs="+",
+        choices=corpus.LANGUAGES,
+        default=list(corpus.LANGUAGES),
+        help="Languages of the synthetic text (default: all)."
+    )
+    parser.add_argument("--pages", type=int, default=100, help="Pages of the synthetic PDFs (default: 100).")
+    parser.add_argument("--slides", type=int, default=30, help="Slides of the synthetic decks (default: 30).")
+    parser.add_argument(
+        "--images-per-page",
+        type=int,
+        default=1,
+        help="Pictures on every PDF page (default: 1)."
+    )
+    parser.add_argument(
+        "--images-per-slide",
+        type=int,
+        default=2,
+        help="Pictures on every slide; they are what the OCR stage reads (default: 2)."
+    )
+    parser.add_argument(
+        "--generation-pages",
+        type=int,
+        default=40,
+        help="Pages of text sent through the generation stage (default: 40)."
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=2000,
+        help="Chunk size of the generation stage, in tokens; each chunk is one model request (default: 2000)."
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=4,
+        help="Chunks of the generation stage sent in parallel (default: 4)."
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.2,
+        help="Fixed latency of every request to the fake model server, in seconds (default: 0.2)."
+    )
+    parser.add_argument(
+        "--summary-sections",
+        type=int,
+        default=2000,
+        help="Sections of the synthetic summary JSON (default: 2000)."
+    )
+    parser.add_argument(
+        "--multiple-choice",
+        type=int,
+        default=2000,
+        help="Multiple-choice questions of the synthetic exam JSON (default: 2000)."
+    )
+    parser.add_argument(
+        "--open-questions",
+        type=int,
+        default=500,
+        help="Open questions of the synthetic exam JSON (default: 500)."
+    )
+    parser.add_argument(
+        "--repeat", "-r",
+        type=int,
+        default=5,
+        help="Timed runs per benchmark, after one traced warm-up run (default: 5)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes for PDF extraction and OCR (default: CPU count)."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus (default: 0).")
+    parser.add_argument(
+        "--pdf-font",
+        help="TTF/OTF font with Hebrew glyphs for the Hebrew PDFs (default: Helvetica, Latin only)."
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        help="Keep the generated corpus and HTML in this directory (default: a temporary directory)."
+    )
+    parser.add_argument(
+        "--compare", "-c",
+        help="Results JSON of an earlier run to compare with; exits with status 1 on a regression."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Percent increase of the best time or peak memory counted as a regression (default: 10)."
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.corpus_dir:
+        os.makedirs(args.corpus_dir, exist_ok=True)
+        document = run_benchmarks(args, args.corpus_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="llmtestforge-bench-") as directory:
+            document = run_benchmarks(args, directory)
+
+    print()
+    print_results(document)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=4)
+    print(f"\nResults written to {args.output}")
+
+    failed = any("error" in result for result in document["results"])
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare_results(document, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions above {args.threshold:g}%: {', '.join(regressions)}")
+            failed = True
+    if failed:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
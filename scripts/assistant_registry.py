@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import threading
+
+from disk_cache import cache_key
+from scheduler import follow_up_request
+
+ASSISTANT_REGISTRY_FILE = os.path.join(".cache", "assistants.json")
+
+
+class AssistantRegistry:
+    """
+    Remembers the Assistants created on the account, keyed by model and instructions,
+    so every run reuses the same Assistant instead of creating a new one per document.
+    The registry is a small JSON file shared by all runs in the working directory.
+    """
+
+    def __init__(self, path=ASSISTANT_REGISTRY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, assistants):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(assistants, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def get_or_create(self, openai_client, instructions, model):
+        """Returns the ID of the Assistant for model and instructions, creating it if needed."""
+        key = cache_key(model, instructions)
+        with self._lock:
+            assistants = self._load()
+            if key in assistants:
+                return assistants[key]
+
+            follow_up_request()
+            assistant = openai_client.beta.assistants.create(
+                name="Test/Summary Generator",
+                instructions=instructions,
+                model=model,
+            )
+            print(f"Assistant created: {assistant.id}")
+            assistants[key] = assistant.id
+            self._save(assistants)
+            return assistant.id
+
+    def forget(self, assistant_id):
+        """Drops an Assistant that no longer exists on the account."""
+        with self._lock:
+            assistants = self._load()
+            remaining = {key: value for key, value in assistants.items() if value != assistant_id}
+            if remaining != assistants:
+                self._save(remaining)
@@ -0,0 +1,305 @@
+import json
+import os
+import shutil
+import time
+import uuid
+
+import generate_json
+from chunking import merge_chunk_responses, split_into_chunks, question_chunks
+from job_output import write_atomic
+from structured_output import ResponseParseError, canned_response, response_format_for, schema_from_structure
+from token_budget import TokenBudgetExceeded, estimate_tokens
+
+BATCH_STATE_FILE = os.path.join("output", "batch_state.json")
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_STATUSES_FINISHED = ("completed", "failed", "expired", "cancelled")
+LOCAL_BATCH_DIR = os.path.join(".cache", "local_batches")
+# Retries of the OpenAI SDK for the batch file and status requests (its default).
+SDK_MAX_RETRIES = 2
+
+
+def parse_result_lines(lines):
+    """Maps each custom_id of a batch output file to (response_text, error)."""
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        if response.get("status_code") == 200:
+            choices = response["body"].get("choices") or [{}]
+            results[entry["custom_id"]] = (choices[0].get("message", {}).get("content"), None)
+        else:
+            error = entry.get("error") or response.get("body", {}).get("error") or "request failed"
+            results[entry["custom_id"]] = (None, error.get("message", error) if isinstance(error, dict) else error)
+    return results
+
+
+class OpenAIBatchProvider:
+    """Runs batch files through the OpenAI Batch API (chat completions, 24h window)."""
+
+    name = "openai"
+
+    def __init__(self, client=None, api_key_file="api_key.txt"):
+        self._client = client
+        self.api_key_file = api_key_file
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Batch requests do not go through the request scheduler, so the SDK retries them.
+            self._client = generate_json.create_client(self.api_key_file, max_retries=SDK_MAX_RETRIES)
+        return self._client
+
+    def submit(self, requests_path):
+        """Uploads the JSONL request file, starts the batch and returns its ID."""
+        with open(requests_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        """Returns the batch status and its request counts."""
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            "status": batch.status,
+            "completed": counts.completed if counts else 0,
+            "failed": counts.failed if counts else 0,
+            "total": counts.total if counts else 0,
+        }
+
+    def results(self, batch_id):
+        """Downloads the output and error files of a finished batch."""
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return parse_result_lines(lines)
+
+
+class LocalBatchProvider:
+    """
+    An offline stand-in for the batch interface. Submitted files are kept in directory
+    and answered by respond(body) the first time the batch status is checked, so the
+    submit, status and collect steps can be exercised without network access.
+    """
+
+    name = "local"
+
+    def __init__(self, directory=LOCAL_BATCH_DIR, respond=None):
+        self.directory = directory
+        self.respond = respond or (lambda body: canned_response(body, "Local batch response"))
+
+    def _path(self, batch_id, kind):
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, requests_path):
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        os.makedirs(self.directory, exist_ok=True)
+        shutil.copyfile(requests_path, self._path(batch_id, "input"))
+        return batch_id
+
+    def status(self, batch_id):
+        output_path = self._path(batch_id, "output")
+        if not os.path.exists(output_path):
+            with open(self._path(batch_id, "input"), "r", encoding="utf-8") as f:
+                requests = [json.loads(line) for line in f if line.strip()]
+            lines = [
+                json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"content": self.respond(request["body"])}}]},
+                    },
+                }, ensure_ascii=False)
+                for request in requests
+            ]
+            write_atomic(output_path, "\n".join(lines) + "\n")
+        with open(output_path, "r", encoding="utf-8") as f:
+            total = sum(1 for line in f if line.strip())
+        return {"status": "completed", "completed": total, "failed": 0, "total": total}
+
+    def results(self, batch_id):
+        with open(self._path(batch_id, "output"), "r", encoding="utf-8") as f:
+            return parse_result_lines(f)
+
+
+BATCH_PROVIDERS = {"openai": OpenAIBatchProvider, "local": LocalBatchProvider}
+
+
+def load_state(path=BATCH_STATE_FILE):
+    """Returns the saved batch state, or None if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(state, path=BATCH_STATE_FILE):
+    write_atomic(path, json.dumps(state, indent=4, ensure_ascii=False))
+
+
+def request_body(generate_type, text, params, custom_prompt, response_structure, routing_rules=None,
+                 structured=True):
+    """Returns the chat completion body for one document (or chunk)."""
+    instructions = generate_json.build_instructions(generate_type)
+    content = generate_json.build_message(
+        generate_type, generate_json.get_prompt(generate_type, params, custom_prompt), response_structure, text
+    )
+    model, max_completion_tokens = generate_json.plan_model(
+        generate_type, estimate_tokens(instructions) + estimate_tokens(content), params, routing_rules
+    )
+    response_format = response_format_for(generate_type, response_structure) if structured else None
+    return generate_json.chat_request_body(instructions, content, model, max_completion_tokens, response_format)
+
+
+def document_requests(generate_type, pages, params, custom_prompt, response_structure, routing_rules=None,
+                      chunk_tokens=None, structured=True):
+    """
+    Returns the request bodies for a document: one, or one per chunk when the text is
+    longer than chunk_tokens or too large for every model in routing_rules.
+    """
+    def bodies(chunks):
+        if generate_type == "test" and len(chunks) > 1:
+            requests = question_chunks(chunks, params)
+        else:
+            requests = [(chunk, params) for chunk in chunks]
+        return [
+            request_body(generate_type, chunk, chunk_param, custom_prompt, response_structure, routing_rules, structured)
+            for chunk, chunk_param in requests
+        ]
+
+    if chunk_tokens:
+        return bodies(split_into_chunks(pages, chunk_tokens))
+    try:
+        return bodies(["".join(pages)])
+    except TokenBudgetExceeded as e:
+        return bodies(split_into_chunks(pages, int(e.max_prompt_tokens * generate_json.CHUNK_BUDGET_SHARE)))
+
+
+def submit_batch(provider, generate_type, documents, state_path=BATCH_STATE_FILE, custom_prompt=None,
+                 routing_rules=None, chunk_tokens=None, structured=True, job=None):
+    """
+    Writes one JSONL request file for all documents and submits it.
+    documents maps a name to {"input_file", "pages", "output_json", "output_file"};
+    the job holding those outputs, if any, is recorded so collect can finish it.
+    The state file is written before and after the upload, so an interrupted submit
+    is resumed by resubmit_batch instead of extracting everything again.
+    """
+    response_structure = generate_json.load_response_structure(generate_type)
+    params = generate_json.default_prompt_params(generate_type)
+    requests_path = os.path.splitext(state_path)[0] + ".requests.jsonl"
+
+    lines = []
+    state_documents = {}
+    for name, document in documents.items():
+        bodies = document_requests(
+            generate_type, document["pages"], params, custom_prompt, response_structure,
+            routing_rules, chunk_tokens, structured,
+        )
+        custom_ids = [f"{name}#{index}" for index in range(len(bodies))]
+        lines.extend(
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                       ensure_ascii=False)
+            for custom_id, body in zip(custom_ids, bodies)
+        )
+        state_documents[name] = {
+            "input_file": document["input_file"],
+            "output_json": document["output_json"],
+            "output_file": document["output_file"],
+            "custom_ids": custom_ids,
+            "status": "pending",
+        }
+    write_atomic(requests_path, "\n".join(lines) + "\n")
+
+    state = {
+        "provider": provider.name,
+        "generate_type": generate_type,
+        "params": params,
+        "requests_file": requests_path,
+        "batch_id": None,
+        "status": "prepared",
+        "documents": state_documents,
+        "job": {"job_id": job.job_id, "output_dir": job.output_dir} if job else None,
+    }
+    save_state(state, state_path)
+    print(f"Wrote {len(lines)} requests for {len(documents)} documents to {requests_path}")
+    return resubmit_batch(provider, state, state_path)
+
+
+def resubmit_batch(provider, state, state_path=BATCH_STATE_FILE):
+    """Submits the request file of a prepared state that has no batch yet."""
+    state["batch_id"] = provider.submit(state["requests_file"])
+    state["status"] = "submitted"
+    state["submitted"] = time.time()
+    save_state(state, state_path)
+    print(f"Submitted batch {state['batch_id']} ({state['provider']}).")
+    return state
+
+
+def check_batch(provider, state, state_path=BATCH_STATE_FILE):
+    """Polls the batch once, records its status in the state file and returns it."""
+    info = provider.status(state["batch_id"])
+    state["status"] = info["status"]
+    state["counts"] = {key: info[key] for key in ("completed", "failed", "total")}
+    save_state(state, state_path)
+    print(
+        f"Batch {state['batch_id']}: {info['status']} "
+        f"({info['completed']}/{info['total']} completed, {info['failed']} failed)."
+    )
+    return info["status"]
+
+
+def collect_batch(provider, state, render, state_path=BATCH_STATE_FILE):
+    """
+    Polls the batch once and, if it has finished, parses every document's response,
+    merges chunked documents, saves the JSON and calls render(generate_type, data,
+    output_file). Each finished document is recorded in the state file straight away,
+    so an interrupted collect only redoes what is left. Returns True once every
+    document has been collected.
+    """
+    status = check_batch(provider, state, state_path)
+    if status not in BATCH_STATUSES_FINISHED:
+        print("The batch has not finished yet; run collect again later.")
+        return False
+
+    generate_type = state["generate_type"]
+    response_structure = generate_json.load_response_structure(generate_type)
+    schema = schema_from_structure(response_structure) if generate_type == "test" else None
+    results = provider.results(state["batch_id"])
+
+    for name, document in state["documents"].items():
+        if document["status"] == "done":
+            continue
+        try:
+            responses = []
+            for custom_id in document["custom_ids"]:
+                response_text, error = results.get(custom_id, (None, "missing from the batch results"))
+                if error or not response_text:
+                    raise generate_json.ModelRequestError(f"{custom_id}: {error or 'empty response'}")
+                responses.append(generate_json.parse_response(response_text, schema=schema))
+            if len(responses) == 1:
+                data = responses[0]
+            else:
+                data = merge_chunk_responses(generate_type, responses, state["params"])
+            generate_json.save_json(data, document["output_json"])
+            render(generate_type, data, document["output_file"])
+        except (generate_json.ModelRequestError, ResponseParseError, OSError, ValueError) as e:
+            print(f"Error: Could not collect {name}: {e}")
+            document.update(status="failed", error=str(e))
+        else:
+            document["status"] = "done"
+            document.pop("error", None)
+        save_state(state, state_path)
+
+    if all(document["status"] == "done" for document in state["documents"].values()):
+        state["status"] = "collected"
+        save_state(state, state_path)
+        return True
+    return False
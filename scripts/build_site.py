@@ -0,0 +1,318 @@
+import argparse
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import generate_summary_html_from_json
+import generate_test_html_from_json
+import html_assets
+from disk_cache import cache_key, sha256_file
+from html_assets import PageAssets, PageTemplate, add_asset_arguments
+from job_output import JOB_MANIFEST, write_atomic
+
+MANIFEST_NAME = "manifest.json"
+# JSONs written next to the responses that are not reports: job manifests, the answer
+# keys of exam variants, the --batch-api state file and the manifest of a site build.
+SKIPPED_JSON_NAMES = (JOB_MANIFEST, "batch_state.json", MANIFEST_NAME)
+SKIPPED_JSON_SUFFIXES = ("_keys.json",)
+# Bump to force a full rebuild when the site layout changes.
+SITE_VERSION = 1
+
+INDEX_STYLESHEET = """\
+body {
+    font-family: 'Assistant', sans-serif;
+    background-color: #faf7fc;
+    margin: 0;
+    padding: 0;
+    color: #2c2c2c;
+    direction: rtl;
+}
+.container {
+    max-width: 1000px;
+    margin: 40px auto;
+    padding: 30px;
+}
+h1, h2 {
+    color: #8c4ca8;
+}
+ul {
+    list-style: none;
+    padding-right: 0;
+}
+li {
+    background: #F0EAF6;
+    margin: 8px 0;
+    padding: 10px;
+    border-radius: 4px;
+}
+a {
+    color: #8c4ca8;
+    text-decoration: none;
+    font-weight: bold;
+}
+a:hover {
+    text-decoration: underline;
+}
+"""
+INDEX_PAGE = PageTemplate("""<!DOCTYPE html>
+<html lang="he">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>דוחות</title>
+    {{font_link}}
+    {{styles}}
+</head>
+<body>
+    <div class="container">
+        <h1>דוחות</h1>
+{{sections}}    </div>
+</body>
+</html>
+""")
+INDEX_SECTIONS = (("summary", "סיכומים"), ("test", "מבחנים"))
+
+
+def renderer_version(static_dir, output_dir, font_file=None):
+    """
+    Identifies everything that shapes a rendered report: the renderer modules, where
+    the static assets live and the font. Any change to them invalidates every page
+    in the manifest.
+    """
+    modules = (generate_summary_html_from_json, generate_test_html_from_json, html_assets)
+    parts = [SITE_VERSION, os.path.relpath(static_dir, output_dir)]
+    parts += [sha256_file(module.__file__) for module in modules]
+    if font_file:
+        parts.append(sha256_file(font_file))
+    return cache_key(*parts)
+
+
+def is_summary(data):
+    """Returns whether data has the shape of a summary: sections holding text, lists or nested sections."""
+    return all(isinstance(value, (str, list, dict)) for value in data.values()) and any(
+        isinstance(value, str) and value.strip() or isinstance(value, list) and value for value in data.values()
+    )
+
+
+def detect_report_type(data, generate_type=None):
+    """
+    Returns "test" for exam responses, "summary" for summaries and None for any
+    other JSON. generate_type is the type recorded in the manifest of the job that
+    wrote the file, if any; only a response of that type is a report.
+    """
+    if not isinstance(data, dict) or not data:
+        return None
+    if isinstance(data.get("exam"), dict):
+        return "test" if generate_type in (None, "test") else None
+    if generate_type in (None, "summary") and is_summary(data):
+        return "summary"
+    return None
+
+
+def job_generate_type(directory):
+    """Returns the generate type recorded in the job manifest of a directory, or None if it has none."""
+    try:
+        with open(os.path.join(directory, JOB_MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f).get("generate_type")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def load_report_type(json_path):
+    """Returns the report type of a JSON file, or None if it is not a summary or exam response."""
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return detect_report_type(data, job_generate_type(os.path.dirname(json_path)))
+
+
+def find_reports(input_dir, excluded_dirs=()):
+    """
+    Returns the paths of the response JSONs under input_dir, relative to it. The
+    excluded directories (e.g. the site itself, when it is built inside input_dir) are not searched.
+    """
+    excluded = {os.path.abspath(directory) for directory in excluded_dirs}
+    reports = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(name for name in dirs if os.path.abspath(os.path.join(root, name)) not in excluded)
+        for name in sorted(files):
+            if name.endswith(".json") and name not in SKIPPED_JSON_NAMES and not name.endswith(SKIPPED_JSON_SUFFIXES):
+                reports.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return reports
+
+
+def load_manifest(path):
+    """Returns the manifest of the previous build, or an empty one."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_report(json_path, output_file, report_type, static_dir, font_file):
+    """Renders one response JSON to HTML as a report_type report. Runs in a worker process."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    assets = PageAssets(static_dir=static_dir, font_file=font_file)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    if report_type == "summary":
+        generate_summary_html_from_json.json_to_html(data, output_file=output_file, assets=assets)
+    else:
+        write_atomic(output_file, generate_test_html_from_json.generate_html(data, assets, output_file))
+
+
+def write_index(output_dir, reports, assets):
+    """Writes index.html linking every summary and exam in the manifest."""
+    index_file = os.path.join(output_dir, "index.html")
+    sections = []
+    for report_type, heading in INDEX_SECTIONS:
+        entries = sorted(
+            (entry["output"], name) for name, entry in reports.items() if entry["type"] == report_type
+        )
+        if not entries:
+            continue
+        items = "".join(
+            f"<li><a href='{html.escape(output, quote=True)}'>"
+            f"{html.escape(os.path.splitext(name)[0])}</a></li>"
+            for output, name in entries
+        )
+        sections.append(f"        <h2>{heading}</h2>\n        <ul>{items}</ul>\n")
+
+    head = assets.head("index", INDEX_STYLESHEET, generate_summary_html_from_json.GOOGLE_FONT_LINK, 4, index_file)
+    parts = []
+    INDEX_PAGE.render(parts.append, sections="".join(sections), **head)
+    write_atomic(index_file, "".join(parts))
+    return index_file
+
+
+def build_site(input_dir, output_dir, workers=None, force=False, static_dir=None, font_file=None):
+    """
+    Renders every response JSON under input_dir into output_dir and writes an index page.
+    A manifest of input hashes and the renderer version is kept in output_dir, so only
+    new or changed JSONs (or pages whose output went missing) are re-rendered, in parallel.
+    Returns (rendered, skipped, failed) lists of JSON paths relative to input_dir.
+    """
+    static_dir = static_dir or os.path.join(output_dir, "static")
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    version = renderer_version(static_dir, output_dir, font_file)
+    if force or manifest.get("renderer_version") != version:
+        previous = {}
+    else:
+        previous = manifest.get("reports", {})
+
+    reports = {}
+    pending = {}
+    skipped = []
+    for name in find_reports(input_dir, excluded_dirs=(output_dir, static_dir)):
+        json_path = os.path.join(input_dir, name)
+        digest = sha256_file(json_path)
+        output = os.path.splitext(name)[0].replace(os.sep, "/") + ".html"
+        entry = previous.get(name)
+        if entry and entry["hash"] == digest and os.path.exists(os.path.join(output_dir, entry["output"])):
+            reports[name] = entry
+            skipped.append(name)
+            continue
+        report_type = load_report_type(json_path)
+        if report_type is None:
+            print(f"Skipping {json_path}: not a summary or exam response")
+        else:
+            pending[name] = {"hash": digest, "output": output, "type": report_type}
+
+    # Drop the pages of JSONs that were deleted since the last build.
+    for name, entry in manifest.get("reports", {}).items():
+        if name not in reports and name not in pending:
+            stale = os.path.join(output_dir, entry["output"])
+            if os.path.exists(stale):
+                os.remove(stale)
+                print(f"Removed {stale}")
+
+    rendered, failed = [], []
+    if pending:
+        print(f"Rendering {len(pending)} of {len(pending) + len(skipped)} reports...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    render_report, os.path.join(input_dir, name), os.path.join(output_dir, entry["output"]),
+                    entry["type"], static_dir, font_file,
+                ): name
+                for name, entry in pending.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error: Could not render {name}: {e}")
+                    failed.append(name)
+                    continue
+                reports[name] = pending[name]
+                rendered.append(name)
+
+    assets = PageAssets(static_dir=static_dir, font_file=font_file)
+    index_file = write_index(output_dir, reports, assets)
+    write_atomic(manifest_path, json.dumps(
+        {"renderer_version": version, "reports": dict(sorted(reports.items()))}, indent=4, ensure_ascii=False
+    ))
+    print(f"Index written to {index_file}")
+    return rendered, skipped, failed
+
+
+def parse_arguments():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Render a directory of response JSONs into a site of HTML reports with an index page."
+    )
+
+    parser.add_argument(
+        "--input-dir", "-i",
+        default="output",
+        help="Directory containing the response JSON files (default: 'output')."
+    )
+
+    parser.add_argument(
+        "--output-dir", "-o",
+        default="site",
+        help="Directory for the HTML reports, index.html, the build manifest and, unless --static-dir "
+             "is given, the shared CSS in <output-dir>/static (default: 'site')."
+    )
+
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of reports rendered in parallel (default: number of CPUs)."
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-render every report even if its JSON has not changed."
+    )
+
+    add_asset_arguments(parser)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if not os.path.isdir(args.input_dir):
+        print(f"Error: Input directory '{args.input_dir}' does not exist.")
+        exit(1)
+    rendered, skipped, failed = build_site(
+        args.input_dir, args.output_dir, workers=args.workers, force=args.force,
+        static_dir=args.static_dir, font_file=args.font_file,
+    )
+    print(f"Rendered {len(rendered)}, unchanged {len(skipped)}, failed {len(failed)}.")
+    if failed:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
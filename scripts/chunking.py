@@ -0,0 +1,131 @@
+from token_budget import estimate_tokens
+
+
+def split_oversized_page(page, max_tokens):
+    """Splits a single page that exceeds max_tokens into pieces, on line boundaries where possible."""
+    pieces = []
+    current, current_tokens = [], 0
+    for line in page.splitlines(keepends=True):
+        line_tokens = estimate_tokens(line)
+        if line_tokens > max_tokens:
+            # A single huge line: cut it into equally sized slices.
+            slices = -(-line_tokens // max_tokens)
+            size = -(-len(line) // slices)
+            parts = [line[i:i + size] for i in range(0, len(line), size)]
+        else:
+            parts = [line]
+        for part in parts:
+            part_tokens = estimate_tokens(part)
+            if current and current_tokens + part_tokens > max_tokens:
+                pieces.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def split_into_chunks(pages, max_tokens):
+    """
+    Groups consecutive pages (or slides) into chunks of at most max_tokens tokens.
+    Page boundaries are kept wherever a page fits in the budget on its own.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for page in pages:
+        page_tokens = estimate_tokens(page)
+        parts = split_oversized_page(page, max_tokens) if page_tokens > max_tokens else [page]
+        for part in parts:
+            part_tokens = estimate_tokens(part) if len(parts) > 1 else page_tokens
+            if current and current_tokens + part_tokens > max_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def spread_count(total, num_chunks):
+    """
+    Splits total questions over num_chunks chunks as evenly as possible. With fewer
+    questions than chunks, the questions go to chunks spread over the whole document
+    and the other chunks get none, so no chunk is asked for questions the merge drops.
+    """
+    if total >= num_chunks:
+        return [total // num_chunks + (1 if index < total % num_chunks else 0) for index in range(num_chunks)]
+    counts = [0] * num_chunks
+    for index in range(total):
+        counts[(2 * index + 1) * num_chunks // (2 * total)] = 1
+    return counts
+
+
+def distribute_question_counts(params, num_chunks):
+    """Returns the prompt parameters for each chunk of a test, with the questions spread over the chunks."""
+    chunk_params = [dict(params) for _ in range(num_chunks)]
+    for name in ("num_of_american", "num_of_open"):
+        for chunk, share in zip(chunk_params, spread_count(params.get(name, 0), num_chunks)):
+            chunk[name] = share
+    return chunk_params
+
+
+def question_chunks(chunks, params):
+    """Returns (chunk, prompt parameters) for the chunks of a test that are asked for any questions."""
+    return [
+        (chunk, chunk_param)
+        for chunk, chunk_param in zip(chunks, distribute_question_counts(params, len(chunks)))
+        if chunk_param.get("num_of_american") or chunk_param.get("num_of_open")
+    ]
+
+
+def round_robin(lists, limit):
+    """Takes items from each list in turn until limit items are taken."""
+    taken = []
+    position = 0
+    while len(taken) < limit and any(position < len(items) for items in lists):
+        for items in lists:
+            if position < len(items) and len(taken) < limit:
+                taken.append(items[position])
+        position += 1
+    return taken
+
+
+def merge_values(first, second):
+    """Merges two values of the same summary section."""
+    if isinstance(first, dict) and isinstance(second, dict):
+        merged = dict(first)
+        for key, value in second.items():
+            merged[key] = merge_values(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(first, list) and isinstance(second, list):
+        return first + second
+    if isinstance(first, str) and isinstance(second, str):
+        return first + "\n\n" + second
+    return [first, second]
+
+
+def merge_chunk_responses(generate_type, responses, params):
+    """
+    Merges the per-chunk JSON responses into one response with the same shape as a
+    single request would produce (test_json_structure.json or summary_json_structure.json).
+    """
+    if generate_type == "test":
+        exams = [response.get("exam", {}) for response in responses]
+        return {
+            "exam": {
+                "multiple_choice": round_robin(
+                    [exam.get("multiple_choice", []) for exam in exams], params.get("num_of_american", 0)
+                ),
+                "open_questions": round_robin(
+                    [exam.get("open_questions", []) for exam in exams], params.get("num_of_open", 0)
+                ),
+            }
+        }
+
+    merged = {}
+    for response in responses:
+        for key, value in response.items():
+            merged[key] = merge_values(merged[key], value) if key in merged else value
+    return merged
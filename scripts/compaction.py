@@ -0,0 +1,135 @@
+import re
+
+from token_budget import estimate_tokens
+
+# Lines that are nothing but a page or slide number, e.g. "12", "Page 3 of 40", "עמוד 5".
+PAGE_NUMBER_PATTERN = re.compile(
+    r"^(?:page|slide|עמוד|שקופית)?\s*\d+(?:\s*(?:/|of|מתוך)\s*\d+)?$", re.IGNORECASE
+)
+WHITESPACE_PATTERN = re.compile(r"[ \t\u00a0]+")
+DIGITS_PATTERN = re.compile(r"\d+")
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+# Lines without letters (a bare "12", "3 / 40") only count as page numbers or
+# repeated boilerplate within this many lines of the top or bottom of a page;
+# elsewhere they are usually table cells, which PyMuPDF puts on lines of their own.
+EDGE_LINES = 2
+
+# A line is boilerplate when it appears on at least this share of the pages (and on 3 or more).
+REPEATED_LINE_RATIO = 0.5
+REPEATED_LINE_MIN_PAGES = 3
+REPEATED_LINE_MAX_LENGTH = 80
+
+# A page is dropped when its word shingles overlap this much with one of the recent kept pages.
+DUPLICATE_PAGE_SIMILARITY = 0.9
+DUPLICATE_PAGE_WINDOW = 10
+SHINGLE_SIZE = 3
+
+
+def normalize_lines(page):
+    """Collapses runs of whitespace and returns the non-empty lines of a page."""
+    lines = (WHITESPACE_PATTERN.sub(" ", line).strip() for line in page.splitlines())
+    return [line for line in lines if line]
+
+
+def boilerplate_key(line):
+    """Lines that differ only in their numbers (e.g. running footers) share a key."""
+    return DIGITS_PATTERN.sub("#", line.lower())
+
+
+def find_repeated_lines(pages_lines):
+    """Returns the keys of short lines that repeat across many pages (headers, footers, templates)."""
+    if len(pages_lines) < REPEATED_LINE_MIN_PAGES:
+        return set()
+    counts = {}
+    for lines in pages_lines:
+        for key in {boilerplate_key(line) for line in lines if len(line) <= REPEATED_LINE_MAX_LENGTH}:
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(REPEATED_LINE_MIN_PAGES, REPEATED_LINE_RATIO * len(pages_lines))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def is_boilerplate(line, index, lines, repeated):
+    """Returns whether the line at index of a page is a page number or a repeated header/footer line."""
+    if not LETTER_PATTERN.search(line) and EDGE_LINES <= index < len(lines) - EDGE_LINES:
+        return False
+    # "Page 3 of 40" is a page number wherever it stands.
+    return bool(PAGE_NUMBER_PATTERN.match(line)) or boilerplate_key(line) in repeated
+
+
+def shingles(text):
+    """Returns the set of word n-grams of a text."""
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(first, second):
+    """Returns the Jaccard similarity of two sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def compact_pages(pages):
+    """
+    Removes boilerplate from extracted pages before they are sent to the model:
+    page-number lines, lines repeated across many pages (headers, footers, slide
+    templates), runs of whitespace, and pages that are near-duplicates of a recent
+    page (e.g. slide build-ups). Of two near-duplicates the fuller one is kept, in
+    the place of the first, so the points a build-up adds are not lost.
+    Returns (compacted_pages, report).
+    """
+    pages_lines = [normalize_lines(page) for page in pages]
+    repeated = find_repeated_lines(pages_lines)
+
+    compacted = []
+    recent = []  # (index in compacted, shingles) of the last DUPLICATE_PAGE_WINDOW kept pages
+    removed_lines = 0
+    dropped_pages = 0
+    for lines in pages_lines:
+        kept = [line for index, line in enumerate(lines) if not is_boilerplate(line, index, lines, repeated)]
+        removed_lines += len(lines) - len(kept)
+        if not kept:
+            continue
+
+        page = "\n".join(kept) + "\n"
+        page_shingles = shingles(page)
+        duplicate = next(
+            (position for position, (_, previous) in enumerate(recent)
+             if jaccard(page_shingles, previous) >= DUPLICATE_PAGE_SIMILARITY),
+            None,
+        )
+        if duplicate is not None:
+            dropped_pages += 1
+            index, previous = recent[duplicate]
+            if not page_shingles <= previous:
+                # The later page has text the earlier one lacks (e.g. the next bullet of a build-up):
+                # it is the final state of the slide, so it replaces the earlier one.
+                compacted[index] = page
+                recent[duplicate] = (index, page_shingles)
+            continue
+        recent = (recent + [(len(compacted), page_shingles)])[-DUPLICATE_PAGE_WINDOW:]
+        compacted.append(page)
+
+    tokens_before = sum(estimate_tokens(page) for page in pages)
+    tokens_after = sum(estimate_tokens(page) for page in compacted)
+    report = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "removed_lines": removed_lines,
+        "dropped_pages": dropped_pages,
+    }
+    return compacted, report
+
+
+def format_report(report, name=None):
+    """Returns a one-line description of the token savings of compact_pages."""
+    before, after = report["tokens_before"], report["tokens_after"]
+    saved = 100 * (before - after) / before if before else 0.0
+    prefix = f"Compaction ({name})" if name else "Compaction"
+    return (
+        f"{prefix}: {before} -> {after} input tokens ({saved:.1f}% saved), "
+        f"{report['removed_lines']} boilerplate lines and {report['dropped_pages']} near-duplicate pages removed."
+    )
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Eviction frees space down to this share of max_bytes, so the writes that follow
+# do not each trigger another scan.
+EVICT_TARGET = 0.9
+
+# Running total size of each cache directory, shared by the DiskCache instances of
+# this process. Entries written by other processes are not counted until the next
+# scan, which recounts the directory.
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """Builds a cache key by hashing the given parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (str, bytes)):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False)
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    A directory of JSON entries keyed by hex digests.
+    Entries are evicted least-recently-used first once the directory grows past
+    max_bytes, and dropped on lookup once they are older than ttl seconds (if set).
+    The size of the directory is tracked as entries are written, so the directory
+    is only scanned once per process and when an eviction is due.
+    The modification time of an entry is its last-use time, so a hit touches the file.
+    Writes go through a temp file and a rename, so concurrent processes never see
+    a half-written entry.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+                os.remove(path)
+                return None
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry["value"]
+
+    def set(self, key, value):
+        """Stores value under key and evicts old entries if the cache is over its size limit."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self._grow(os.path.getsize(path) - replaced) > self.max_bytes:
+            self.evict()
+
+    def _grow(self, change):
+        """Adds change to the running size of the cache and returns the new size."""
+        directory = os.path.abspath(self.directory)
+        with _sizes_lock:
+            known = directory in _sizes
+        if not known:
+            size = sum(size for _, size, _ in self.entries())
+            with _sizes_lock:
+                # The scan already counted the entry just written.
+                return _sizes.setdefault(directory, size)
+        with _sizes_lock:
+            _sizes[directory] += change
+            return _sizes[directory]
+
+    def entries(self):
+        """Yields (path, size, last_used) for every entry in the cache."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """
+        Removes least-recently-used entries until the cache is under EVICT_TARGET of
+        max_bytes (if it is over max_bytes at all) and resets the running size.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for path, size, _ in entries:
+                if total <= self.max_bytes * EVICT_TARGET:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        with _sizes_lock:
+            _sizes[os.path.abspath(self.directory)] = total
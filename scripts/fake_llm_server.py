@@ -0,0 +1,272 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from structured_output import canned_response
+from token_budget import estimate_tokens
+
+DEFAULT_PORT = 8765
+# Streamed responses are sent in pieces of this many characters.
+STREAM_PIECE_CHARS = 32
+ERROR_CODES = {429: "rate_limit_exceeded", 500: "server_error", 502: "server_error", 503: "server_error"}
+
+
+def request_kind(body):
+    """Returns 'test' or 'summary' for a request built by generate_json.build_message."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("json_schema", {}).get("name") == "exam":
+        return "test"
+    messages = body.get("messages") or [{}]
+    return "test" if "The test:" in messages[-1].get("content", "") else "summary"
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the chat completions API, for load tests and benchmarks
+    without network access. Every request waits latency seconds (plus up to
+    latency_jitter), then the response is delivered at tokens_per_second. A share
+    of the requests (error_rate) fails with one of error_statuses instead. Responses
+    are the canned JSON in responses[kind] or, by default, a minimal value matching
+    the requested schema. With a seed, the latencies and failures are reproducible.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, latency_jitter=0.0, tokens_per_second=200.0, error_rate=0.0,
+                 error_statuses=(429, 500), retry_after=None, responses=None, seed=None, verbose=False):
+        super().__init__(address, FakeLLMHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.responses = responses or {}
+        self.verbose = verbose
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "errors": 0, "completed": 0, "in_flight": 0, "max_in_flight": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+
+    def draw(self):
+        """Returns (delay, error_status) for the next request."""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            failed = self._random.random() < self.error_rate
+            return delay, self._random.choice(self.error_statuses) if failed else None
+
+    def count(self, **changes):
+        with self._lock:
+            for key, change in changes.items():
+                self.stats[key] += change
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def snapshot(self):
+        """Returns a copy of the request counters."""
+        with self._lock:
+            return dict(self.stats)
+
+    def response_text(self, body):
+        kind = request_kind(body)
+        if kind in self.responses:
+            return self.responses[kind]
+        return canned_response(body)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data, headers=None):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self.send_json(200, self.server.snapshot())
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        server.count(requests=1, in_flight=1)
+        try:
+            delay, error_status = server.draw()
+            if error_status:
+                server.count(errors=1)
+                headers = {}
+                if error_status == 429 and server.retry_after is not None:
+                    headers["Retry-After"] = str(server.retry_after)
+                self.send_json(error_status, {"error": {
+                    "message": f"Simulated error {error_status}.",
+                    "code": ERROR_CODES.get(error_status, "server_error"),
+                }}, headers)
+                return
+
+            time.sleep(delay)
+            text = server.response_text(body)
+            prompt_tokens = sum(estimate_tokens(message.get("content", "")) for message in body.get("messages", []))
+            completion_tokens = estimate_tokens(text)
+            if body.get("stream"):
+                self.stream(body, text)
+            else:
+                if server.tokens_per_second:
+                    time.sleep(completion_tokens / server.tokens_per_second)
+                self.send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+            server.count(completed=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            server.count(in_flight=-1)
+
+    def stream(self, body, text):
+        """Sends text as server-sent chat completion chunks at the configured throughput."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for start in range(0, len(text), STREAM_PIECE_CHARS):
+            piece = text[start:start + STREAM_PIECE_CHARS]
+            if self.server.tokens_per_second:
+                time.sleep(estimate_tokens(piece) / self.server.tokens_per_second)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"content": piece}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def load_responses(args):
+    """Reads the canned response files given on the command line."""
+    responses = {}
+    for kind, path in (("test", args.test_response), ("summary", args.summary_response)):
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                responses[kind] = f.read()
+    return responses
+
+
+def parse_arguments():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Serve fake chat completions for offline runs and benchmarks "
+                    "(use with --llm-backend http)."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument(
+        "--port", "-p",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to listen on (default: {DEFAULT_PORT})."
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.5,
+        help="Seconds before the first token of every response (default: 0.5)."
+    )
+    parser.add_argument(
+        "--latency-jitter",
+        type=float,
+        default=0.0,
+        help="Random extra latency of up to this many seconds per request (default: 0)."
+    )
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=200.0,
+        help="Output throughput of each response; 0 sends it at once (default: 200)."
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with an error status, e.g. 0.1 (default: 0)."
+    )
+    parser.add_argument(
+        "--error-status",
+        type=int,
+        action="append",
+        help="Error status to simulate; repeat for several (default: 429 and 500)."
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        help="Retry-After header sent with simulated 429 errors (default: none)."
+    )
+    parser.add_argument(
+        "--test-response",
+        help="JSON file returned for every exam request (default: a minimal exam matching the schema)."
+    )
+    parser.add_argument(
+        "--summary-response",
+        help="JSON file returned for every summary request (default: a one-section summary)."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for the latency jitter and simulated errors, for reproducible runs."
+    )
+    parser.add_argument("--verbose", "-v", action="store_true", help="Log every request.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    server = FakeLLMServer(
+        (args.host, args.port), latency=args.latency, latency_jitter=args.latency_jitter,
+        tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+        error_statuses=tuple(args.error_status or (429, 500)), retry_after=args.retry_after,
+        responses=load_responses(args), seed=args.seed, verbose=args.verbose,
+    )
+    print(f"Serving fake chat completions on http://{args.host}:{server.server_port} (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.snapshot(), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,141 +1,870 @@
 import argparse
-import openai
 import json
 import fitz  # PyMuPDF
 import io
+import os
 import time
 import sys
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pptx import Presentation
+from disk_cache import DiskCache, cache_key, sha256_file
+from job_output import Job, add_job_arguments, input_stem, job_from_args, open_atomic
+from response_cache import CACHE_MODES, RESPONSE_CACHE_TTL, ResponseCache
+from assistant_registry import AssistantRegistry
+from scheduler import DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_RETRIES, RequestScheduler, follow_up_request
+from chunking import merge_chunk_responses, split_into_chunks, question_chunks
+from compaction import compact_pages, format_report
+from structured_output import (
+    REPAIR_INSTRUCTIONS, ResponseParseError, parse_json_response, response_format_for, schema_from_structure,
+)
+from token_budget import TokenBudgetExceeded, estimate_tokens, load_routing_rules, plan_request
+from tracing import add_trace_arguments, count, export_from_args, span
+
+# Bump an extractor's version whenever its output changes, so stale cache entries are ignored.
+EXTRACTOR_VERSIONS = {"pdf": 3, "pptx": 2}
+EXTRACTION_CACHE_DIR = os.path.join(".cache", "extract")
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# PDFs with at least this many pages are extracted on a process pool, in ranges of this size.
+PDF_PARALLEL_MIN_PAGES = 64
+PDF_PAGES_PER_TASK = 32
+
+DEFAULT_MODEL = "gpt-4o-mini"
+MAX_COMPLETION_TOKENS = 20000
+API_MODES = ("assistant", "chat")
+LLM_BACKENDS = ("openai", "http")
+DEFAULT_LLM_URL = "http://127.0.0.1:8765"
+HTTP_BACKEND_TIMEOUT = 600
+OVERFLOW_POLICIES = ("chunk", "reject")
+# Share of the largest model's prompt budget given to the document text when auto-chunking.
+CHUNK_BUDGET_SHARE = 0.8
+
+# Polling is only used when a run cannot be streamed.
+POLL_INITIAL_INTERVAL = 0.25
+POLL_MAX_INTERVAL = 2.0
+POLL_BACKOFF = 1.5
+
+# Shared by every request in the process so concurrent jobs don't register duplicates.
+assistant_registry = AssistantRegistry()
+
+# Run failures (see last_error.code) that go away when the request is retried.
+TRANSIENT_RUN_ERROR_CODES = ("rate_limit_exceeded", "server_error")
 
 def read_api_key(file_path="api_key.txt"):
     with open(file_path, "r") as f:
         return f.read().strip()
     
-def extract_text_from_pptx(pptx_path):
+def extract_slides_from_pptx(pptx_path):
+    """Returns the text of each slide, one string per slide."""
     prs = Presentation(pptx_path)
-    text = []
+    slides = []
     
     for slide in prs.slides:
+        text = []
         for shape in slide.shapes:
             if hasattr(shape, "text"):
-                text.append(shape.text)
+                text.append(shape.text + "\n")
+        slides.append("".join(text))
     
-    return "\n".join(text)
+    return slides
 
-def compress_pdf_to_text(input_pdf_path):
-    # Open the input PDF
-    doc = fitz.open(input_pdf_path)
-    full_text = ""
+def extract_text_from_pptx(pptx_path):
+    return "".join(extract_slides_from_pptx(pptx_path))
 
-    # Iterate through each page and apply optimizations
-    for page_num in range(doc.page_count):
-        page = doc.load_page(page_num)
+def extract_pdf_page_range(input_pdf_path, start, stop, strip_annotations=False):
+    """Returns the text of pages start..stop-1. Runs in a worker process."""
+    texts = []
+    with fitz.open(input_pdf_path) as doc:
+        for page_num in range(start, stop):
+            page = doc.load_page(page_num)
 
-        # Compress images and other content
-        # Remove all annotations on the page
-        for annot in page.annots():
-            page.delete_annot(annot)
-        # page.set_(None)  # Remove annotations to save space
-        page.clean_contents()  # Clean up page contents
+            if strip_annotations:
+                # Remove all annotations on the page and clean up its contents
+                annot = page.first_annot
+                while annot:
+                    annot = page.delete_annot(annot)
+                page.clean_contents()
 
-        # Extract text from the page and append it to the string
-        full_text += page.get_text("text")  # Extract text as plain text
+            # Extract text from the page
+            texts.append(page.get_text("text"))  # Extract text as plain text
+    return texts
 
-    return full_text
+def iter_pdf_pages(input_pdf_path, workers=None, strip_annotations=False):
+    """
+    Yields (page_number, text) for every page of the PDF, in order.
+    Large documents are split into page ranges that are extracted on a process
+    pool, with at most two ranges per worker in flight. Every caller today keeps
+    all the pages, since the cache, compaction and chunking need the whole
+    document; the generator only bounds the results waiting in the pool.
+    """
+    with fitz.open(input_pdf_path) as doc:
+        page_count = doc.page_count
 
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        for start in range(0, page_count, PDF_PAGES_PER_TASK):
+            stop = min(start + PDF_PAGES_PER_TASK, page_count)
+            texts = extract_pdf_page_range(input_pdf_path, start, stop, strip_annotations)
+            yield from enumerate(texts, start=start + 1)
+        return
 
-def generate_content(
-    generate_type, initial_prompt, response_structure, text_input
-) -> int:
-    # Step 1: Read API key from file
-    api_key = read_api_key()
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append((start, pool.submit(extract_pdf_page_range, input_pdf_path, start, stop, strip_annotations)))
+            if len(pending) >= max_in_flight:
+                first, future = pending.popleft()
+                yield from enumerate(future.result(), start=first + 1)
+        while pending:
+            first, future = pending.popleft()
+            yield from enumerate(future.result(), start=first + 1)
 
-    # Initialize OpenAI Client
-    openai_client = openai.OpenAI(api_key=api_key)
-    
+def ocr_pdf_page(input_pdf_path, page_num, dpi):
+    """Renders one page at dpi and OCRs it. Runs in a worker process."""
+    # OCR dependencies are only needed for scanned documents.
+    from PIL import Image
+    from pptx_to_text import ocr_image
+
+    with fitz.open(input_pdf_path) as doc:
+        pixmap = doc.load_page(page_num).get_pixmap(dpi=dpi, alpha=False)
+        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    return ocr_image(image)
+
+def ocr_pages_without_text(input_pdf_path, pages, dpi, workers=None):
+    """
+    Fills in the pages that have no text layer (scanned pages) by OCR, in parallel.
+    Pages that already have text are never rendered or OCR'd.
+    """
+    missing = [index for index, text in enumerate(pages) if not text.strip()]
+    if not missing:
+        return pages
+
+    print(f"OCR: {len(missing)} of {len(pages)} pages have no text layer; rendering them at {dpi} DPI.")
+    start_time = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ocr_pdf_page, input_pdf_path, index, dpi): index for index in missing}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                pages[index] = future.result()
+            except Exception as e:
+                print(f"Error processing page {index + 1}: {e}")
+    print(f"OCR completed in {time.monotonic() - start_time:.2f}s.")
+    return pages
+
+def extract_pages_from_pdf(input_pdf_path, workers=None, strip_annotations=False, ocr_dpi=None):
+    """
+    Returns the text of each page, one string per page.
+    With ocr_dpi set, pages without a text layer are OCR'd at that resolution.
+    """
+    pages = [text for _, text in iter_pdf_pages(input_pdf_path, workers, strip_annotations)]
+    if ocr_dpi:
+        pages = ocr_pages_without_text(input_pdf_path, pages, ocr_dpi, workers)
+    return pages
+
+def compress_pdf_to_text(input_pdf_path, workers=None, strip_annotations=False, ocr_dpi=None):
+    return "".join(extract_pages_from_pdf(input_pdf_path, workers, strip_annotations, ocr_dpi))
+
+
+def extraction_cache():
+    """Returns the on-disk cache of extracted document text."""
+    return DiskCache(EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_BYTES)
+
+
+def extract_pages(file_type, input_file, use_cache=True, workers=None, strip_annotations=False, ocr_dpi=None):
+    """
+    Extracts the text of a PDF or PPTX file as a list of pages (or slides).
+    Results are cached by the file's content hash, the extractor version and the
+    extraction options, so re-running on an unchanged file skips extraction entirely.
+    """
+    if file_type not in EXTRACTOR_VERSIONS:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    with span("extract", file=input_file, file_type=file_type) as attrs:
+        options = {"strip_annotations": strip_annotations, "ocr_dpi": ocr_dpi} if file_type == "pdf" else {}
+        cache = extraction_cache() if use_cache else None
+        pages = None
+        if cache:
+            key = cache_key(sha256_file(input_file), file_type, EXTRACTOR_VERSIONS[file_type], options)
+            pages = cache.get(key)
+            attrs["cached"] = pages is not None
+            if pages is not None:
+                print(f"Using cached text for {input_file}")
+
+        if pages is None:
+            if file_type == "pdf":
+                pages = extract_pages_from_pdf(input_file, workers, **options)
+            else:
+                pages = extract_slides_from_pptx(input_file)
+            if cache:
+                cache.set(key, pages)
+
+    count("pages_extracted", len(pages))
+    count("bytes_extracted", sum(len(page.encode("utf-8")) for page in pages))
+    return pages
+
+
+def extract_text(file_type, input_file, use_cache=True, workers=None, strip_annotations=False, ocr_dpi=None):
+    """Extracts the text of a PDF or PPTX file."""
+    return "".join(extract_pages(file_type, input_file, use_cache, workers, strip_annotations, ocr_dpi))
+
+
+def load_response_structure(generate_type):
+    """Loads the JSON structure the model is asked to follow."""
+    response_structure_file = "test_json_structure.json" if generate_type == "test" else "summary_json_structure.json"
+    with open(response_structure_file, "r", encoding="utf-8") as json_file:
+        return json.load(json_file)
+
+
+def default_prompt_params(generate_type):
+    """Returns the default prompt parameters for the generate type."""
+    return {"num_of_american": 8, "num_of_open": 3} if generate_type == "test" else {}
+
+
+def create_client(api_key_file="api_key.txt", max_retries=0):
+    """
+    Creates an OpenAI client using the API key stored in api_key_file. The SDK's own
+    retries are off by default: model calls are retried by the request scheduler, which
+    also applies the rate limits to every attempt.
+    """
+    # Imported here so the extractors and the HTTP backend work without the OpenAI SDK.
+    import openai
+    return openai.OpenAI(api_key=read_api_key(api_key_file), max_retries=max_retries)
+
+
+def build_instructions(generate_type):
+    """Returns the assistant instructions for the generate type."""
     instructions = "You are an assistant that generates tests and summary as text input in JSON format."
     
     if generate_type == "summary":
         instructions+= "The generated response must contain at least 1,000 words in JSON format."
 
-    # Step 2: Create an Assistant
-    assistant = openai_client.beta.assistants.create(
-        name="Test/Summary Generator",
-        instructions=instructions,
-        model="gpt-4o-mini",
-    )
-    assistant_id = assistant.id
+    return instructions
 
-    print(f"Assistant created: {assistant_id}")
 
-    # Step 3: Create a Thread
-    thread = openai_client.beta.threads.create()
-    thread_id = thread.id
+def build_message(generate_type, initial_prompt, response_structure, text_input):
+    """Returns the user message sent to the assistant."""
+    return f"{initial_prompt} The {generate_type}: {text_input} return in JSON format acording to the format randomly: {response_structure}"
 
-    print(f"Thread created: {thread_id}")
 
-    content = f"{initial_prompt} The {generate_type}: {text_input} return in JSON format acording to the format randomly: {response_structure}"
-    # Step 5: Send a Message with Text Input
-    message = openai_client.beta.threads.messages.create(
-        thread_id=thread_id,
-        role="user",
-        content=content,
-    )
+class TokenSink:
+    """
+    Collects streamed response text. Each fragment is appended to stream_path (if set)
+    and flushed as it arrives, so a downstream stage can start reading before the
+    model finishes. The time to first token is printed when the first fragment lands.
+    """
 
-    print("Message sent to assistant.")
+    def __init__(self, start_time, stream_path=None):
+        self.start_time = start_time
+        self.parts = []
+        self.file = None
+        if stream_path:
+            os.makedirs(os.path.dirname(stream_path) or ".", exist_ok=True)
+            self.file = open(stream_path, "w", encoding="utf-8")
+
+    def write(self, fragment):
+        if not fragment:
+            return
+        if not self.parts:
+            print(f"Time to first token: {time.monotonic() - self.start_time:.2f}s")
+        self.parts.append(fragment)
+        if self.file:
+            self.file.write(fragment)
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+
+def stream_path_for(output_path):
+    """Returns the file the raw response is streamed to while output_path is being generated."""
+    return os.path.splitext(output_path)[0] + ".stream.txt"
+
+
+class ModelRequestError(Exception):
+    """
+    Raised when a model run fails or returns nothing. transient marks failures worth
+    retrying (rate limits, server errors, expired runs).
+    """
+
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def run_failed(status, last_error):
+    """Returns the ModelRequestError for a run that ended with status."""
+    code = getattr(last_error, "code", None)
+    transient = status == "expired" or code in TRANSIENT_RUN_ERROR_CODES
+    return ModelRequestError(f"Processing {status}: {last_error}", transient=transient)
+
+
+def is_transient_error(error):
+    """Tells the request scheduler which errors are worth retrying."""
+    if isinstance(error, ModelRequestError):
+        return error.transient
+    # Only an imported SDK can have raised one of its errors.
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code in (408, 409, 429) or status_code >= 500)
 
-    # Step 6: Run the Assistant
-    run = openai_client.beta.threads.runs.create(
-        thread_id=thread_id,
-        assistant_id=assistant_id,
-        max_completion_tokens=20000,
-    )
 
-    print("Processing...")
+request_scheduler = RequestScheduler(is_transient=is_transient_error)
 
-    # Step 7: Wait for Completion & Retrieve the Response
+
+def wait_for_run(openai_client, thread_id, run_id):
+    """
+    Polls a run until it completes, backing off from POLL_INITIAL_INTERVAL to
+    POLL_MAX_INTERVAL. Only status changes are logged.
+    """
+    interval = POLL_INITIAL_INTERVAL
+    last_status = None
     while True:
+        follow_up_request()
         run_status = openai_client.beta.threads.runs.retrieve(
-            thread_id=thread_id, run_id=run.id
+            thread_id=thread_id, run_id=run_id
         )
+        count("run_polls")
         if run_status.status == "completed":
             print("Processing completed.")
-            break
-        elif run_status.status == "failed":
-            print("Error: Processing failed.")
-            print(run_status)
-            exit(1)
-        print(run_status)
-        time.sleep(2)  # Wait before checking again
-
-    # Step 8: Fetch Messages
-    messages = openai_client.beta.threads.messages.list(thread_id=thread_id)
-
-    # Extract assistant response
-    response_text = None
-    for msg in messages.data:
-        if msg.role == "assistant":
-            for content in msg.content:
-                if content.type == "text":
-                    response_text = content.text.value
-                    break
+            return
+        elif run_status.status in ("failed", "cancelled", "expired"):
+            raise run_failed(run_status.status, run_status.last_error)
+        if run_status.status != last_status:
+            print(f"Run status: {run_status.status}")
+            last_status = run_status.status
+        time.sleep(interval)  # Wait before checking again
+        interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+
+def consume_run_stream(events, sink, on_thread=None):
+    """
+    Reads a streamed run, feeding message deltas to sink. Returns the thread ID, which
+    is also passed to on_thread as soon as it is known, so a failed run's thread can be deleted.
+    """
+    thread_id = None
+    for event in events:
+        if event.event == "thread.run.created":
+            thread_id = event.data.thread_id
+            if on_thread:
+                on_thread(thread_id)
+        elif event.event == "thread.message.delta":
+            for part in event.data.delta.content or []:
+                if part.type == "text" and part.text:
+                    sink.write(part.text.value)
+        elif event.event in ("thread.run.failed", "thread.run.cancelled", "thread.run.expired"):
+            raise run_failed(event.event.rsplit(".", 1)[1], event.data.last_error)
+        elif event.event == "thread.run.completed":
+            print("Processing completed.")
+    return thread_id
+
+
+def run_assistant(openai_client, instructions, content, model=DEFAULT_MODEL, registry=None,
+                  stream=True, stream_path=None, max_completion_tokens=MAX_COMPLETION_TOKENS,
+                  response_format=None):
+    """
+    Runs the registered assistant on the message and returns the raw response text.
+    The assistant is reused across runs and the thread, message and run are created
+    in a single request; the thread is deleted once the response has been read, or
+    the run has failed. The requests after the first (registering the assistant, run
+    polls, reading the messages, deleting the thread) also count against the
+    requests-per-minute limit of the scheduled call they are part of.
+    With stream=True the response is streamed into stream_path as it is generated;
+    otherwise (or if the SDK cannot stream) the run is polled until it completes.
+    response_format (e.g. a JSON schema) is applied to the run when given.
+    """
+    import openai
+
+    registry = registry or assistant_registry
+    format_kwargs = {"response_format": response_format} if response_format is not None else {}
+    start_time = time.monotonic()
+
+    # Step 2: Look up (or create) the Assistant for these instructions
+    with span("assistant_lookup", model=model):
+        assistant_id = registry.get_or_create(openai_client, instructions, model)
+
+    # Steps 3-6: Create a Thread with the message and run the Assistant on it
+    def start_run(**kwargs):
+        nonlocal assistant_id
+        try:
+            return openai_client.beta.threads.create_and_run(
+                assistant_id=assistant_id,
+                thread={"messages": [{"role": "user", "content": content}]},
+                max_completion_tokens=max_completion_tokens,
+                **format_kwargs,
+                **kwargs,
+            )
+        except openai.NotFoundError:
+            # The registered assistant was deleted on the account; register a new one.
+            registry.forget(assistant_id)
+            assistant_id = registry.get_or_create(openai_client, instructions, model)
+            follow_up_request()
+            return openai_client.beta.threads.create_and_run(
+                assistant_id=assistant_id,
+                thread={"messages": [{"role": "user", "content": content}]},
+                max_completion_tokens=max_completion_tokens,
+                **format_kwargs,
+                **kwargs,
+            )
+
+    # Every thread is deleted, also when the run fails, so retries do not leave them behind.
+    thread_ids = []
+    try:
+        if stream:
+            try:
+                with span("thread_run_create", stream=True):
+                    events = start_run(stream=True)
+            except TypeError:
+                print("Streaming is not available; polling for the result.")
+                stream = False
+
+        if stream:
+            # Step 7: Stream the Response as it is generated
+            sink = TokenSink(start_time, stream_path)
+            try:
+                with span("run_stream"):
+                    consume_run_stream(events, sink, thread_ids.append)
+            finally:
+                sink.close()
+            response_text = sink.text
+        else:
+            with span("thread_run_create", stream=False):
+                run = start_run()
+            thread_id = run.thread_id
+            thread_ids.append(thread_id)
+            print(f"Run started on thread {thread_id}. Processing...")
+
+            # Step 7: Wait for Completion & Retrieve the Response
+            with span("run_poll"):
+                wait_for_run(openai_client, thread_id, run.id)
+
+            # Step 8: Fetch Messages
+            with span("messages_list"):
+                follow_up_request()
+                messages = openai_client.beta.threads.messages.list(thread_id=thread_id)
+            print(f"Time to first token: {time.monotonic() - start_time:.2f}s")
+
+            # Extract assistant response
+            response_text = None
+            for msg in messages.data:
+                if msg.role == "assistant":
+                    for content in msg.content:
+                        if content.type == "text":
+                            response_text = content.text.value
+                            break
+    finally:
+        for thread_id in thread_ids:
+            with span("thread_delete"):
+                follow_up_request()
+                try:
+                    openai_client.beta.threads.delete(thread_id)
+                except openai.OpenAIError as e:
+                    print(f"Warning: Could not delete thread {thread_id}: {e}")
+
+    if not response_text:
+        raise ModelRequestError("No response received.", transient=True)
+
+    return response_text
+
+
+def chat_request_body(instructions, content, model=DEFAULT_MODEL, max_completion_tokens=MAX_COMPLETION_TOKENS,
+                      response_format=None):
+    """Returns the body of a chat completion request (also the body of a batch API request line)."""
+    request = dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": content},
+        ],
+        max_completion_tokens=max_completion_tokens,
+    )
+    if response_format is not None:
+        request["response_format"] = response_format
+    return request
+
+
+def run_chat_completion(openai_client, instructions, content, model=DEFAULT_MODEL, stream=True,
+                        stream_path=None, max_completion_tokens=MAX_COMPLETION_TOKENS, response_format=None):
+    """
+    Sends the message as a single chat completion request and returns the raw response text.
+    With stream=True the tokens are written to stream_path as they arrive.
+    """
+    start_time = time.monotonic()
+    request = chat_request_body(instructions, content, model, max_completion_tokens, response_format)
+
+    if stream:
+        sink = TokenSink(start_time, stream_path)
+        try:
+            for chunk in openai_client.chat.completions.create(stream=True, **request):
+                if chunk.choices:
+                    sink.write(chunk.choices[0].delta.content)
+        finally:
+            sink.close()
+        response_text = sink.text
+    else:
+        completion = openai_client.chat.completions.create(**request)
+        print(f"Time to first token: {time.monotonic() - start_time:.2f}s")
+        response_text = completion.choices[0].message.content if completion.choices else None
 
     if not response_text:
-        print("No response received.")
-        exit(1)
+        raise ModelRequestError("No response received.", transient=True)
+
+    return response_text
+
+
+class OpenAIBackend:
+    """
+    The OpenAI API, through the Assistants API ('assistant') or a single chat completion
+    request ('chat'). client may be an OpenAI client or a zero-argument callable returning
+    one; without it a client is created from api_key_file on first use.
+    """
+
+    name = "openai"
+
+    def __init__(self, client=None, api_mode="assistant", api_key_file="api_key.txt", registry=None):
+        if api_mode not in API_MODES:
+            raise ValueError(f"Invalid API mode: {api_mode}. Must be one of {', '.join(API_MODES)}.")
+        self.api_mode = api_mode
+        self.api_key_file = api_key_file
+        self.registry = registry
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    def openai_client(self):
+        if callable(self._client):
+            return self._client()
+        with self._client_lock:
+            if self._client is None:
+                # Step 1: Initialize OpenAI Client, unless a warm one was passed in
+                self._client = create_client(self.api_key_file)
+            return self._client
+
+    def response_cache_model(self, model):
+        """Returns the model name used in response cache keys."""
+        return model
+
+    def complete(self, instructions, content, model=DEFAULT_MODEL, max_completion_tokens=MAX_COMPLETION_TOKENS,
+                 response_format=None, stream=True, stream_path=None):
+        """Returns the raw response text for the message."""
+        if self.api_mode == "chat":
+            return run_chat_completion(
+                self.openai_client(), instructions, content, model=model, stream=stream, stream_path=stream_path,
+                max_completion_tokens=max_completion_tokens, response_format=response_format,
+            )
+        return run_assistant(
+            self.openai_client(), instructions, content, model=model, registry=self.registry, stream=stream,
+            stream_path=stream_path, max_completion_tokens=max_completion_tokens, response_format=response_format,
+        )
+
+
+class HTTPBackendError(ModelRequestError):
+    """An error status from an HTTP backend; carries status_code and the response headers for retries."""
+
+    def __init__(self, error):
+        detail = error.read().decode("utf-8", errors="replace")[:500]
+        super().__init__(
+            f"HTTP {error.code}: {detail or error.reason}",
+            transient=error.code in (408, 409, 429) or error.code >= 500,
+        )
+        self.status_code = error.code
+        self.response = error
+
+
+class HTTPBackend:
+    """
+    Any server that speaks the chat completions protocol at base_url, such as
+    scripts/fake_llm_server.py or a local model server. Requests are made with the
+    standard library, so neither api_key.txt nor network access to OpenAI is needed.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url=DEFAULT_LLM_URL, api_key=None, timeout=HTTP_BACKEND_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def response_cache_model(self, model):
+        # Responses of a stand-in server must never be served to real runs.
+        return f"{self.base_url}#{model}"
+
+    def complete(self, instructions, content, model=DEFAULT_MODEL, max_completion_tokens=MAX_COMPLETION_TOKENS,
+                 response_format=None, stream=True, stream_path=None):
+        """Returns the raw response text for the message."""
+        body = chat_request_body(instructions, content, model, max_completion_tokens, response_format)
+        if stream:
+            body["stream"] = True
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(
+            f"{self.base_url}/v1/chat/completions", data=json.dumps(body).encode("utf-8"), headers=headers,
+        )
+
+        start_time = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                if stream:
+                    sink = TokenSink(start_time, stream_path)
+                    try:
+                        for line in response:
+                            line = line.decode("utf-8").strip()
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            if chunk.get("choices"):
+                                sink.write(chunk["choices"][0].get("delta", {}).get("content"))
+                    finally:
+                        sink.close()
+                    response_text = sink.text
+                else:
+                    completion = json.load(response)
+                    print(f"Time to first token: {time.monotonic() - start_time:.2f}s")
+                    choices = completion.get("choices")
+                    response_text = choices[0]["message"]["content"] if choices else None
+        except urllib.error.HTTPError as e:
+            raise HTTPBackendError(e) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise ModelRequestError(f"Could not reach {self.base_url}: {e}", transient=True) from e
+
+        if not response_text:
+            raise ModelRequestError("No response received.", transient=True)
+
+        return response_text
+
+
+def parse_response(response_text, schema=None, fix_excerpt=None):
+    """
+    Parses the assistant's response text as JSON. Code fences are removed but the
+    content (including newlines in code snippets) is kept; malformed JSON goes through
+    a tolerant parse and, with fix_excerpt, targeted repairs (see structured_output.py).
+    """
+    with span("parse_response", characters=len(response_text)):
+        return parse_json_response(response_text, schema=schema, fix_excerpt=fix_excerpt)
 
-    # Step 9: Save Response to JSON File
-    cleaned_text = (
-        response_text.replace("```json\n", "").replace("\n```", "").replace("\n", "")
+
+def excerpt_fixer(backend, scheduler=None):
+    """Returns a fix_excerpt function that asks the model to correct a broken JSON excerpt."""
+    scheduler = scheduler or request_scheduler
+    if isinstance(backend, OpenAIBackend):
+        # Repairs are one-off requests, so they skip the Assistants API.
+        backend = OpenAIBackend(backend.openai_client, api_mode="chat")
+
+    def fix_excerpt(excerpt, error_message):
+        content = f"Parser error: {error_message}\n\nExcerpt:\n{excerpt}"
+        max_completion_tokens = estimate_tokens(excerpt) * 2 + 256
+        return scheduler.call(
+            lambda: backend.complete(
+                REPAIR_INSTRUCTIONS, content, max_completion_tokens=max_completion_tokens, stream=False,
+            ),
+            tokens=estimate_tokens(content) + max_completion_tokens,
+        )
+    return fix_excerpt
+
+
+def plan_model(generate_type, prompt_tokens, params=None, routing_rules=None):
+    """Returns the model and completion budget for a prompt (the defaults without routing_rules)."""
+    if not routing_rules:
+        return DEFAULT_MODEL, MAX_COMPLETION_TOKENS
+    plan = plan_request(generate_type, prompt_tokens, params or {}, routing_rules)
+    print(
+        f"Prompt is about {plan['prompt_tokens']} tokens; using {plan['model']} "
+        f"with a {plan['max_completion_tokens']}-token completion budget."
     )
+    return plan["model"], plan["max_completion_tokens"]
+
+
+def request_content(
+    generate_type, initial_prompt, response_structure, text_input, client=None, response_cache=None,
+    api_mode="assistant", stream=True, stream_path=None, params=None, routing_rules=None, structured=True,
+    scheduler=None, backend=None,
+):
+    """
+    Runs the model over the text input and returns the parsed JSON response.
+    backend is the model service (OpenAIBackend, HTTPBackend or anything with the same
+    complete() method). Without one, the OpenAI API is used with client, an OpenAI
+    client or a zero-argument callable returning one (only needed when the response is
+    not served from response_cache), and api_mode selects the Assistants API
+    ('assistant') or a single chat completion request ('chat').
+    When streaming, the raw response is written to stream_path as it arrives.
+    With routing_rules, the prompt is measured before sending and the model and
+    completion budget are picked from the rules (raising TokenBudgetExceeded if the
+    prompt fits no model); params are the prompt parameters used for the estimate.
+    With structured=True the API is asked for schema-conforming JSON (see
+    structured_output.response_format_for). A response that still fails to parse is
+    repaired around the error instead of being generated again.
+    Every model call goes through scheduler (default: request_scheduler), which applies
+    the rate limits and retries transient errors.
+    """
+    backend = backend or OpenAIBackend(client, api_mode)
+    instructions = build_instructions(generate_type)
+    content = build_message(generate_type, initial_prompt, response_structure, text_input)
+    scheduler = scheduler or request_scheduler
+    prompt_tokens = estimate_tokens(instructions) + estimate_tokens(content)
+
+    model, max_completion_tokens = plan_model(generate_type, prompt_tokens, params, routing_rules)
+    response_format = response_format_for(generate_type, response_structure) if structured else None
+
+    def complete():
+        with span("model_request", backend=backend.name, model=model, prompt_tokens=prompt_tokens) as attrs:
+            response_text = backend.complete(
+                instructions, content, model=model, max_completion_tokens=max_completion_tokens,
+                response_format=response_format, stream=stream, stream_path=stream_path,
+            )
+            attrs["completion_tokens"] = estimate_tokens(response_text)
+        count("prompt_tokens", prompt_tokens)
+        count("completion_tokens", attrs["completion_tokens"])
+        return response_text
+
+    model_called = False
+
+    def call_model():
+        nonlocal model_called
+        model_called = True
+        # Rate limits count the completion budget against the tokens-per-minute limit.
+        return scheduler.call(complete, tokens=prompt_tokens + max_completion_tokens)
+
+    # Step 9: Parse the response as JSON
+    schema = schema_from_structure(response_structure) if generate_type == "test" else None
+
+    def parse(response_text):
+        return parse_response(response_text, schema=schema, fix_excerpt=excerpt_fixer(backend, scheduler))
+
+    if response_cache is None:
+        return parse(call_model())
+    key = response_cache.key(
+        backend.response_cache_model(model), instructions, initial_prompt, response_structure, text_input,
+        response_format=response_format, max_completion_tokens=max_completion_tokens,
+    )
+    # Only responses that parse are stored, so a broken one is not replayed on later runs.
+    parsed_json = response_cache.fetch(key, call_model, parse=parse)
+    if not model_called:
+        count("response_cache_hits")
+    return parsed_json
+
+
+def request_content_chunked(
+    generate_type, params, custom_prompt, response_structure, pages, chunk_tokens, chunk_workers=4,
+    **request_kwargs
+):
+    """
+    Map-reduce generation for documents larger than chunk_tokens tokens.
+    The pages are grouped into chunks under the token budget, every chunk is sent
+    to the model in parallel, and the partial responses are merged into a single
+    response with the usual structure.
+    """
+    chunks = split_into_chunks(pages, chunk_tokens)
+    if len(chunks) == 1:
+        return request_content(
+            generate_type, get_prompt(generate_type, params, custom_prompt), response_structure,
+            chunks[0], params=params, **request_kwargs
+        )
+
+    print(f"Splitting the input into {len(chunks)} chunks of at most {chunk_tokens} tokens.")
+    count("chunks", len(chunks))
+    if generate_type == "test":
+        # Chunks that get no questions are not sent.
+        requests = question_chunks(chunks, params)
+    else:
+        requests = [(chunk, params) for chunk in chunks]
+
+    # Partial responses are not streamed to the shared stream file.
+    request_kwargs.pop("stream_path", None)
+    with ThreadPoolExecutor(max_workers=chunk_workers) as pool:
+        futures = [
+            pool.submit(
+                request_content, generate_type, get_prompt(generate_type, chunk_param, custom_prompt),
+                response_structure, chunk, params=chunk_param, **request_kwargs
+            )
+            for chunk, chunk_param in requests
+        ]
+        responses = [future.result() for future in futures]
+
+    return merge_chunk_responses(generate_type, responses, params)
+
+
+def generate_document(
+    generate_type, params, custom_prompt, response_structure, pages, chunk_tokens=None, chunk_workers=4,
+    routing_rules=None, on_overflow="chunk", **request_kwargs
+):
+    """
+    Generates the response for a whole document. The document is chunked when
+    chunk_tokens is set and the text is longer than that, or when the prompt would
+    overflow every model in routing_rules and on_overflow is 'chunk'; with
+    on_overflow='reject' an oversized prompt raises TokenBudgetExceeded before any
+    request is sent.
+    """
+    request_kwargs["routing_rules"] = routing_rules
+    if chunk_tokens:
+        return request_content_chunked(
+            generate_type, params, custom_prompt, response_structure, pages, chunk_tokens, chunk_workers,
+            **request_kwargs
+        )
 
-    # Parse the cleaned text as a JSON string
-    parsed_json = json.loads(cleaned_text)
+    try:
+        return request_content(
+            generate_type, get_prompt(generate_type, params, custom_prompt), response_structure,
+            "".join(pages), params=params, **request_kwargs
+        )
+    except TokenBudgetExceeded as e:
+        if on_overflow != "chunk":
+            raise
+        # Leave room for the prompt template and instructions around each chunk.
+        chunk_tokens = int(e.max_prompt_tokens * CHUNK_BUDGET_SHARE)
+        print(f"{e} Generating it in chunks of at most {chunk_tokens} tokens instead.")
+        return request_content_chunked(
+            generate_type, params, custom_prompt, response_structure, pages, chunk_tokens, chunk_workers,
+            **request_kwargs
+        )
 
-    with open("output/response.json", "w", encoding="utf-8") as json_file:
+
+def save_json(parsed_json, output_path):
+    """Writes the parsed response to output_path through a temp file and a rename."""
+    with open_atomic(output_path) as json_file:
         json.dump(parsed_json, json_file, indent=4, ensure_ascii=False)
 
-    print("Response saved to response.json")
+    print(f"Response saved to {output_path}")
+
+
+def generate_content(
+    generate_type, initial_prompt, response_structure, text_input, output_path=None,
+    client=None, response_cache=None, api_mode="assistant", stream=True, backend=None,
+) -> int:
+    # Without an output path the response goes to a new job directory of its own.
+    job = None
+    if output_path is None:
+        job = Job()
+        output_path = job.path("response", ".json")
+
+    parsed_json = request_content(
+        generate_type, initial_prompt, response_structure, text_input,
+        client=client, response_cache=response_cache, api_mode=api_mode,
+        stream=stream, stream_path=stream_path_for(output_path), backend=backend,
+    )
+
+    # Step 10: Save Response to JSON File
+    save_json(parsed_json, output_path)
+    if job:
+        job.finish(generate_type=generate_type)
 
     return 0
 
@@ -143,8 +872,7 @@ def generate_content(
 def get_prompt(prompt_type, params, custom_prompt_arg=None):
     """Generate the appropriate prompt for OpenAI based on the request type."""
     # If a custom prompt is provided via cmd, use it; otherwise use default.
-    if custom_prompt_arg:
-        custom_prompt = custom_prompt_arg
+    custom_prompt = custom_prompt_arg or ""
     
     if prompt_type == "test":
         num_of_american = params.get("num_of_american", 8)
@@ -166,6 +894,150 @@ def get_prompt(prompt_type, params, custom_prompt_arg=None):
         """
         return summary_prompt
 
+def add_extraction_arguments(parser):
+    """Adds the text extraction options to an argument parser."""
+    parser.add_argument(
+        "--extract-processes",
+        type=int,
+        help="Number of processes used to extract the pages of a large PDF (default: CPU count)."
+    )
+    parser.add_argument(
+        "--strip-annotations",
+        action="store_true",
+        help="Delete PDF annotations and clean each page's contents before extracting its text."
+    )
+    parser.add_argument(
+        "--ocr-dpi",
+        type=int,
+        help="OCR PDF pages that have no text layer (scanned pages), rendering them at this DPI, "
+             "e.g. 300. Pages with text are never OCR'd (default: no OCR)."
+    )
+    parser.add_argument(
+        "--no-compact",
+        action="store_true",
+        help="Send the extracted text as-is, without removing repeated headers/footers, page "
+             "numbers, extra whitespace and near-duplicate pages."
+    )
+
+
+def add_llm_arguments(parser):
+    """Adds the model request and response cache options to an argument parser."""
+    parser.add_argument(
+        "--api-mode",
+        choices=API_MODES,
+        default="assistant",
+        help="Use the Assistants API ('assistant') or a single chat completion request ('chat') "
+             "(default: 'assistant')."
+    )
+    parser.add_argument(
+        "--llm-backend",
+        choices=LLM_BACKENDS,
+        default="openai",
+        help="Model service: the OpenAI API ('openai', needs api_key.txt) or a chat completions "
+             "server at --llm-url ('http'), e.g. scripts/fake_llm_server.py for offline runs "
+             "(default: 'openai')."
+    )
+    parser.add_argument(
+        "--llm-url",
+        default=DEFAULT_LLM_URL,
+        help=f"Base URL of the server used with --llm-backend http (default: {DEFAULT_LLM_URL})."
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        help="Split inputs longer than this many tokens into chunks that are generated in "
+             "parallel and merged (default: send the whole input in one request)."
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=4,
+        help="Maximum number of chunk requests running at once per document (default: 4)."
+    )
+    parser.add_argument(
+        "--routing-config",
+        help="JSON file with the model tiers and completion budgets used to route each request "
+             "(default: built-in rules, see token_budget.py)."
+    )
+    parser.add_argument(
+        "--on-overflow",
+        choices=OVERFLOW_POLICIES,
+        default="chunk",
+        help="What to do when a prompt fits no configured model: generate it in chunks or reject "
+             "it before sending (default: 'chunk')."
+    )
+    parser.add_argument(
+        "--no-structured-output",
+        action="store_true",
+        help="Do not ask the API for schema-conforming JSON (exams get a strict schema inferred from "
+             "test_json_structure.json, summaries JSON mode)."
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Wait for the complete response instead of streaming it into <output>.stream.txt."
+    )
+    parser.add_argument(
+        "--llm-cache",
+        choices=CACHE_MODES,
+        default="auto",
+        help="Model response cache mode: 'auto' reuses identical earlier responses, 'record' always "
+             "calls the model and stores the response, 'replay' only serves stored responses "
+             "(offline), 'off' disables the cache (default: 'auto')."
+    )
+    parser.add_argument(
+        "--llm-cache-ttl",
+        type=float,
+        default=RESPONSE_CACHE_TTL / 86400,
+        help="Days after which a stored model response expires (default: 30)."
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        help="Requests-per-minute limit of the account; requests wait for capacity instead of "
+             "hitting 429 errors (default: no limit)."
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        help="Tokens-per-minute limit of the account, counting prompt and completion budget "
+             "(default: no limit)."
+    )
+    parser.add_argument(
+        "--max-concurrent-requests",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f"Maximum number of model requests in flight at once (default: {DEFAULT_MAX_CONCURRENCY})."
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help="Retries with jittered exponential backoff for rate limits, timeouts and server errors "
+             f"(default: {DEFAULT_MAX_RETRIES})."
+    )
+
+
+def response_cache_from_args(args):
+    """Builds the model response cache configured on the command line."""
+    return ResponseCache(mode=args.llm_cache, ttl=args.llm_cache_ttl * 86400)
+
+
+def backend_from_args(args, client=None):
+    """Builds the model backend configured on the command line."""
+    if args.llm_backend == "http":
+        return HTTPBackend(args.llm_url)
+    return OpenAIBackend(client, api_mode=args.api_mode)
+
+
+def scheduler_from_args(args):
+    """Builds the request scheduler configured on the command line."""
+    return RequestScheduler(
+        rpm=args.rpm, tpm=args.tpm, max_concurrency=args.max_concurrent_requests,
+        max_retries=args.max_retries, is_transient=is_transient_error,
+    )
+
+
 def parse_arguments():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(
@@ -192,6 +1064,19 @@ def parse_arguments():
         "--custom-prompt", "-c",
         help="Optional custom prompt to override the default prompt instructions."
     )
+    parser.add_argument(
+        "--output-file", "-o",
+        help="Path to the output JSON file (default: <input name>.json in a new job directory, see --output-dir)."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-extract the input file even if its text is already cached."
+    )
+    add_extraction_arguments(parser)
+    add_llm_arguments(parser)
+    add_job_arguments(parser)
+    add_trace_arguments(parser)
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -206,29 +1091,61 @@ if __name__ == "__main__":
         print(f"Custom prompt provided: {custom_prompt_arg}")
 
     # Load the appropriate response structure JSON
-    response_structure_file = "test_json_structure.json" if generate_type == "test" else "summary_json_structure.json"
-    with open(response_structure_file, "r", encoding="utf-8") as json_file:
-        response_structure = json.load(json_file)
+    response_structure = load_response_structure(generate_type)
 
     # Define the initial prompt parameters
-    params = {"num_of_american": 8, "num_of_open": 3} if generate_type == "test" else {}
-    initial_prompt = get_prompt(prompt_type=generate_type, params=params, custom_prompt_arg=custom_prompt_arg)
+    params = default_prompt_params(generate_type)
+
+    # Give the run its own job directory unless the output file is given
+    job = None
+    if not args.output_file:
+        job = job_from_args(args)
+        args.output_file = job.path(input_stem(input_file), ".json")
 
     # Extract text from the input file
-    if file_type == "pdf":
-        total_input = compress_pdf_to_text(input_file)
-    elif file_type == "pptx":
-        total_input = extract_text_from_pptx(input_file)
-    else:
+    try:
+        pages = extract_pages(
+            file_type, input_file, use_cache=not args.no_cache,
+            workers=args.extract_processes, strip_annotations=args.strip_annotations,
+            ocr_dpi=args.ocr_dpi,
+        )
+    except ValueError:
         print("Error: Unsupported file type.")
+        if job:
+            job.finish("failed", error="Unsupported file type.")
         sys.exit(1)
 
+    # Strip boilerplate before the text reaches the model
+    if not args.no_compact:
+        pages, report = compact_pages(pages)
+        print(format_report(report, input_file))
+
     # Generate content
-    result = generate_content(
-        generate_type=generate_type,
-        initial_prompt=initial_prompt,
-        response_structure=response_structure,
-        text_input=total_input,
-    )
+    try:
+        parsed_json = generate_document(
+            generate_type, params, custom_prompt_arg, response_structure, pages,
+            chunk_tokens=args.chunk_tokens,
+            chunk_workers=args.chunk_workers,
+            routing_rules=load_routing_rules(args.routing_config),
+            on_overflow=args.on_overflow,
+            response_cache=response_cache_from_args(args),
+            api_mode=args.api_mode,
+            stream=not args.no_stream,
+            stream_path=stream_path_for(args.output_file),
+            structured=not args.no_structured_output,
+            scheduler=scheduler_from_args(args),
+            backend=backend_from_args(args),
+        )
+    except (TokenBudgetExceeded, ResponseParseError, ModelRequestError) as e:
+        print(f"Error: {e}")
+        if job:
+            job.finish("failed", error=str(e))
+        sys.exit(1)
+
+    # Save Response to JSON File
+    save_json(parsed_json, args.output_file)
+    if job:
+        job.finish(generate_type=generate_type, input_file=input_file)
+    export_from_args(args)
 
-    print("Exit code:", result)
+    print("Exit code:", 0)
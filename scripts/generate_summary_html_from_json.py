@@ -1,14 +1,134 @@
 import argparse
+import io
 import json
 import ast
 import re
+from functools import lru_cache
 
+from html_assets import PageAssets, PageTemplate, add_asset_arguments, assets_from_args
+from job_output import open_atomic
+
+HEBREW_PATTERN = re.compile(r'[\u0590-\u05FF]')
+NUMBERED_ITEM_PATTERN = re.compile(r'\d+\.\s')
+NUMBERED_SPLIT_PATTERN = re.compile(r'\s*(?=\d+\.\s)')
+ANCHOR_STRIP_PATTERN = re.compile(r'[^\w\sא-ת]')
+ANCHOR_SPACE_PATTERN = re.compile(r'\s+')
+
+GOOGLE_FONT_LINK = '<link href="https://fonts.googleapis.com/css2?family=Assistant:wght@400;700&display=swap" rel="stylesheet">'
+STYLESHEET = """\
+body {
+    font-family: 'Assistant', sans-serif;
+    background-color: #faf7fc;
+    margin: 0;
+    padding: 0;
+    color: #2c2c2c;
+    direction: rtl;
+}
+.container {
+    max-width: 1000px;
+    margin: 40px auto;
+    padding: 30px;
+}
+h2 {
+    background-color: #8c4ca8;
+    color: white;
+    padding: 12px 20px;
+    border-radius: 8px;
+    margin-bottom: 20px;
+}
+p {
+    font-size: 16px;
+    line-height: 1.6;
+    background: white;
+    padding: 15px;
+    border-radius: 8px;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    margin-bottom: 20px;
+}
+nav {
+    background-color: #ffffff;
+    border: 1px solid #ddd;
+    border-radius: 8px;
+    padding: 20px;
+    margin-bottom: 30px;
+    box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+}
+nav h2 {
+    background: none;
+    color: #8c4ca8;
+    padding: 0;
+    margin-bottom: 10px;
+}
+nav ul {
+    list-style: none;
+    padding-right: 0;
+}
+nav li {
+    margin: 5px 0;
+}
+nav a {
+    color: #ab7cc3;
+    text-decoration: none;
+    font-weight: bold;
+}
+nav a:hover {
+    text-decoration: underline;
+}
+pre {
+    background-color: #eee;
+    padding: 15px;
+    border-radius: 6px;
+    overflow-x: auto;
+    direction: ltr;
+    text-align: left;
+    font-size: 14px;
+}
+li {
+    background: #F0EAF6;
+    color: #ab7cc3;
+    margin: 8px 0;
+    padding: 10px;
+    border-radius: 4px;
+}
+a.top-link {
+    display: inline-block;
+    margin-top: 10px;
+    font-size: 14px;
+    color: #ab7cc3;
+    text-decoration: none;
+}
+section {
+    background-color: #f6edf9;
+    padding: 25px;
+    border-radius: 12px;
+    margin-bottom: 40px;
+    box-shadow: 0 2px 8px rgba(140, 76, 168, 0.1);
+}
+
+"""
+PAGE_HEAD = PageTemplate("""<!DOCTYPE html>
+<html lang="he">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>סיכום</title>
+    {{font_link}}
+    {{styles}}
+</head>
+<body>
+    <a id="top"></a>
+    <div class="container">
+""")
+HTML_TAIL = "</div></body></html>"
+TOP_LINK = "<a class='top-link' href='#top'>↑ חזרה למעלה</a>"
+
+@lru_cache(maxsize=4096)
 def detect_direction(text):
     """
     Detects the writing direction based on the content.
     Returns "rtl" if Hebrew characters are present, otherwise "ltr".
     """
-    return "rtl" if re.search(r'[\u0590-\u05FF]', text) else "ltr"
+    return "rtl" if HEBREW_PATTERN.search(text) else "ltr"
 
 def is_probably_code(s):
     """
@@ -21,61 +141,90 @@ def is_probably_code(s):
         return True
     return False
 
-def format_list_to_html(lst):
-    """Recursively formats a list into nested HTML lists."""
-    html = "<ul>"
+def render_to_string(write_function, value):
+    """Runs a write_* function into a buffer and returns the HTML it wrote."""
+    buffer = io.StringIO()
+    write_function(buffer.write, value)
+    return buffer.getvalue()
+
+def write_list(write, lst):
+    """Recursively writes a list as nested HTML lists."""
+    write("<ul>")
     for item in lst:
-        html += f"<li>{format_value(item)}</li>"
-    html += "</ul>"
-    return html
+        write("<li>")
+        write_value(write, item)
+        write("</li>")
+    write("</ul>")
 
-def format_dict_to_html(data):
-    """Recursively formats dictionaries into nested HTML lists."""
-    html = "<ul>"
+def write_dict(write, data):
+    """Recursively writes dictionaries as nested HTML lists."""
+    write("<ul>")
     for key, value in data.items():
-        html += f"<li><strong>{key}:</strong> {format_value(value)}</li>"
-    html += "</ul>"
-    return html
+        write(f"<li><strong>{key}:</strong> ")
+        write_value(write, value)
+        write("</li>")
+    write("</ul>")
 
-def format_numbered_string(value):
+def write_numbered_string(write, value):
     """
-    Splits a string containing numbered list pattern and returns HTML fragments.
+    Splits a string containing numbered list pattern and writes the HTML fragments.
     """
-    items = re.split(r'\s*(?=\d+\.\s)', value.strip())
-    html = ""
-    if items and not re.match(r'\d+\.\s', items[0]):
-        html += f"<p dir='{detect_direction(items[0])}'>{items[0]}</p>"
+    items = NUMBERED_SPLIT_PATTERN.split(value.strip())
+    if items and not NUMBERED_ITEM_PATTERN.match(items[0]):
+        write(f"<p dir='{detect_direction(items[0])}'>{items[0]}</p>")
         items = items[1:]
-    html += "<ul class='numbered-list'>" + "".join(
-        f"<li dir='{detect_direction(item)}'>{item}</li>" for item in items if item != ''
-    ) + "</ul>"
-    return html
+    write("<ul class='numbered-list'>")
+    for item in items:
+        if item != '':
+            write(f"<li dir='{detect_direction(item)}'>{item}</li>")
+    write("</ul>")
 
-def format_value(value):
-    """Returns an HTML representation of the value with appropriate language direction."""
+def write_value(write, value):
+    """Writes an HTML representation of the value with appropriate language direction."""
     if isinstance(value, dict):
-        return format_dict_to_html(value)
+        write_dict(write, value)
     elif isinstance(value, list):
-        return format_list_to_html(value)
+        write_list(write, value)
     elif isinstance(value, str):
         # Handle code blocks first
         if is_probably_code(value):
-            return f"<pre><code class=\"code-block\">{value}</code></pre>"
+            write(f"<pre><code class=\"code-block\">{value}</code></pre>")
+            return
         # Handle numbered lists inside a string
-        if re.search(r'\d+\.\s', value):
-            return format_numbered_string(value)
+        if NUMBERED_ITEM_PATTERN.search(value):
+            write_numbered_string(write, value)
+            return
         # Handle strings that might be a list represented as text
         stripped = value.strip()
         if stripped.startswith('[') and stripped.endswith(']'):
             try:
                 parsed = ast.literal_eval(stripped)
-                if isinstance(parsed, list):
-                    return format_list_to_html(parsed)
             except Exception:
-                pass
-        return f"<p dir='{detect_direction(value)}'>{value}</p>"
+                parsed = None
+            if isinstance(parsed, list):
+                write_list(write, parsed)
+                return
+        write(f"<p dir='{detect_direction(value)}'>{value}</p>")
     else:
-        return f"<p dir='{detect_direction(str(value))}'>{str(value)}</p>"
+        write(f"<p dir='{detect_direction(str(value))}'>{str(value)}</p>")
+
+def format_list_to_html(lst):
+    """Recursively formats a list into nested HTML lists."""
+    return render_to_string(write_list, lst)
+
+def format_dict_to_html(data):
+    """Recursively formats dictionaries into nested HTML lists."""
+    return render_to_string(write_dict, data)
+
+def format_numbered_string(value):
+    """
+    Splits a string containing numbered list pattern and returns HTML fragments.
+    """
+    return render_to_string(write_numbered_string, value)
+
+def format_value(value):
+    """Returns an HTML representation of the value with appropriate language direction."""
+    return render_to_string(write_value, value)
 
 def sanitize_anchor(text):
     """
@@ -83,137 +232,40 @@ def sanitize_anchor(text):
     special characters with underscores.
     """
     # Remove non-alphanumeric Hebrew/Latin characters except spaces
-    anchor = re.sub(r'[^\w\sא-ת]', '', text)
+    anchor = ANCHOR_STRIP_PATTERN.sub('', text)
     # Replace spaces with underscores
-    anchor = re.sub(r'\s+', '_', anchor)
+    anchor = ANCHOR_SPACE_PATTERN.sub('_', anchor)
     return anchor
 
-def json_to_html(json_data, output_file="output/summary.html"):
+def write_html(write, json_data, assets=None, output_file=None):
+    """
+    Writes the summary page fragment by fragment: the table of contents first,
+    then one section per top-level key. Nothing is concatenated, so large
+    summaries render in linear time without holding the page in memory.
+    """
+    assets = assets or PageAssets()
+    anchors = [(key, sanitize_anchor(key)) for key in json_data]
+
+    PAGE_HEAD.render(write, **assets.head("summary", STYLESHEET, GOOGLE_FONT_LINK, 4, output_file))
+    write("<nav><h2>תוכן העניינים</h2><ul>")
+    for key, anchor in anchors:
+        write(f"<li><a href='#{anchor}'>{key}</a></li>")
+    write("</ul></nav>")
+
+    for key, anchor in anchors:
+        write(f"<section id='{anchor}'>")
+        write(f"<h2>{key}</h2>")
+        write_value(write, json_data[key])
+        write(TOP_LINK)
+        write("</section>")
+    write(HTML_TAIL)
+
+def json_to_html(json_data, output_file="output/summary.html", assets=None):
     if not isinstance(json_data, dict):
         raise ValueError("Input data must be a dictionary")
 
-    html_content = """<!DOCTYPE html>
-<html lang="he">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>סיכום</title>
-    <link href="https://fonts.googleapis.com/css2?family=Assistant:wght@400;700&display=swap" rel="stylesheet">
-    <style>
-        body {
-            font-family: 'Assistant', sans-serif;
-            background-color: #faf7fc;
-            margin: 0;
-            padding: 0;
-            color: #2c2c2c;
-            direction: rtl;
-        }
-        .container {
-            max-width: 1000px;
-            margin: 40px auto;
-            padding: 30px;
-        }
-        h2 {
-            background-color: #8c4ca8;
-            color: white;
-            padding: 12px 20px;
-            border-radius: 8px;
-            margin-bottom: 20px;
-        }
-        p {
-            font-size: 16px;
-            line-height: 1.6;
-            background: white;
-            padding: 15px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            margin-bottom: 20px;
-        }
-        nav {
-            background-color: #ffffff;
-            border: 1px solid #ddd;
-            border-radius: 8px;
-            padding: 20px;
-            margin-bottom: 30px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }
-        nav h2 {
-            background: none;
-            color: #8c4ca8;
-            padding: 0;
-            margin-bottom: 10px;
-        }
-        nav ul {
-            list-style: none;
-            padding-right: 0;
-        }
-        nav li {
-            margin: 5px 0;
-        }
-        nav a {
-            color: #ab7cc3;
-            text-decoration: none;
-            font-weight: bold;
-        }
-        nav a:hover {
-            text-decoration: underline;
-        }
-        pre {
-            background-color: #eee;
-            padding: 15px;
-            border-radius: 6px;
-            overflow-x: auto;
-            direction: ltr;
-            text-align: left;
-            font-size: 14px;
-        }
-        li {
-            background: #F0EAF6;
-            color: #ab7cc3;
-            margin: 8px 0;
-            padding: 10px;
-            border-radius: 4px;
-        }
-        a.top-link {
-            display: inline-block;
-            margin-top: 10px;
-            font-size: 14px;
-            color: #ab7cc3;
-            text-decoration: none;
-        }
-        section {
-            background-color: #f6edf9;
-            padding: 25px;
-            border-radius: 12px;
-            margin-bottom: 40px;
-            box-shadow: 0 2px 8px rgba(140, 76, 168, 0.1);
-        }
-
-    </style>
-</head>
-<body>
-    <a id="top"></a>
-    <div class="container">
-"""
-
-    toc = "<nav><h2>תוכן העניינים</h2><ul>"
-    sections = ""
-    for key, value in json_data.items():
-        anchor = sanitize_anchor(key)
-        toc += f"<li><a href='#{anchor}'>{key}</a></li>"
-        section_html = f"<section id='{anchor}'>"
-        section_html += f"<h2>{key}</h2>"
-        section_html += format_value(value)
-        section_html += "<a class='top-link' href='#top'>↑ חזרה למעלה</a>"
-        section_html += "</section>"
-        sections += section_html
-    toc += "</ul></nav>"
-
-    html_content += toc + sections
-    html_content += "</div></body></html>"
-
-    with open(output_file, "w", encoding="utf-8") as file:
-        file.write(html_content)
+    with open_atomic(output_file) as file:
+        write_html(file.write, json_data, assets, output_file)
 
     print(f"HTML file '{output_file}' generated successfully.")
 
@@ -234,6 +286,8 @@ def parse_arguments():
         help="Path to the output HTML file (default: 'output/summary.html')."
     )
 
+    add_asset_arguments(parser)
+
     return parser.parse_args()
 
 def main():
@@ -245,7 +299,7 @@ def main():
         data = json.load(json_file)
 
     # Convert the JSON data to HTML and save to the output file
-    json_to_html(data, output_file=args.output_file)
+    json_to_html(data, output_file=args.output_file, assets=assets_from_args(args))
 
 if __name__ == "__main__":
     main()
@@ -1,82 +1,87 @@
 import argparse
+import io
 import json
+import os
 import random
 
-# Function to generate HTML
-def generate_html(data):
-    html_content = """
+from html_assets import PageAssets, PageTemplate, add_asset_arguments, assets_from_args
+from job_output import open_atomic
+
+GOOGLE_FONT_LINK = '<link href="https://fonts.googleapis.com/css2?family=Assistant:wght@400;600&display=swap" rel="stylesheet">'
+STYLESHEET = """\
+body {
+    font-family: 'Assistant', sans-serif;
+    direction: rtl;
+    margin: 0;
+    padding: 0;
+    background-color: #faf7fc;
+    color: #2c3e50;
+}
+.container {
+    max-width: 900px;
+    margin: 40px auto;
+    padding: 40px;
+    background-color: #f6edf9;
+    border-radius: 16px;
+    box-shadow: 0 6px 20px rgba(0, 0, 0, 0.08);
+}
+h1, h2 {
+    text-align: center;
+    margin-bottom: 30px;
+    color: #8c4ca8;
+}
+.question, .open-question {
+    color: #8c4ca8;
+    margin-bottom: 35px;
+    padding: 24px;
+    background-color: #F5F3F7;
+    border-radius: 12px;
+    border-right: 6px solid #4929B9;
+    box-shadow: 0 2px 6px rgba(0, 0, 0, 0.05);
+}
+.question p, .open-question p {
+    font-size: 18px;
+    margin: 10px 0;
+}
+.options p {
+    margin: 8px 0;
+    padding: 10px 14px;
+    background-color: #FFFFFF;
+    border-radius: 8px;
+    transition: background-color 0.3s;
+}
+.options p:hover {
+    background-color: #dce3e8;
+}
+.answer, .answer-text {
+    font-weight: 600;
+    color: #8c4ca8;
+    margin-top: 18px;
+    display: none;
+}
+.show-answer-btn {
+    margin-top: 15px;
+    padding: 10px 20px;
+    background-color: #4929B9;
+    color: #fff;
+    border: none;
+    border-radius: 8px;
+    cursor: pointer;
+    transition: background-color 0.3s ease;
+}
+.show-answer-btn:hover {
+    background-color: #8c4ca8;
+}
+"""
+PAGE_HEAD = PageTemplate("""
     <!DOCTYPE html>
     <html lang="he">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>מבחן</title>
-        <link href="https://fonts.googleapis.com/css2?family=Assistant:wght@400;600&display=swap" rel="stylesheet">
-        <style>
-            body {
-                font-family: 'Assistant', sans-serif;
-                direction: rtl;
-                margin: 0;
-                padding: 0;
-                background-color: #faf7fc;
-                color: #2c3e50;
-            }
-            .container {
-                max-width: 900px;
-                margin: 40px auto;
-                padding: 40px;
-                background-color: #f6edf9;
-                border-radius: 16px;
-                box-shadow: 0 6px 20px rgba(0, 0, 0, 0.08);
-            }
-            h1, h2 {
-                text-align: center;
-                margin-bottom: 30px;
-                color: #8c4ca8;
-            }
-            .question, .open-question {
-                color: #8c4ca8;
-                margin-bottom: 35px;
-                padding: 24px;
-                background-color: #F5F3F7;
-                border-radius: 12px;
-                border-right: 6px solid #4929B9;
-                box-shadow: 0 2px 6px rgba(0, 0, 0, 0.05);
-            }
-            .question p, .open-question p {
-                font-size: 18px;
-                margin: 10px 0;
-            }
-            .options p {
-                margin: 8px 0;
-                padding: 10px 14px;
-                background-color: #FFFFFF;
-                border-radius: 8px;
-                transition: background-color 0.3s;
-            }
-            .options p:hover {
-                background-color: #dce3e8;
-            }
-            .answer, .answer-text {
-                font-weight: 600;
-                color: #8c4ca8;
-                margin-top: 18px;
-                display: none;
-            }
-            .show-answer-btn {
-                margin-top: 15px;
-                padding: 10px 20px;
-                background-color: #4929B9;
-                color: #fff;
-                border: none;
-                border-radius: 8px;
-                cursor: pointer;
-                transition: background-color 0.3s ease;
-            }
-            .show-answer-btn:hover {
-                background-color: #8c4ca8;
-            }
-        </style>
+        <title>{{title}}</title>
+        {{font_link}}
+        {{styles}}
 
         <script>
             function toggleAnswer(id) {
@@ -87,28 +92,64 @@ def generate_html(data):
     </head>
     <body>
         <div class="container">
-            <h1>מבחן</h1>
+            <h1>{{title}}</h1>
             <h2>שאלות רב-ברירה</h2>
+    """)
+PAGE_TAIL = """
+        </div>
+    </body>
+    </html>
     """
+EXAM_TITLE = "מבחן"
+VARIANT_TITLE = "מבחן - גרסה {seed}"
+KEY_TITLE = "מפתח תשובות - גרסה {seed}"
+# Printed before the options of variant exams so the answer key can refer to them.
+OPTION_LABELS = "אבגדהוזחטיכלמנסעפצקרשת"
+
+def render_head(assets, output_file, title):
+    """Returns the page head, shared by exams and answer keys."""
+    head = (assets or PageAssets()).head("test", STYLESHEET, GOOGLE_FONT_LINK, 8, output_file)
+    buffer = io.StringIO()
+    PAGE_HEAD.render(buffer.write, title=title, **head)
+    return buffer.getvalue()
+
+# Function to generate HTML
+def generate_html(data, assets=None, output_file=None, title=EXAM_TITLE, shuffle_options=True,
+                  label_options=False, show_answers=True, number_questions=False):
+    """
+    Renders the exam. Student copies use show_answers=False, which leaves out the
+    answers and their buttons, and number_questions=True, which prints the question
+    numbers the answer key refers to.
+    """
+    html_content = render_head(assets, output_file, title)
     
     # Add multiple choice questions with shuffled options
     for index, question in enumerate(data['exam']['multiple_choice']):
         options = question['options'].copy()
-        random.shuffle(options)
+        if shuffle_options:
+            random.shuffle(options)
+        number = f"{index + 1}. " if number_questions else ""
         html_content += f"""
         <div class="question">
-            <p>{question['question']}</p>
+            <p>{number}{question['question']}</p>
             <div class="options">
         """
-        for option in options:
-            html_content += f"<p>{option}</p>"
+        for position, option in enumerate(options):
+            label = f"{OPTION_LABELS[position]}. " if label_options and position < len(OPTION_LABELS) else ""
+            html_content += f"<p>{label}{option}</p>"
         
-        html_content += f"""
+        if show_answers:
+            html_content += f"""
             </div>
             <button class="show-answer-btn" onclick="toggleAnswer('answer{index}')">הצג תשובה</button>
             <p id="answer{index}" class="answer">תשובה נכונה: {question['answer']}</p>
         </div>
         """
+        else:
+            html_content += """
+            </div>
+        </div>
+        """
     
     html_content += """
             <h2>שאלות פתוחות</h2>
@@ -116,22 +157,138 @@ def generate_html(data):
     
     # Add open-ended questions
     for index, question in enumerate(data['exam']['open_questions']):
-        html_content += f"""
+        number = f"{index + 1}. " if number_questions else ""
+        if show_answers:
+            html_content += f"""
         <div class="open-question">
-            <p>{question['question']}</p>
+            <p>{number}{question['question']}</p>
             <button class="show-answer-btn" onclick="toggleAnswer('open-answer{index}')">הצג תשובה</button>
             <p id="open-answer{index}" class="answer-text">{question['answer']}</p>
         </div>
         """
+        else:
+            html_content += f"""
+        <div class="open-question">
+            <p>{number}{question['question']}</p>
+        </div>
+        """
     
+    html_content += PAGE_TAIL
+    
+    return html_content
+
+def parse_seeds(value):
+    """Parses a seed range such as "1-30", a list such as "3,7,11", or a mix of both."""
+    seeds = []
+    for part in value.split(","):
+        start, _, end = part.strip().partition("-")
+        seeds.extend(range(int(start), int(end) + 1) if end else [int(start)])
+    return seeds
+
+def make_variant(data, seed):
+    """
+    Returns a copy of the exam with the question order and the option order of every
+    multiple-choice question shuffled by random.Random(seed), so the same seed always
+    yields the same variant. The original position of each question is kept under
+    "variant" for the answer key.
+    """
+    rng = random.Random(seed)
+    exam = data['exam']
+
+    multiple_choice_order = list(range(len(exam['multiple_choice'])))
+    rng.shuffle(multiple_choice_order)
+    multiple_choice = []
+    for original in multiple_choice_order:
+        question = exam['multiple_choice'][original]
+        options = question['options'].copy()
+        rng.shuffle(options)
+        multiple_choice.append({**question, 'options': options})
+
+    open_questions_order = list(range(len(exam['open_questions'])))
+    rng.shuffle(open_questions_order)
+    open_questions = [exam['open_questions'][original] for original in open_questions_order]
+
+    return {
+        'exam': {**exam, 'multiple_choice': multiple_choice, 'open_questions': open_questions},
+        'variant': {
+            'seed': seed,
+            'multiple_choice_order': multiple_choice_order,
+            'open_questions_order': open_questions_order,
+        },
+    }
+
+def answer_key(variant):
+    """Returns the answer key of a variant: the label and text of each correct answer."""
+    multiple_choice = []
+    for number, (question, original) in enumerate(
+        zip(variant['exam']['multiple_choice'], variant['variant']['multiple_choice_order']), start=1
+    ):
+        options = [option.strip() for option in question['options']]
+        answer = question['answer'].strip()
+        # The model does not always repeat the option verbatim, so the label may be unknown.
+        label = OPTION_LABELS[options.index(answer)] if answer in options[:len(OPTION_LABELS)] else None
+        multiple_choice.append({
+            'number': number, 'original_number': original + 1, 'label': label, 'answer': question['answer'],
+        })
+    open_questions = [
+        {'number': number, 'original_number': original + 1, 'answer': question['answer']}
+        for number, (question, original) in enumerate(
+            zip(variant['exam']['open_questions'], variant['variant']['open_questions_order']), start=1
+        )
+    ]
+    return {'seed': variant['variant']['seed'], 'multiple_choice': multiple_choice, 'open_questions': open_questions}
+
+def generate_answer_key_html(key, assets=None, output_file=None):
+    """Renders the answer key of a variant as a printable page."""
+    html_content = render_head(assets, output_file, KEY_TITLE.format(seed=key['seed']))
     html_content += """
+        <div class="question">
+            <div class="options">
+        """
+    for entry in key['multiple_choice']:
+        label = f"{entry['label']}. " if entry['label'] else ""
+        html_content += f"<p>{entry['number']}. {label}{entry['answer']}</p>"
+    html_content += """
+            </div>
         </div>
-    </body>
-    </html>
+            <h2>שאלות פתוחות</h2>
+        <div class="open-question">
     """
-    
+    for entry in key['open_questions']:
+        html_content += f"<p>{entry['number']}. {entry['answer']}</p>"
+    html_content += """
+        </div>"""
+    html_content += PAGE_TAIL
     return html_content
 
+def write_variants(data, seeds, output_file, assets=None):
+    """
+    Writes one exam and one answer key per seed, next to output_file:
+    <name>_v<seed>.html and <name>_v<seed>_key.html, plus <name>_keys.json with
+    every key for automatic grading. Returns the paths of the exam files.
+    """
+    base, extension = os.path.splitext(output_file)
+    keys = []
+    exam_files = []
+    for seed in seeds:
+        variant = make_variant(data, seed)
+        key = answer_key(variant)
+        exam_file = f"{base}_v{seed}{extension}"
+        key_file = f"{base}_v{seed}_key{extension}"
+        with open_atomic(exam_file) as f:
+            f.write(generate_html(
+                variant, assets, exam_file, title=VARIANT_TITLE.format(seed=seed),
+                shuffle_options=False, label_options=True, show_answers=False, number_questions=True,
+            ))
+        with open_atomic(key_file) as f:
+            f.write(generate_answer_key_html(key, assets, key_file))
+        keys.append(key)
+        exam_files.append(exam_file)
+
+    with open_atomic(f"{base}_keys.json") as f:
+        json.dump(keys, f, ensure_ascii=False, indent=4)
+    return exam_files
+
 def parse_arguments():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(description="Generate HTML for an exam from a JSON file.")
@@ -148,6 +305,16 @@ def parse_arguments():
         help="Path to the output HTML file (default: 'output/exam.html')."
     )
 
+    parser.add_argument(
+        "--seeds", "-s",
+        type=parse_seeds,
+        default=None,
+        help="Write one shuffled exam variant and answer key per seed instead of a single exam, "
+             "e.g. '1-30' or '3,7,11'. The same seed always produces the same variant."
+    )
+
+    add_asset_arguments(parser)
+
     return parser.parse_args()
 
 def main():
@@ -158,11 +325,19 @@ def main():
     with open(args.input_file, "r", encoding="utf-8") as json_file:
         data = json.load(json_file)
 
+    assets = assets_from_args(args)
+
+    # Write one exam per seed from the same response
+    if args.seeds:
+        exam_files = write_variants(data, args.seeds, args.output_file, assets=assets)
+        print(f"{len(exam_files)} exam variants and answer keys generated next to {args.output_file}")
+        return
+
     # Generate the HTML
-    html_output = generate_html(data)
+    html_output = generate_html(data, assets=assets, output_file=args.output_file)
 
     # Save the output to a file
-    with open(args.output_file, 'w', encoding='utf-8') as f:
+    with open_atomic(args.output_file) as f:
         f.write(html_output)
 
     print(f"HTML file generated successfully: {args.output_file}")
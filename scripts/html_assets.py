@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import tempfile
+import textwrap
+import threading
+
+SLOT_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+FONT_FAMILY = "Assistant"
+FONT_FORMATS = {".woff2": "woff2", ".woff": "woff", ".ttf": "truetype", ".otf": "opentype"}
+ASSET_HASH_LENGTH = 10
+
+
+class PageTemplate:
+    """
+    A page skeleton with {{name}} slots, split once into literal text and slot names
+    so that rendering is a single pass of writes with no parsing or concatenation.
+    """
+
+    def __init__(self, source):
+        self.parts = SLOT_PATTERN.split(source)
+
+    def render(self, write, **slots):
+        """Writes the page, filling every slot from slots."""
+        for index, part in enumerate(self.parts):
+            # split() alternates literal text (even indexes) and slot names (odd indexes).
+            write(slots[part] if index % 2 else part)
+
+
+def inline_style(stylesheet, indent):
+    """Returns the <style> block for a stylesheet, indented to sit inside the page head."""
+    return "<style>\n" + textwrap.indent(stylesheet, " " * (indent + 4)) + " " * indent + "</style>"
+
+
+def font_face(font_href, font_file):
+    """Returns the @font-face rule for a self-hosted copy of the font."""
+    font_format = FONT_FORMATS.get(os.path.splitext(font_file)[1].lower(), "woff2")
+    return (
+        "@font-face {\n"
+        f"    font-family: '{FONT_FAMILY}';\n"
+        f"    src: url('{font_href}') format('{font_format}');\n"
+        "    font-weight: 400 700;\n"
+        "    font-display: swap;\n"
+        "}\n"
+    )
+
+
+def hashed_name(name, content, extension):
+    """Returns a cache-busting file name that changes whenever content changes."""
+    return f"{name}.{hashlib.sha256(content).hexdigest()[:ASSET_HASH_LENGTH]}{extension}"
+
+
+class PageAssets:
+    """
+    Decides how pages link their stylesheet and font.
+    Without a static directory the CSS is inlined and the font comes from Google
+    Fonts, exactly as before. With one, each stylesheet (and the font, if given) is
+    written there once under a content-hashed name and every page links to the
+    shared files, so a folder of reports downloads them once and works offline.
+    """
+
+    def __init__(self, static_dir=None, font_file=None):
+        if font_file and not static_dir:
+            raise ValueError("A self-hosted font needs a static directory to be copied into.")
+        self.static_dir = static_dir
+        self.font_file = font_file
+        self._written = {}
+        self._font = None
+        self._lock = threading.Lock()
+
+    def _write_asset(self, name, content, extension):
+        """Writes content to the static directory once and returns its path."""
+        key = (name, extension)
+        with self._lock:
+            if key not in self._written:
+                os.makedirs(self.static_dir, exist_ok=True)
+                path = os.path.join(self.static_dir, hashed_name(name, content, extension))
+                if not os.path.exists(path):
+                    fd, tmp_path = tempfile.mkstemp(dir=self.static_dir, suffix=".tmp")
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(content)
+                    os.replace(tmp_path, path)
+                self._written[key] = path
+            return self._written[key]
+
+    def _font_path(self):
+        """Copies the font into the static directory once and returns its path."""
+        if self._font is None:
+            with open(self.font_file, "rb") as f:
+                content = f.read()
+            extension = os.path.splitext(self.font_file)[1].lower()
+            self._font = self._write_asset(FONT_FAMILY.lower(), content, extension)
+        return self._font
+
+    @staticmethod
+    def _href(path, output_file):
+        """Returns the link to an asset relative to the page that uses it."""
+        page_dir = os.path.dirname(os.path.abspath(output_file)) if output_file else os.getcwd()
+        return os.path.relpath(os.path.abspath(path), page_dir).replace(os.sep, "/")
+
+    def head(self, name, stylesheet, google_font_link, indent, output_file=None):
+        """Returns the font_link and styles slots of a page head."""
+        if not self.static_dir:
+            return {"font_link": google_font_link, "styles": inline_style(stylesheet, indent)}
+
+        font_link = google_font_link
+        if self.font_file:
+            font_path = self._font_path()
+            stylesheet = font_face(os.path.basename(font_path), self.font_file) + stylesheet
+            font_link = (
+                f'<link rel="preload" href="{self._href(font_path, output_file)}" as="font" '
+                f'type="font/{os.path.splitext(font_path)[1].lstrip(".")}" crossorigin>'
+            )
+        css_path = self._write_asset(name, stylesheet.encode("utf-8"), ".css")
+        styles = f'<link rel="stylesheet" href="{self._href(css_path, output_file)}">'
+        return {"font_link": font_link, "styles": styles}
+
+
+def add_asset_arguments(parser):
+    """Adds the options that control how the HTML reports load their CSS and font."""
+    parser.add_argument(
+        "--static-dir",
+        default=None,
+        help="Write the CSS as shared, cache-busted files to this directory and link them "
+             "from every report instead of inlining them.",
+    )
+    parser.add_argument(
+        "--font-file",
+        default=None,
+        help="Self-host this font file (e.g. Assistant.woff2) in --static-dir instead of loading "
+             "it from Google Fonts.",
+    )
+
+
+def assets_from_args(args):
+    """Builds the PageAssets described by the command-line arguments."""
+    if args.font_file and not args.static_dir:
+        print("Error: --font-file requires --static-dir.")
+        exit(1)
+    return PageAssets(static_dir=args.static_dir, font_file=args.font_file)
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+JOBS_DIR = "jobs"
+# Written last, through a rename: a job directory with a manifest is complete.
+JOB_MANIFEST = "job.json"
+JOB_ID_PATTERN = re.compile(r"[\w.-]+")
+
+
+@contextmanager
+def open_atomic(path, mode="w", encoding="utf-8"):
+    """
+    Opens a temp file next to path for writing and renames it over path when the
+    block succeeds, so readers see either the old file or the complete new one,
+    never a partial write. On an error the temp file is removed and path is left as it was.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # The pid and a random suffix keep concurrent writers of the same path apart.
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, mode.replace("w", "x"), encoding=None if "b" in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_atomic(path, text):
+    """Writes text to path through a temp file and a rename."""
+    with open_atomic(path) as f:
+        f.write(text)
+
+
+def new_job_id():
+    """Returns a job ID that sorts by start time and is unique across processes and hosts."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class Job:
+    """
+    The outputs of one run, in their own directory output_dir/jobs/<job_id>. Creating
+    the directory claims the ID, so concurrent jobs never share files and need no
+    locks; job.json is written last and marks the job as finished.
+    """
+
+    def __init__(self, job_id=None, output_dir="output", create=True):
+        self.job_id = job_id or new_job_id()
+        if not JOB_ID_PATTERN.fullmatch(self.job_id):
+            raise ValueError(f"Invalid job ID {self.job_id!r}: use letters, digits, '.', '_' and '-'.")
+        self.output_dir = output_dir
+        self.directory = os.path.join(output_dir, JOBS_DIR, self.job_id)
+        if create:
+            os.makedirs(os.path.dirname(self.directory), exist_ok=True)
+            # Fails with FileExistsError if another run already holds this ID.
+            os.makedirs(self.directory)
+        self.started = time.time()
+
+    def path(self, name, extension=""):
+        """Returns the path of the output name + extension of this job."""
+        return os.path.join(self.directory, name + extension)
+
+    def finish(self, status="done", **details):
+        """Writes the job manifest, which marks the job as finished."""
+        manifest = {
+            "job_id": self.job_id,
+            "status": status,
+            "started": self.started,
+            "finished": time.time(),
+            "outputs": sorted(name for name in os.listdir(self.directory) if not name.endswith(".tmp")),
+            **details,
+        }
+        write_atomic(os.path.join(self.directory, JOB_MANIFEST), json.dumps(manifest, indent=4, ensure_ascii=False))
+        return manifest
+
+
+def input_stem(input_file):
+    """Returns the name of the outputs of input_file: its file name without the extension."""
+    return os.path.splitext(os.path.basename(input_file))[0]
+
+
+def add_job_arguments(parser):
+    """Adds the job output options to an argument parser."""
+    parser.add_argument(
+        "--output-dir",
+        default="output",
+        help=f"Write the outputs of the run to <output-dir>/{JOBS_DIR}/<job-id>/ (default: output)."
+    )
+    parser.add_argument(
+        "--job-id",
+        help="ID of the job directory; fails if it is already taken (default: the start time and a random suffix)."
+    )
+
+
+def job_from_args(args):
+    """Creates the job directory requested on the command line; exits if the ID is invalid or taken."""
+    try:
+        job = Job(args.job_id, args.output_dir)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+    except FileExistsError:
+        print(f"Error: Job {args.job_id} already exists in {os.path.join(args.output_dir, JOBS_DIR)}.")
+        exit(1)
+    print(f"Job {job.job_id}: writing outputs to {job.directory}")
+    return job
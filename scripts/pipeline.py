@@ -0,0 +1,195 @@
+import os
+import threading
+
+import generate_json
+import generate_summary_html_from_json
+import generate_test_html_from_json
+from compaction import compact_pages, format_report
+from html_assets import PageAssets
+from job_output import open_atomic
+from question_bank import avoid_questions_prompt, document_key
+from response_cache import ResponseCache
+from token_budget import DEFAULT_ROUTING_RULES
+from tracing import count, span
+
+
+class Pipeline:
+    """
+    Runs the extract, generate and render stages in-process.
+    The heavy imports happen once when this module is loaded and a single OpenAI
+    client is created lazily and reused for every job, so data moves between the
+    stages in memory instead of through subprocesses and intermediate files.
+    """
+
+    def __init__(self, api_key_file="api_key.txt", client=None, use_cache=True, response_cache=None,
+                 api_mode="assistant", stream=True, chunk_tokens=None, chunk_workers=4,
+                 extract_workers=None, strip_annotations=False, ocr_dpi=None, compaction=True,
+                 routing_rules=DEFAULT_ROUTING_RULES, on_overflow="chunk", assets=None, question_bank=None,
+                 structured_output=True, scheduler=None, backend=None):
+        self.api_key_file = api_key_file
+        self.use_cache = use_cache
+        self.extract_workers = extract_workers
+        self.strip_annotations = strip_annotations
+        self.ocr_dpi = ocr_dpi
+        self.compaction = compaction
+        self.api_mode = api_mode
+        self.stream = stream
+        self.chunk_tokens = chunk_tokens
+        self.chunk_workers = chunk_workers
+        self.routing_rules = routing_rules
+        self.on_overflow = on_overflow
+        self.assets = assets if assets is not None else PageAssets()
+        self.question_bank = question_bank
+        self.structured_output = structured_output
+        self.scheduler = scheduler if scheduler is not None else generate_json.request_scheduler
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        self._client = client
+        self._client_lock = threading.Lock()
+        # The OpenAI API through the shared client, unless another backend is given.
+        self.backend = backend if backend is not None else generate_json.OpenAIBackend(lambda: self.client, api_mode)
+        self._structures = {}
+
+    @property
+    def client(self):
+        """The shared OpenAI client, created on first use."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = generate_json.create_client(self.api_key_file)
+            return self._client
+
+    def response_structure(self, generate_type):
+        """Returns the response structure for the generate type, loading it once."""
+        if generate_type not in self._structures:
+            self._structures[generate_type] = generate_json.load_response_structure(generate_type)
+        return self._structures[generate_type]
+
+    # Stage functions
+
+    def compress_pdf_to_text(self, input_pdf_path):
+        return generate_json.compress_pdf_to_text(input_pdf_path)
+
+    def extract_text_from_pptx(self, pptx_path):
+        return generate_json.extract_text_from_pptx(pptx_path)
+
+    def generate_content(self, generate_type, initial_prompt, response_structure, text_input,
+                         output_path=None):
+        return generate_json.generate_content(
+            generate_type, initial_prompt, response_structure, text_input,
+            output_path=output_path, response_cache=self.response_cache, stream=self.stream,
+            backend=self.backend,
+        )
+
+    def json_to_html(self, json_data, output_file="output/summary.html"):
+        return generate_summary_html_from_json.json_to_html(json_data, output_file=output_file, assets=self.assets)
+
+    def generate_html(self, data, output_file=None):
+        return generate_test_html_from_json.generate_html(data, assets=self.assets, output_file=output_file)
+
+    # Whole-document steps
+
+    def extract(self, input_file, file_type):
+        """Extracts the text of a PDF or PPTX file as a list of pages (or slides)."""
+        return generate_json.extract_pages(
+            file_type, input_file, use_cache=self.use_cache,
+            workers=self.extract_workers, strip_annotations=self.strip_annotations,
+            ocr_dpi=self.ocr_dpi,
+        )
+
+    def compact(self, pages, name=None):
+        """Strips boilerplate from the extracted pages and reports the token savings."""
+        if not self.compaction:
+            return pages
+        with span("compact", file=name):
+            pages, report = compact_pages(pages)
+        count("tokens_saved", report["tokens_before"] - report["tokens_after"])
+        print(format_report(report, name))
+        return pages
+
+    def generate(self, generate_type, text_input, custom_prompt=None, params=None, output_json=None, source=None):
+        """
+        Sends the text to the model and returns the parsed JSON, optionally saving it.
+        text_input is either a string or the list of pages returned by extract().
+        Inputs above chunk_tokens, or too large for every model in routing_rules, are
+        generated chunk by chunk (see generate_json.generate_document).
+        With a question bank and the source file, exams are assembled from the bank
+        and the model is only asked for the questions the bank lacks.
+        """
+        if params is None:
+            params = generate_json.default_prompt_params(generate_type)
+        pages = [text_input] if isinstance(text_input, str) else text_input
+        with span("generate", generate_type=generate_type, file=source):
+            if generate_type == "test" and self.question_bank is not None and source:
+                data = self.generate_from_bank(pages, custom_prompt, params, output_json, source)
+            else:
+                data = self.request(generate_type, pages, custom_prompt, params, output_json)
+        if output_json:
+            generate_json.save_json(data, output_json)
+        return data
+
+    def generate_from_bank(self, pages, custom_prompt, params, output_json, source):
+        """Tops up the question bank for the source document and assembles an exam from it."""
+        key = document_key(source, custom_prompt)
+        missing = self.question_bank.missing(key, params)
+        if any(missing.values()) and self.question_bank.top_ups_exhausted(key):
+            print(
+                f"Question bank ({source}): the last top-ups only returned near-duplicates; "
+                "assembling the exam without a model call."
+            )
+        elif any(missing.values()):
+            print(
+                f"Question bank ({source}): requesting {missing['num_of_american']} American and "
+                f"{missing['num_of_open']} open questions."
+            )
+            known = self.question_bank.question_texts(key)
+            # A top-up of a bank that already holds questions must not be answered from the
+            # response cache: the cached questions are the ones just dropped as near-duplicates.
+            added, duplicates = self.question_bank.add(key, self.request(
+                "test", pages, avoid_questions_prompt(custom_prompt, known), missing, output_json,
+                use_response_cache=not known,
+            ))
+            self.question_bank.record_top_up(key, added)
+            print(f"Question bank ({source}): {added} questions added, {duplicates} near-duplicates dropped.")
+        else:
+            print(f"Question bank ({source}): assembling the exam without a model call.")
+        exam = self.question_bank.assemble(key, params)
+        if len(exam["exam"]["multiple_choice"]) < params.get("num_of_american", 0) or \
+                len(exam["exam"]["open_questions"]) < params.get("num_of_open", 0):
+            print(f"Warning: The question bank holds fewer questions than requested for {source}.")
+        return exam
+
+    def request(self, generate_type, pages, custom_prompt, params, output_json=None, use_response_cache=True):
+        """Asks the model for the response to the pages."""
+        return generate_json.generate_document(
+            generate_type, params, custom_prompt, self.response_structure(generate_type), pages,
+            chunk_tokens=self.chunk_tokens,
+            chunk_workers=self.chunk_workers,
+            routing_rules=self.routing_rules,
+            on_overflow=self.on_overflow,
+            response_cache=self.response_cache if use_response_cache else None,
+            stream=self.stream,
+            stream_path=generate_json.stream_path_for(output_json) if output_json else None,
+            structured=self.structured_output,
+            scheduler=self.scheduler,
+            backend=self.backend,
+        )
+
+    def render(self, generate_type, data, output_file):
+        """Renders the HTML report for the JSON data."""
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with span("render", generate_type=generate_type, file=output_file):
+            if generate_type == "summary":
+                self.json_to_html(data, output_file=output_file)
+            elif generate_type == "test":
+                with open_atomic(output_file) as f:
+                    f.write(self.generate_html(data, output_file))
+                print(f"HTML file generated successfully: {output_file}")
+            else:
+                raise ValueError(f"Invalid generate type: {generate_type}")
+        count("html_bytes", os.path.getsize(output_file))
+
+    def run(self, generate_type, input_file, file_type, output_file, custom_prompt=None, output_json=None):
+        """Runs all the stages for one document and returns the generated JSON."""
+        pages = self.compact(self.extract(input_file, file_type), input_file)
+        data = self.generate(generate_type, pages, custom_prompt, output_json=output_json, source=input_file)
+        self.render(generate_type, data, output_file)
+        return data
@@ -1,37 +1,149 @@
 import os
 import cv2
+import hashlib
 import pytesseract
 import numpy as np
 import io
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pptx import Presentation
 from PIL import Image
+from disk_cache import DiskCache, cache_key
+from tracing import count, span
+
+# Bump when the OCR preprocessing changes, so cached results are recomputed.
+OCR_VERSION = 1
+OCR_CACHE_DIR = os.path.join(".cache", "ocr")
+OCR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+OCR_PROGRESS_EVERY = 10
 
 # Set Tesseract path (Only for Windows, update if necessary)
 # pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
-def extract_text_from_pptx(pptx_path):
+def extract_text_from_pptx(pptx_path, workers=None, use_cache=True):
+    """
+    Extracts the text of every slide, including OCR of the pictures on it.
+    Each distinct image is OCR'd once: pictures are identified by the hash of their
+    bytes, looked up in the on-disk OCR cache, and the remaining ones are OCR'd on a
+    process pool.
+    """
+    start_time = time.monotonic()
     prs = Presentation(pptx_path)
-    all_text = []
+    slides = []
+    blobs = {}
 
     for slide_number, slide in enumerate(prs.slides, start=1):
-        slide_text = f"--- Slide {slide_number} ---\n"
+        # Each slide is a list of text fragments and image hashes, resolved after OCR
+        parts = [f"--- Slide {slide_number} ---\n"]
         
         # Extract text from slide shapes
         for shape in slide.shapes:
             if hasattr(shape, "text"):
-                slide_text += shape.text + "\n"
+                parts.append(shape.text + "\n")
 
-            # Extract text from images
+            # Collect images for OCR
             if shape.shape_type == 13:  # Shape type 13 = Picture
-                image = extract_image_from_shape(shape)
-                if image:
-                    ocr_text = extract_text_from_image(image)
-                    slide_text += f"\n[OCR from image]:\n{ocr_text}\n"
+                blob = extract_image_blob(shape)
+                if blob:
+                    digest = hashlib.sha256(blob).hexdigest()
+                    blobs.setdefault(digest, blob)
+                    parts.append(ImageRef(digest))
+
+        slides.append(parts)
+
+    image_count = sum(isinstance(part, ImageRef) for parts in slides for part in parts)
+    ocr_results = ocr_images(blobs, workers=workers, use_cache=use_cache)
 
+    all_text = []
+    for parts in slides:
+        slide_text = ""
+        for part in parts:
+            if isinstance(part, ImageRef):
+                if part.digest in ocr_results:
+                    slide_text += f"\n[OCR from image]:\n{ocr_results[part.digest]}\n"
+            else:
+                slide_text += part
         all_text.append(slide_text)
 
+    print(
+        f"Extracted {len(slides)} slides with {image_count} images "
+        f"({len(blobs)} unique) in {time.monotonic() - start_time:.2f}s."
+    )
     return "\n".join(all_text)
 
+class ImageRef:
+    """Placeholder for the OCR text of an image, identified by the hash of its bytes."""
+
+    def __init__(self, digest):
+        self.digest = digest
+
+def ocr_cache():
+    """Returns the on-disk cache of OCR results."""
+    return DiskCache(OCR_CACHE_DIR, max_bytes=OCR_CACHE_MAX_BYTES)
+
+def ocr_images(blobs, workers=None, use_cache=True):
+    """
+    OCRs each image in blobs ({hash: image bytes}) and returns {hash: text}.
+    Cached results are reused; the rest are OCR'd in parallel and added to the cache.
+    Images that cannot be decoded are left out of the result.
+    """
+    start_time = time.monotonic()
+    cache = ocr_cache() if use_cache else None
+    results = {}
+    missing = []
+    for digest in blobs:
+        cached = cache.get(cache_key(digest, OCR_VERSION)) if cache else None
+        if cached is not None:
+            results[digest] = cached
+        else:
+            missing.append(digest)
+
+    count("images_from_ocr_cache", len(blobs) - len(missing))
+    if missing:
+        with span("ocr", images=len(missing)), ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(ocr_image_bytes, blobs[digest]): digest for digest in missing}
+            for done, future in enumerate(as_completed(futures), start=1):
+                digest = futures[future]
+                text, ok = future.result()
+                if text is not None:
+                    results[digest] = text
+                if ok and cache:
+                    cache.set(cache_key(digest, OCR_VERSION), text)
+                count("images_ocrd")
+                if done % OCR_PROGRESS_EVERY == 0 or done == len(missing):
+                    print(f"OCR progress: {done}/{len(missing)} images")
+
+    print(
+        f"OCR summary: {len(blobs)} unique images, {len(blobs) - len(missing)} from cache, "
+        f"{len(missing)} OCR'd in {time.monotonic() - start_time:.2f}s."
+    )
+    return results
+
+def ocr_image_bytes(blob):
+    """
+    OCRs an encoded image in a worker process. Returns (text, ok), where ok is False
+    if OCR failed and text is the error message; text is None if the image can't be read.
+    """
+    try:
+        image = Image.open(io.BytesIO(blob))
+    except Exception as e:
+        print(f"Error extracting image: {e}")
+        return None, False
+    try:
+        return ocr_image(image), True
+    except Exception as e:
+        return f"Error processing image: {e}", False
+
+def extract_image_blob(shape):
+    """Returns the encoded image bytes of a PowerPoint picture shape."""
+    try:
+        if not hasattr(shape, "image"):
+            return None  # Skip if shape has no image
+        return shape.image.blob
+    except Exception as e:
+        print(f"Error extracting image: {e}")
+        return None
+
 def extract_image_from_shape(shape):
     """Extracts an image from a PowerPoint shape."""
     try:
@@ -46,24 +158,28 @@ def extract_image_from_shape(shape):
         print(f"Error extracting image: {e}")
         return None
 
-def extract_text_from_image(image):
-    """Uses OCR to extract text from an image."""
-    try:
-        # Convert PIL image to a NumPy array
-        img_array = np.array(image)
+def ocr_image(image):
+    """Runs OCR on a PIL image. Raises on failure."""
+    # Convert PIL image to a NumPy array
+    img_array = np.array(image)
+
+    # Ensure image is not empty
+    if img_array is None or img_array.size == 0:
+        raise ValueError("Empty image received")
 
-        # Ensure image is not empty
-        if img_array is None or img_array.size == 0:
-            return "Error: Empty image received"
+    # Convert to grayscale
+    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
 
-        # Convert to grayscale
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+    # Apply thresholding for noise reduction
+    processed_image = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-        # Apply thresholding for noise reduction
-        processed_image = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    # Perform OCR
+    return pytesseract.image_to_string(processed_image)
 
-        # Perform OCR
-        return pytesseract.image_to_string(processed_image)
+def extract_text_from_image(image):
+    """Uses OCR to extract text from an image."""
+    try:
+        return ocr_image(image)
     except Exception as e:
         return f"Error processing image: {e}"
 
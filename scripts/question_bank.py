@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from disk_cache import cache_key, sha256_file
+
+QUESTION_BANK_FILE = os.path.join(".cache", "question_bank.sqlite3")
+
+# Exam sections and the prompt parameter that asks for each of them.
+QUESTION_KINDS = {"multiple_choice": "num_of_american", "open_questions": "num_of_open"}
+
+# Questions are compared by MinHash signatures of their character shingles; two
+# questions of the same document whose estimated similarity reaches the threshold
+# are near-duplicates and only the first is kept.
+SHINGLE_SIZE = 5
+MINHASH_PERMUTATIONS = 64
+NEAR_DUPLICATE_SIMILARITY = 0.8
+_MERSENNE_PRIME = (1 << 61) - 1
+_permutation_rng = random.Random(0)
+_PERMUTATIONS = [
+    (_permutation_rng.randrange(1, _MERSENNE_PRIME), _permutation_rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+_NON_WORD_PATTERN = re.compile(r"[^\w]+")
+
+# Top-ups list at most this many of the stored questions as ones not to repeat.
+AVOID_QUESTIONS_LIMIT = 40
+# After this many top-ups in a row that add no question, the model is not asked again for the source.
+MAX_FAILED_TOP_UPS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    times_used INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_source_kind ON questions (source, kind);
+CREATE TABLE IF NOT EXISTS top_ups (
+    source TEXT PRIMARY KEY,
+    failed INTEGER NOT NULL
+);
+"""
+
+
+def document_key(input_file, custom_prompt=None):
+    """
+    Returns the bank key of a source document: the hash of its content, combined
+    with the custom prompt (if any) since that changes what kind of questions it yields.
+    """
+    digest = sha256_file(input_file)
+    return cache_key(digest, custom_prompt) if custom_prompt else digest
+
+
+def avoid_questions_prompt(custom_prompt, questions):
+    """Adds the questions already in the bank to the custom prompt as ones the model must not repeat."""
+    if not questions:
+        return custom_prompt
+    listed = "\n".join(f"- {question}" for question in questions)
+    avoid = f"Do not repeat or rephrase these questions, which the test bank already holds:\n{listed}"
+    return f"{custom_prompt}\n{avoid}" if custom_prompt else avoid
+
+
+def shingles(text):
+    """Returns the character n-grams of the text with case, punctuation and spacing normalized."""
+    text = _NON_WORD_PATTERN.sub(" ", text.lower()).strip()
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """Returns the MinHash signature of the text."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles(text)
+    ]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(first, second):
+    """Estimates the Jaccard similarity of two texts from their MinHash signatures."""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class QuestionBank:
+    """
+    Keeps every generated exam question in a local SQLite database, keyed by the
+    source document, so later exams for the same material can be assembled from
+    the bank instead of asking the model again. Near-duplicates are dropped on
+    insert, and assembly prefers the questions that were used least often.
+    """
+
+    def __init__(self, path=QUESTION_BANK_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Opens a connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def counts(self, source):
+        """Returns the number of stored questions of each kind for the source."""
+        with self._lock, self._connect() as connection:
+            rows = connection.execute(
+                "SELECT kind, COUNT(*) FROM questions WHERE source = ? GROUP BY kind", (source,)
+            ).fetchall()
+        counts = dict.fromkeys(QUESTION_KINDS, 0)
+        counts.update(rows)
+        return counts
+
+    def missing(self, source, params):
+        """Returns prompt parameters asking only for the questions the bank still lacks."""
+        counts = self.counts(source)
+        return {param: max(0, params.get(param, 0) - counts[kind]) for kind, param in QUESTION_KINDS.items()}
+
+    def question_texts(self, source, limit=AVOID_QUESTIONS_LIMIT):
+        """Returns the texts of up to limit stored questions of the source, newest first."""
+        with self._lock, self._connect() as connection:
+            rows = connection.execute(
+                "SELECT data FROM questions WHERE source = ? ORDER BY id DESC LIMIT ?", (source, limit)
+            ).fetchall()
+        return [json.loads(data).get("question", "") for (data,) in rows]
+
+    def record_top_up(self, source, added):
+        """Counts a top-up that added no question as failed; one that added questions resets the count."""
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT INTO top_ups (source, failed) VALUES (?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET failed = CASE WHEN ? THEN 0 ELSE failed + 1 END",
+                (source, 0 if added else 1, added),
+            )
+
+    def top_ups_exhausted(self, source):
+        """Returns whether the last MAX_FAILED_TOP_UPS top-ups for the source all added no question."""
+        with self._lock, self._connect() as connection:
+            row = connection.execute("SELECT failed FROM top_ups WHERE source = ?", (source,)).fetchone()
+        return row is not None and row[0] >= MAX_FAILED_TOP_UPS
+
+    def add(self, source, exam):
+        """Stores the questions of an exam response; returns (added, duplicates)."""
+        added = duplicates = 0
+        with self._lock, self._connect() as connection:
+            for kind in QUESTION_KINDS:
+                known = [
+                    json.loads(signature) for (signature,) in connection.execute(
+                        "SELECT signature FROM questions WHERE source = ? AND kind = ?", (source, kind)
+                    )
+                ]
+                for question in exam.get("exam", {}).get(kind, []):
+                    signature = minhash(question.get("question", ""))
+                    if any(similarity(signature, other) >= NEAR_DUPLICATE_SIMILARITY for other in known):
+                        duplicates += 1
+                        continue
+                    connection.execute(
+                        "INSERT INTO questions (source, kind, data, signature, created) VALUES (?, ?, ?, ?, ?)",
+                        (source, kind, json.dumps(question, ensure_ascii=False), json.dumps(signature), time.time()),
+                    )
+                    known.append(signature)
+                    added += 1
+        return added, duplicates
+
+    def assemble(self, source, params):
+        """
+        Builds an exam from the bank with up to the requested number of questions of
+        each kind, least used first (ties broken at random), and marks them as used.
+        """
+        exam = {}
+        with self._lock, self._connect() as connection:
+            for kind, param in QUESTION_KINDS.items():
+                rows = connection.execute(
+                    "SELECT id, data FROM questions WHERE source = ? AND kind = ? "
+                    "ORDER BY times_used, RANDOM() LIMIT ?",
+                    (source, kind, params.get(param, 0)),
+                ).fetchall()
+                connection.executemany(
+                    "UPDATE questions SET times_used = times_used + 1 WHERE id = ?", [(row[0],) for row in rows]
+                )
+                exam[kind] = [json.loads(data) for _, data in rows]
+        return {"exam": exam}
@@ -0,0 +1,69 @@
+import os
+
+from disk_cache import DiskCache, cache_key
+
+# auto:   serve hits from disk, call the model on a miss and store the response
+# record: always call the model and overwrite the stored response
+# replay: serve from disk only; a miss is an error (no network access needed)
+# off:    always call the model and store nothing
+CACHE_MODES = ("auto", "record", "replay", "off")
+
+RESPONSE_CACHE_DIR = os.path.join(".cache", "responses")
+RESPONSE_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+RESPONSE_CACHE_TTL = 30 * 24 * 60 * 60
+
+
+class ResponseCacheMiss(Exception):
+    """Raised in replay mode when no stored response matches the request."""
+
+
+class ResponseCache:
+    """
+    Stores raw model responses on disk, keyed by a hash of everything that
+    determines the request: model, instructions, prompt, response structure, input
+    text, response format and completion budget. Identical requests are answered from disk without a network call.
+    """
+
+    def __init__(self, mode="auto", directory=RESPONSE_CACHE_DIR, ttl=RESPONSE_CACHE_TTL,
+                 max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode: {mode}. Must be one of {', '.join(CACHE_MODES)}.")
+        self.mode = mode
+        self.cache = DiskCache(directory, max_bytes=max_bytes, ttl=ttl)
+
+    @staticmethod
+    def key(model, instructions, prompt, response_structure, text_input, response_format=None,
+            max_completion_tokens=None):
+        """Returns the cache key for a request."""
+        # A response truncated at a smaller budget, or produced without the schema, must not be reused.
+        return cache_key(
+            model, instructions, prompt, response_structure, text_input, response_format, max_completion_tokens
+        )
+
+    def fetch(self, key, call_model, parse=None):
+        """
+        Returns the response for key, calling call_model() only when the mode requires it.
+        With parse, returns parse(response) instead, and a response is only stored once
+        it parses, so a response that cannot be used is never replayed. A stored response
+        that no longer parses is treated as a miss (an error in replay mode).
+        """
+        if self.mode in ("auto", "replay"):
+            response_text = self.cache.get(key)
+            if response_text is not None:
+                print(f"Using cached response {key[:12]}")
+                if parse is None:
+                    return response_text
+                try:
+                    return parse(response_text)
+                except ValueError as e:
+                    if self.mode == "replay":
+                        raise
+                    print(f"Cached response {key[:12]} could not be parsed ({e}); calling the model again.")
+            elif self.mode == "replay":
+                raise ResponseCacheMiss(f"No cached response for request {key[:12]} (replay-only mode).")
+
+        response_text = call_model()
+        result = response_text if parse is None else parse(response_text)
+        if self.mode != "off":
+            self.cache.set(key, response_text)
+        return result
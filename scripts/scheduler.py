@@ -0,0 +1,180 @@
+import random
+import threading
+import time
+
+from tracing import count, span
+
+# Retry delays grow as RETRY_BASE_DELAY * 2**attempt up to RETRY_MAX_DELAY, with full jitter.
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_CONCURRENCY = 8
+
+# The scheduler running the current thread's call, for follow_up_request().
+_current = threading.local()
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute units per minute up to capacity (one minute's worth
+    by default). acquire() blocks until the requested amount is available; amounts
+    above the capacity wait for a full bucket instead of waiting forever.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Empties the bucket, e.g. after the server reported a rate limit."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.available = 0
+
+
+def retry_delay(attempt, error=None):
+    """
+    Returns how long to wait before retry number attempt (0-based): the server's
+    Retry-After header if it sent one, otherwise jittered exponential backoff.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class RequestScheduler:
+    """
+    Sits in front of every model call. Each call waits for a concurrency slot and
+    for the requests-per-minute and tokens-per-minute buckets, then runs; calls
+    that fail with a transient error (as decided by is_transient) are retried with
+    jittered exponential backoff. Queue wait times and retries are recorded so a
+    run can be tuned up to the account limits.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, is_transient=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.is_transient = is_transient or (lambda error: False)
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._lock = threading.Lock()
+        self._waits = []
+        self.retries = 0
+        self.failures = 0
+
+    def _wait_for_capacity(self, tokens):
+        """Blocks until the call may start; returns the time spent waiting."""
+        start = time.monotonic()
+        if self._slots:
+            self._slots.acquire()
+        try:
+            if self.requests:
+                self.requests.acquire(1)
+            if self.tokens and tokens:
+                self.tokens.acquire(tokens)
+        except BaseException:
+            if self._slots:
+                self._slots.release()
+            raise
+        return time.monotonic() - start
+
+    def call(self, function, tokens=0):
+        """Runs function() under the limits and returns its result, retrying transient errors."""
+        attempt = 0
+        while True:
+            with span("queue_wait"):
+                wait = self._wait_for_capacity(tokens)
+            with self._lock:
+                self._waits.append(wait)
+            previous, _current.scheduler = getattr(_current, "scheduler", None), self
+            try:
+                return function()
+            except Exception as e:
+                if not self.is_transient(e) or attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                if getattr(e, "status_code", None) == 429:
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.drain()
+                delay = retry_delay(attempt, e)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                count("retries")
+                print(f"Transient error ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s.")
+            finally:
+                _current.scheduler = previous
+                if self._slots:
+                    self._slots.release()
+            with span("retry_backoff", attempt=attempt):
+                time.sleep(delay)
+
+    def throttle(self):
+        """Waits for the requests-per-minute bucket; the caller already holds a concurrency slot."""
+        if self.requests:
+            self.requests.acquire(1)
+
+    def metrics(self):
+        """Returns the number of requests, retries and failures and the queue wait statistics."""
+        with self._lock:
+            waits = sorted(self._waits)
+            retries, failures = self.retries, self.failures
+        def percentile(share):
+            return waits[min(len(waits) - 1, int(share * len(waits)))] if waits else 0.0
+        return {
+            "requests": len(waits),
+            "retries": retries,
+            "failures": failures,
+            "queue_wait_total": sum(waits),
+            "queue_wait_p50": percentile(0.5),
+            "queue_wait_p95": percentile(0.95),
+            "queue_wait_max": waits[-1] if waits else 0.0,
+        }
+
+    def format_metrics(self):
+        """Returns a one-line description of metrics()."""
+        m = self.metrics()
+        return (
+            f"Model requests: {m['requests']} ({m['retries']} retries, {m['failures']} failed); "
+            f"queue wait p50 {m['queue_wait_p50']:.2f}s, p95 {m['queue_wait_p95']:.2f}s, "
+            f"max {m['queue_wait_max']:.2f}s, total {m['queue_wait_total']:.1f}s."
+        )
+
+
+def follow_up_request():
+    """
+    Counts a further API request made inside a scheduled call (e.g. polling an
+    Assistants run) against the requests-per-minute limit of that call's scheduler.
+    Outside a scheduled call it does nothing.
+    """
+    scheduler = getattr(_current, "scheduler", None)
+    if scheduler is not None:
+        scheduler.throttle()
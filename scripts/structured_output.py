@@ -0,0 +1,223 @@
+import json
+import re
+
+from tracing import count
+
+CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*\n(.*?)\n?```\s*$", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+
+# Characters of context around a parse error sent to the model in a repair request.
+REPAIR_WINDOW = 1500
+REPAIR_ATTEMPTS = 3
+REPAIR_INSTRUCTIONS = (
+    "You fix JSON syntax errors. You receive an excerpt of a larger JSON document and the "
+    "parser error inside it. Return the excerpt with only the syntax corrected (escape stray "
+    "quotes, add missing commas, colons or brackets), keeping every other character as it is. "
+    "The excerpt starts and ends mid-document, so do not balance brackets that open or close "
+    "outside it. Return only the corrected excerpt, without code fences or comments."
+)
+
+
+class ResponseParseError(ValueError):
+    """Raised when a model response cannot be parsed or repaired into JSON."""
+
+
+def schema_from_structure(structure):
+    """
+    Infers a strict JSON schema from an example structure such as test_json_structure.json:
+    every key of an object is required, no other keys are allowed, and arrays take the
+    schema of their first item.
+    """
+    if isinstance(structure, dict):
+        return {
+            "type": "object",
+            "properties": {key: schema_from_structure(value) for key, value in structure.items()},
+            "required": list(structure),
+            "additionalProperties": False,
+        }
+    if isinstance(structure, list):
+        return {"type": "array", "items": schema_from_structure(structure[0] if structure else "")}
+    if isinstance(structure, bool):
+        return {"type": "boolean"}
+    if isinstance(structure, (int, float)):
+        return {"type": "number"}
+    return {"type": "string"}
+
+
+def response_format_for(generate_type, response_structure):
+    """
+    Returns the response_format that makes the API emit valid JSON.
+    Exams have a fixed shape and get a strict schema inferred from their structure file.
+    Summaries use their structure's keys only as placeholders for section titles, so a
+    schema cannot name them; they get JSON mode, which still guarantees valid JSON.
+    """
+    if generate_type == "test":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "exam", "strict": True, "schema": schema_from_structure(response_structure)},
+        }
+    return {"type": "json_object"}
+
+
+def example_from_schema(schema, text="Canned response"):
+    """Returns a minimal value matching a JSON schema, for stand-ins that answer without a model."""
+    if schema.get("type") == "object":
+        return {key: example_from_schema(value, text) for key, value in schema.get("properties", {}).items()}
+    if schema.get("type") == "array":
+        return [example_from_schema(schema["items"], text)]
+    if schema.get("type") == "number":
+        return 0
+    if schema.get("type") == "boolean":
+        return False
+    return text
+
+
+def canned_response(body, text="Canned response"):
+    """Answers a chat completion request body with JSON in the shape its response_format asks for."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return json.dumps(example_from_schema(response_format["json_schema"]["schema"], text), ensure_ascii=False)
+    return json.dumps({text: text}, ensure_ascii=False)
+
+
+def strip_code_fences(text):
+    """Removes a Markdown code fence around the response, leaving its content untouched."""
+    match = CODE_FENCE_PATTERN.match(text)
+    return match.group(1) if match else text.strip()
+
+
+def close_truncated_json(text):
+    """
+    Cuts a truncated JSON document back to its last complete value and closes the
+    open objects and arrays, so a completion that ran out of tokens keeps everything
+    it finished. Returns None if nothing complete can be recovered.
+    """
+    stack = []
+    in_string = escaped = False
+    safe_cut = None
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            safe_cut = (index + 1, list(stack))
+        elif char in "}]":
+            if not stack:
+                break
+            stack.pop()
+            safe_cut = (index + 1, list(stack))
+            if not stack:
+                return text[:index + 1]
+        elif char == ",":
+            safe_cut = (index, list(stack))
+    if safe_cut is None:
+        return None
+    cut, open_brackets = safe_cut
+    return text[:cut] + "".join(reversed(open_brackets))
+
+
+def tolerant_loads(text):
+    """
+    Parses JSON leniently: raw newlines and tabs inside strings are accepted, text
+    around the outermost object is ignored, trailing commas are dropped and a
+    truncated document is closed after its last complete value.
+    Raises json.JSONDecodeError (for the unmodified text) if all of this fails.
+    """
+    text = strip_code_fences(text)
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError as error:
+        first_error = error
+
+    start = text.find("{")
+    if start != -1:
+        body = TRAILING_COMMA_PATTERN.sub(r"\1", text[start:text.rfind("}") + 1])
+        candidates = [body, close_truncated_json(TRAILING_COMMA_PATTERN.sub(r"\1", text[start:]))]
+        for candidate in candidates:
+            if not candidate:
+                continue
+            try:
+                return json.loads(candidate, strict=False)
+            except json.JSONDecodeError:
+                continue
+    raise first_error
+
+
+def repair_excerpt(text, error, fix_excerpt):
+    """Sends the text around a parse error to fix_excerpt and splices the corrected excerpt back."""
+    start = max(0, error.pos - REPAIR_WINDOW)
+    end = min(len(text), error.pos + REPAIR_WINDOW)
+    excerpt = text[start:end]
+    fixed = strip_code_fences(fix_excerpt(excerpt, f"{error.msg} at character {error.pos - start} of the excerpt"))
+    return text[:start] + fixed + text[end:]
+
+
+def conform_to_schema(value, schema):
+    """
+    Drops the array items that do not match the schema (e.g. a question without an
+    answer left by a truncated response) and fills in a missing required array with
+    an empty one (e.g. the open questions a truncated exam never reached). Returns
+    None if the value itself does not match.
+    """
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(value, dict):
+            return None
+        properties = schema.get("properties", {})
+        missing = [key for key in schema.get("required", []) if key not in value]
+        if any(properties.get(key, {}).get("type") != "array" for key in missing):
+            return None
+        value = {**value, **{key: [] for key in missing}}
+        conformed = {}
+        for key, item in value.items():
+            if key in properties:
+                item = conform_to_schema(item, properties[key])
+                if item is None:
+                    return None
+            conformed[key] = item
+        return conformed
+    if expected == "array":
+        if not isinstance(value, list):
+            return None
+        items = (conform_to_schema(item, schema["items"]) for item in value)
+        return [item for item in items if item is not None]
+    if expected == "string":
+        return value if isinstance(value, str) else None
+    return value
+
+
+def parse_json_response(response_text, schema=None, fix_excerpt=None):
+    """
+    Parses a model response as JSON without losing the completion to a stray character:
+    a tolerant parse first, then up to REPAIR_ATTEMPTS targeted repairs in which only
+    the text around the error is sent to fix_excerpt(excerpt, error_message) (if given).
+    With a schema, items that do not match it are dropped instead of failing the run.
+    """
+    text = strip_code_fences(response_text)
+    attempts = 0
+    while True:
+        try:
+            data = tolerant_loads(text)
+            break
+        except json.JSONDecodeError as error:
+            if fix_excerpt is None or attempts == REPAIR_ATTEMPTS:
+                raise ResponseParseError(f"Could not parse the response as JSON: {error}") from error
+            attempts += 1
+            count("json_repairs")
+            print(f"Response is not valid JSON ({error}); repairing the text around the error...")
+            text = repair_excerpt(text, error, fix_excerpt)
+
+    if schema is not None:
+        conformed = conform_to_schema(data, schema)
+        if conformed is None:
+            raise ResponseParseError("The response does not match the expected structure.")
+        data = conformed
+    return data
@@ -0,0 +1,109 @@
+import json
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate.
+    tiktoken = None
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in text.
+    Uses tiktoken when it is installed; otherwise assumes about 4 characters per
+    token for ASCII text and 2 per token for other scripts such as Hebrew, which
+    tokenize less efficiently.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - non_ascii + 3) // 4 + (non_ascii + 1) // 2
+
+
+# Models are tried in order; a request goes to the first one whose context window
+# fits the prompt plus its completion budget. Override with --routing-config.
+DEFAULT_ROUTING_RULES = {
+    "tiers": [
+        {"model": "gpt-4o-mini", "context_window": 128000, "max_completion_tokens": 16384},
+        {"model": "gpt-4.1-mini", "context_window": 1047576, "max_completion_tokens": 32768},
+    ],
+    "completion_budget": {
+        # Summaries grow with the input; exams grow with the number of questions.
+        "summary": {"min_tokens": 4000, "input_ratio": 0.5},
+        "test": {"base_tokens": 1500, "tokens_per_question": 350},
+    },
+}
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a prompt does not fit the context window of any configured model."""
+
+    def __init__(self, prompt_tokens, max_prompt_tokens):
+        super().__init__(
+            f"The prompt is about {prompt_tokens} tokens, but at most {max_prompt_tokens} fit the "
+            f"largest configured model."
+        )
+        self.prompt_tokens = prompt_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+
+
+def merge_rules(defaults, overrides):
+    """Merges overrides into defaults key by key; lists (such as the tiers) are replaced whole."""
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = merge_rules(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+def load_routing_rules(path=None):
+    """
+    Loads routing rules from a JSON file, falling back to the defaults for every
+    section and setting the file leaves out (e.g. the budget of the other generate type).
+    """
+    if not path:
+        return DEFAULT_ROUTING_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    return merge_rules(DEFAULT_ROUTING_RULES, rules)
+
+
+def completion_budget(generate_type, prompt_tokens, params, rules):
+    """Returns the number of completion tokens the response is expected to need."""
+    budget = rules["completion_budget"][generate_type]
+    if generate_type == "test":
+        questions = params.get("num_of_american", 0) + params.get("num_of_open", 0)
+        return budget["base_tokens"] + budget["tokens_per_question"] * questions
+    return max(budget["min_tokens"], int(prompt_tokens * budget["input_ratio"]))
+
+
+def plan_request(generate_type, prompt_tokens, params, rules=None):
+    """
+    Picks the model and completion budget for a prompt of prompt_tokens tokens.
+    Returns {"model", "max_completion_tokens", "prompt_tokens"}; raises
+    TokenBudgetExceeded if the prompt fits no configured model.
+    """
+    rules = rules or DEFAULT_ROUTING_RULES
+    wanted = completion_budget(generate_type, prompt_tokens, params, rules)
+    for tier in rules["tiers"]:
+        max_completion_tokens = min(wanted, tier["max_completion_tokens"])
+        if prompt_tokens + max_completion_tokens <= tier["context_window"]:
+            return {
+                "model": tier["model"],
+                "max_completion_tokens": max_completion_tokens,
+                "prompt_tokens": prompt_tokens,
+            }
+    raise TokenBudgetExceeded(prompt_tokens, max_prompt_tokens(rules))
+
+
+def max_prompt_tokens(rules=None):
+    """Returns the largest prompt that fits any configured model with its full completion budget."""
+    rules = rules or DEFAULT_ROUTING_RULES
+    return max(tier["context_window"] - tier["max_completion_tokens"] for tier in rules["tiers"])
@@ -0,0 +1,188 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Records timing spans and counters for the stages of a run. Spans nest per thread
+    (each records its parent), and every event carries its process and thread, so
+    the events of worker processes can be merged in and shown on their own tracks.
+    Events can be written as JSON lines or as a Chrome trace (chrome://tracing or
+    https://ui.perfetto.dev), and summarized per span name and counter.
+    """
+
+    def __init__(self, max_events=None):
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the block as a span. Yields the span's attributes, so results known only
+        at the end (e.g. a token count) can be added to them.
+        """
+        stack = self._stack()
+        event = {
+            "type": "span", "name": name, "id": f"{os.getpid()}-{next(self._ids)}",
+            "parent": stack[-1] if stack else None, "pid": os.getpid(), "tid": threading.get_ident(),
+            "start": time.time(), "attrs": attrs,
+        }
+        stack.append(event["id"])
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            event["duration"] = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self.events.append(event)
+
+    def count(self, name, value=1, **attrs):
+        """Adds value to the counter name."""
+        event = {
+            "type": "counter", "name": name, "value": value, "pid": os.getpid(),
+            "tid": threading.get_ident(), "time": time.time(), "attrs": attrs,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def merge(self, events):
+        """Adds events recorded elsewhere, e.g. in a worker process."""
+        with self._lock:
+            self.events.extend(events)
+
+    def limit(self, max_events):
+        """Keeps only the newest max_events events from now on, e.g. in a long-running process."""
+        with self._lock:
+            self.events = deque(self.events, maxlen=max_events)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.events)
+
+    def summary(self):
+        """Returns the count, total, mean, p95 and max duration of each span name and the counter totals."""
+        durations = {}
+        counters = {}
+        for event in self.snapshot():
+            if event["type"] == "span":
+                durations.setdefault(event["name"], []).append(event["duration"])
+            else:
+                counters[event["name"]] = counters.get(event["name"], 0) + event["value"]
+        spans = {}
+        for name, values in durations.items():
+            values.sort()
+            spans[name] = {
+                "count": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values),
+                "p95": values[min(len(values) - 1, int(0.95 * len(values)))],
+                "max": values[-1],
+            }
+        return {"spans": spans, "counters": counters}
+
+    def format_summary(self):
+        """Returns the summary as a table, slowest stages first."""
+        summary = self.summary()
+        lines = [f"{'Stage':<24} {'Count':>6} {'Total':>9} {'Mean':>8} {'p95':>8} {'Max':>8}"]
+        for name, stats in sorted(summary["spans"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(
+                f"{name:<24} {stats['count']:>6} {stats['total']:>8.2f}s {stats['mean']:>7.2f}s "
+                f"{stats['p95']:>7.2f}s {stats['max']:>7.2f}s"
+            )
+        if summary["counters"]:
+            lines.append("")
+            lines.extend(f"{name:<24} {value:>10g}" for name, value in sorted(summary["counters"].items()))
+        return "\n".join(lines)
+
+    def write_jsonl(self, path):
+        """Writes one JSON object per span or counter event."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in self.snapshot():
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def write_chrome_trace(self, path):
+        """Writes the events in the Chrome trace event format; counters become running totals."""
+        trace_events = []
+        totals = {}
+        for event in sorted(self.snapshot(), key=lambda event: event.get("start", event.get("time"))):
+            if event["type"] == "span":
+                trace_events.append({
+                    "name": event["name"], "ph": "X", "pid": event["pid"], "tid": event["tid"],
+                    "ts": event["start"] * 1e6, "dur": event["duration"] * 1e6,
+                    "args": {key: str(value) for key, value in event["attrs"].items()},
+                })
+            else:
+                totals[event["name"]] = totals.get(event["name"], 0) + event["value"]
+                trace_events.append({
+                    "name": event["name"], "ph": "C", "pid": event["pid"], "ts": event["time"] * 1e6,
+                    "args": {event["name"]: totals[event["name"]]},
+                })
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+# Shared by every stage in the process; worker processes record into their own (see call_traced).
+tracer = Tracer()
+
+
+def span(name, **attrs):
+    """Times a block on the shared tracer."""
+    return tracer.span(name, **attrs)
+
+
+def count(name, value=1, **attrs):
+    """Adds to a counter on the shared tracer."""
+    tracer.count(name, value, **attrs)
+
+
+def call_traced(function, *args, **kwargs):
+    """
+    Runs function in a worker process with a fresh tracer and returns (result, events),
+    so the parent can merge the worker's spans into its own trace.
+    """
+    global tracer
+    previous, tracer = tracer, Tracer()
+    try:
+        return function(*args, **kwargs), tracer.events
+    finally:
+        tracer = previous
+
+
+def add_trace_arguments(parser):
+    """Adds the trace export options to an argument parser."""
+    parser.add_argument(
+        "--trace-jsonl",
+        help="Write the per-stage timing spans and counters of the run to this file as JSON lines."
+    )
+    parser.add_argument(
+        "--trace-chrome",
+        help="Write the spans and counters as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev)."
+    )
+
+
+def export_from_args(args):
+    """Writes the trace files requested on the command line."""
+    if args.trace_jsonl:
+        tracer.write_jsonl(args.trace_jsonl)
+        print(f"Trace written to {args.trace_jsonl}")
+    if args.trace_chrome:
+        tracer.write_chrome_trace(args.trace_chrome)
+        print(f"Chrome trace written to {args.trace_chrome}")
@@ -0,0 +1,240 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+WATCH_QUEUE_FILE = os.path.join("output", "watch_queue.sqlite3")
+DEFAULT_DEBOUNCE = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify event bits (see inotify(7)). Writes in progress are not watched: the
+# debounce waits for a file to stop changing, and closing or moving it in wakes the scan.
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_READ_SIZE = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    job_dir TEXT,
+    error TEXT,
+    queued REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (path, digest)
+);
+CREATE INDEX IF NOT EXISTS files_status ON files (status, id);
+"""
+
+
+class FileQueue:
+    """
+    A persistent queue of the files found by the watcher, in a local SQLite database.
+    Every file is queued once per content hash, so restarting the watcher neither
+    loses queued files nor processes finished ones again; a file is only queued
+    anew when its content changes.
+    """
+
+    def __init__(self, path=WATCH_QUEUE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Opens a connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def recover(self):
+        """Queues again the files that were being processed when the last watcher stopped; returns their number."""
+        with self._lock, self._connect() as connection:
+            return connection.execute(
+                "UPDATE files SET status = 'queued', updated = ? WHERE status = 'running'", (time.time(),)
+            ).rowcount
+
+    def add(self, path, digest):
+        """Queues the file unless this content of it was queued before; returns whether it was queued."""
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            return connection.execute(
+                "INSERT OR IGNORE INTO files (path, digest, status, queued, updated) VALUES (?, ?, 'queued', ?, ?)",
+                (path, digest, now, now),
+            ).rowcount == 1
+
+    def claim(self):
+        """Marks the oldest queued file as running and returns (id, path), or None if the queue is empty."""
+        with self._lock, self._connect() as connection:
+            while True:
+                row = connection.execute(
+                    "SELECT id, path FROM files WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                # The status check makes the claim safe against another watcher on the same queue.
+                claimed = connection.execute(
+                    "UPDATE files SET status = 'running', attempts = attempts + 1, updated = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (time.time(), row[0]),
+                ).rowcount
+                if claimed:
+                    return row
+
+    def finish(self, file_id, status, job_dir=None, error=None):
+        """Records the outcome ('done' or 'failed') of a claimed file."""
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "UPDATE files SET status = ?, job_dir = ?, error = ?, updated = ? WHERE id = ?",
+                (status, job_dir, error, time.time(), file_id),
+            )
+
+    def counts(self):
+        """Returns the number of files in each status."""
+        with self._lock, self._connect() as connection:
+            return dict(connection.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+
+class InotifyWatcher:
+    """Wakes up when files are created, written or moved into watched directories (Linux only, via ctypes)."""
+
+    name = "inotify"
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = set()
+
+    def watch(self, directory):
+        """Adds a directory to the watch; directories already watched are skipped."""
+        if directory in self.directories:
+            return
+        if self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            raise OSError(ctypes.get_errno(), f"Could not watch {directory}")
+        self.directories.add(directory)
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds for an event; returns whether one arrived."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        # Only the wake-up matters: the scan that follows finds what changed.
+        try:
+            while os.read(self.fd, INOTIFY_READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Sleeps between scans, for systems without inotify."""
+
+    name = "polling"
+
+    def watch(self, directory):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+def create_watcher(polling=False):
+    """Returns an inotify watcher, or a polling one if polling is set or inotify is not available."""
+    if not polling:
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+
+def try_watch(watcher, directory, unwatched):
+    """
+    Adds directory to the watcher and returns whether it is watched. A directory that
+    cannot be watched (the inotify watch limit is reached, or it was removed) is still
+    scanned every poll interval, so the error is reported once, with the directory
+    recorded in unwatched, instead of stopping the watcher.
+    """
+    try:
+        watcher.watch(directory)
+    except OSError as e:
+        if directory not in unwatched:
+            print(f"Warning: {e}; its files are found by polling instead.")
+            unwatched.add(directory)
+        return False
+    unwatched.discard(directory)
+    return True
+
+
+class FolderScanner:
+    """
+    Finds the files that are ready to process. A file is ready once its size and
+    modification time have not changed for debounce seconds, so a file that is
+    still being copied into the folder is not picked up half-written. Each version
+    of a file is reported once.
+    """
+
+    def __init__(self, list_files, debounce=DEFAULT_DEBOUNCE):
+        self.list_files = list_files
+        self.debounce = debounce
+        self._changing = {}  # path -> ((size, mtime), time first seen with them)
+        self._reported = {}  # path -> (size, mtime) when it was reported
+
+    def scan(self, now=None):
+        """Returns the files that became ready since the last scan."""
+        now = time.time() if now is None else now
+        ready = []
+        present = set()
+        for path in self.list_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            present.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._reported.get(path) == signature:
+                continue
+            previous = self._changing.get(path)
+            if previous is None or previous[0] != signature:
+                self._changing[path] = (signature, now)
+            elif now - previous[1] >= self.debounce:
+                del self._changing[path]
+                self._reported[path] = signature
+                ready.append(path)
+        for path in set(self._changing) - present:
+            del self._changing[path]
+        for path in set(self._reported) - present:
+            del self._reported[path]
+        return ready
+
+    def timeout(self, poll_interval, now=None):
+        """Returns how long to wait before the next scan: the poll interval, or less if a file settles sooner."""
+        now = time.time() if now is None else now
+        deadlines = [since + self.debounce - now for _, since in self._changing.values()]
+        return max(0.0, min([poll_interval] + deadlines))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under test import each other by name, as automate_workflow.py runs them.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
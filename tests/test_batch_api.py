@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("pptx")
+
+from batch_api import LocalBatchProvider, collect_batch, load_state, parse_result_lines, submit_batch
+from structured_output import canned_response
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE = "Gradient descent updates the weights against the gradient of the loss. " * 20
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs from the repository root, where the response structures live, with outputs in tmp_path."""
+    monkeypatch.chdir(REPO_DIR)
+    return tmp_path
+
+
+def documents(tmp_path, pages_by_name):
+    return {
+        name: {
+            "input_file": f"{name}.pdf",
+            "pages": pages,
+            "output_json": str(tmp_path / f"{name}.json"),
+            "output_file": str(tmp_path / f"{name}.html"),
+        }
+        for name, pages in pages_by_name.items()
+    }
+
+
+def test_result_lines_map_custom_ids_to_responses_and_errors():
+    success = {"status_code": 200, "body": {"choices": [{"message": {"content": "{}"}}]}}
+    rate_limited = {"status_code": 429, "body": {"error": {"message": "rate limited"}}}
+    lines = [
+        json.dumps({"custom_id": "a#0", "response": success}),
+        "",
+        json.dumps({"custom_id": "b#0", "response": rate_limited}),
+        json.dumps({"custom_id": "c#0", "error": "expired"}),
+    ]
+    assert parse_result_lines(lines) == {"a#0": ("{}", None), "b#0": (None, "rate limited"), "c#0": (None, "expired")}
+
+
+def test_submit_and_collect_render_every_document(workdir):
+    provider = LocalBatchProvider(str(workdir / "batches"))
+    state_path = str(workdir / "batch_state.json")
+    rendered = {}
+
+    state = submit_batch(
+        provider, "test", documents(workdir, {"short": [PAGE], "long": [PAGE, PAGE, PAGE]}),
+        state_path=state_path, chunk_tokens=400,
+    )
+    assert state["status"] == "submitted"
+    assert len(state["documents"]["short"]["custom_ids"]) == 1
+    assert len(state["documents"]["long"]["custom_ids"]) > 1
+
+    def render(generate_type, data, output_file):
+        rendered[output_file] = data
+
+    assert collect_batch(provider, state, render, state_path=state_path)
+    saved = load_state(state_path)
+    assert saved["status"] == "collected"
+    assert all(document["status"] == "done" for document in saved["documents"].values())
+    assert sorted(rendered) == sorted(document["output_file"] for document in saved["documents"].values())
+    with open(workdir / "long.json", "r", encoding="utf-8") as f:
+        assert json.load(f) == rendered[str(workdir / "long.html")]
+
+
+def test_collect_resumes_only_the_documents_that_failed(workdir):
+    state_path = str(workdir / "batch_state.json")
+    broken = LocalBatchProvider(
+        str(workdir / "batches"),
+        respond=lambda body: "" if "Broken" in json.dumps(body) else canned_response(body),
+    )
+    state = submit_batch(
+        broken, "summary", documents(workdir, {"good": [PAGE], "bad": ["Broken page. " + PAGE]}), state_path=state_path,
+    )
+    rendered = []
+
+    def render(generate_type, data, output_file):
+        rendered.append(output_file)
+
+    assert not collect_batch(broken, state, render, state_path=state_path)
+    saved = load_state(state_path)
+    assert saved["documents"]["good"]["status"] == "done"
+    assert saved["documents"]["bad"]["status"] == "failed"
+    assert "empty response" in saved["documents"]["bad"]["error"]
+
+    # A second collect against fixed results only redoes the failed document.
+    fixed = LocalBatchProvider(str(workdir / "batches"))
+    os.remove(fixed._path(saved["batch_id"], "output"))
+    assert collect_batch(fixed, saved, render, state_path=state_path)
+    assert rendered == [str(workdir / "good.html"), str(workdir / "bad.html")]
+    assert "error" not in load_state(state_path)["documents"]["bad"]
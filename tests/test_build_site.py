@@ -0,0 +1,69 @@
+import json
+import os
+
+from build_site import build_site, detect_report_type
+
+SUMMARY = {"מבוא": "טקסט", "Terms": ["one", "two"]}
+EXAM = {"exam": {
+    "multiple_choice": [{"question": "Q", "options": ["a", "b"], "answer": "a"}],
+    "open_questions": [{"question": "O", "answer": "A"}],
+}}
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_report_types():
+    assert detect_report_type(EXAM) == "test"
+    assert detect_report_type(SUMMARY) == "summary"
+    assert detect_report_type(SUMMARY, "test") is None
+    assert detect_report_type(EXAM, "summary") is None
+    assert detect_report_type([{"seed": 1}]) is None
+    assert detect_report_type({"count": 3}) is None
+    assert detect_report_type({}) is None
+
+
+def test_only_reports_are_rendered(tmp_path):
+    input_dir = str(tmp_path / "output")
+    job_dir = os.path.join(input_dir, "jobs", "1")
+    write_json(os.path.join(job_dir, "lecture.json"), SUMMARY)
+    write_json(os.path.join(job_dir, "job.json"), {"job_id": "1", "status": "done", "generate_type": "summary"})
+    write_json(os.path.join(input_dir, "exam.json"), EXAM)
+    write_json(os.path.join(input_dir, "exam_keys.json"), [{"seed": 1, "multiple_choice": []}])
+    write_json(os.path.join(input_dir, "batch_state.json"), {"batch_id": "b", "documents": {}})
+
+    rendered, skipped, failed = build_site(input_dir, str(tmp_path / "site"), workers=1)
+    assert sorted(rendered) == ["exam.json", os.path.join("jobs", "1", "lecture.json")]
+    assert (skipped, failed) == ([], [])
+    index = (tmp_path / "site" / "index.html").read_text(encoding="utf-8")
+    assert "href='jobs/1/lecture.html'" in index
+    assert "href='exam.html'" in index
+
+
+def test_rebuild_renders_only_changed_reports(tmp_path):
+    input_dir, output_dir = str(tmp_path / "output"), str(tmp_path / "site")
+    write_json(os.path.join(input_dir, "a.json"), SUMMARY)
+    write_json(os.path.join(input_dir, "b.json"), EXAM)
+    build_site(input_dir, output_dir, workers=1)
+
+    write_json(os.path.join(input_dir, "a.json"), {**SUMMARY, "More": "text"})
+    os.remove(os.path.join(input_dir, "b.json"))
+    rendered, skipped, failed = build_site(input_dir, output_dir, workers=1)
+    assert (rendered, skipped, failed) == (["a.json"], [], [])
+    assert not os.path.exists(os.path.join(output_dir, "b.html"))
+
+
+def test_site_inside_the_input_directory_is_not_read_back(tmp_path):
+    input_dir = str(tmp_path / "output")
+    output_dir = os.path.join(input_dir, "site")
+    write_json(os.path.join(input_dir, "a.json"), SUMMARY)
+    build_site(input_dir, output_dir, workers=1)
+    write_json(os.path.join(input_dir, "b.json"), SUMMARY)
+
+    rendered, skipped, failed = build_site(input_dir, output_dir, workers=1)
+    assert (rendered, skipped, failed) == (["b.json"], ["a.json"], [])
+    with open(os.path.join(output_dir, "manifest.json"), encoding="utf-8") as f:
+        assert sorted(json.load(f)["reports"]) == ["a.json", "b.json"]
@@ -0,0 +1,34 @@
+from chunking import distribute_question_counts, merge_chunk_responses, question_chunks, spread_count
+
+
+def test_questions_are_split_evenly():
+    assert spread_count(10, 4) == [3, 3, 2, 2]
+
+
+def test_fewer_questions_than_chunks_go_to_spread_out_chunks():
+    assert spread_count(2, 8) == [0, 0, 1, 0, 0, 0, 1, 0]
+    assert spread_count(0, 3) == [0, 0, 0]
+
+
+def test_distribution_keeps_the_other_parameters():
+    params = {"num_of_american": 3, "num_of_open": 1, "language": "he"}
+    chunk_params = distribute_question_counts(params, 3)
+    assert [chunk["num_of_american"] for chunk in chunk_params] == [1, 1, 1]
+    assert [chunk["num_of_open"] for chunk in chunk_params] == [0, 1, 0]
+    assert all(chunk["language"] == "he" for chunk in chunk_params)
+
+
+def test_chunks_without_questions_are_not_requested():
+    chunks = ["one", "two", "three", "four"]
+    selected = question_chunks(chunks, {"num_of_american": 1, "num_of_open": 1})
+    assert [chunk for chunk, _ in selected] == ["three"]
+
+
+def test_merged_exam_takes_questions_from_every_chunk():
+    responses = [
+        {"exam": {"multiple_choice": [{"question": "a1"}, {"question": "a2"}], "open_questions": []}},
+        {"exam": {"multiple_choice": [{"question": "b1"}], "open_questions": [{"question": "b2"}]}},
+    ]
+    merged = merge_chunk_responses("test", responses, {"num_of_american": 2, "num_of_open": 1})
+    assert [question["question"] for question in merged["exam"]["multiple_choice"]] == ["a1", "b1"]
+    assert [question["question"] for question in merged["exam"]["open_questions"]] == ["b2"]
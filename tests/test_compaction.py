@@ -0,0 +1,47 @@
+from compaction import compact_pages
+
+
+def test_page_numbers_and_repeated_footers_are_removed():
+    topics = ["entropy", "decision trees", "naive bayes", "perceptrons", "support vector machines"]
+    pages = [f"Lecture 3\nToday we cover {topic}.\nCourse 101 - page {index}\n{index}\n"
+             for index, topic in enumerate(topics, 1)]
+    compacted, report = compact_pages(pages)
+    assert compacted == [f"Today we cover {topic}.\n" for topic in topics]
+    assert report["removed_lines"] == 15
+    assert report["tokens_after"] < report["tokens_before"]
+
+
+def test_numbers_in_the_body_of_a_page_are_kept():
+    page = "Results\nYear\nScore\n2019\n1\n2020\n2\nSee the table above.\nEnd\n"
+    compacted, _ = compact_pages([page])
+    assert compacted == [page]
+
+
+def test_near_duplicate_pages_are_dropped():
+    build_up = "Slide title\nFirst point of the slide with several words in it."
+    pages = [build_up, build_up + "\n", "Another slide\nWith entirely different text on it."]
+    compacted, report = compact_pages(pages)
+    assert len(compacted) == 2
+    assert report["dropped_pages"] == 1
+
+
+def test_slide_build_up_keeps_the_final_slide():
+    intro = ("Gradient descent updates the weights in the direction of the negative gradient, "
+             "scaled by the learning rate, until the loss stops improving on the validation set. "
+             "Smaller learning rates converge more slowly but are less likely to overshoot the minimum.")
+    build_up = [
+        f"Optimization\n{intro}\n- Batch gradient descent uses every example in each step.",
+        f"Optimization\n{intro}\n- Batch gradient descent uses every example in each step.\n- Stochastic: one example.",
+    ]
+    compacted, report = compact_pages(build_up + ["Summary\nThe next lecture covers regularization."])
+    assert compacted[0] == build_up[1] + "\n"
+    assert "Stochastic: one example." in compacted[0]
+    assert len(compacted) == 2
+    assert report["dropped_pages"] == 1
+
+
+def test_repeated_slide_with_less_text_is_dropped():
+    full = "Definitions\n" + " ".join(f"term{index} means meaning{index}." for index in range(40))
+    shorter = full.rsplit(" ", 2)[0]
+    compacted, _ = compact_pages([full, "Another slide\nWith entirely different text on it.", shorter])
+    assert compacted == [full + "\n", "Another slide\nWith entirely different text on it.\n"]
@@ -0,0 +1,62 @@
+import os
+import time
+
+from disk_cache import DiskCache, cache_key, sha256_file
+
+
+def test_keys_depend_on_every_part_and_its_boundaries():
+    assert cache_key("a", "bc") == cache_key("a", "bc")
+    assert cache_key("a", "bc") != cache_key("ab", "c")
+    assert cache_key({"x": 1, "y": 2}) == cache_key({"y": 2, "x": 1})
+
+
+def test_file_digest_follows_the_content(tmp_path):
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"same")
+    second.write_bytes(b"same")
+    assert sha256_file(str(first)) == sha256_file(str(second))
+    second.write_bytes(b"changed")
+    assert sha256_file(str(first)) != sha256_file(str(second))
+
+
+def test_values_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = cache_key("document")
+    assert cache.get(key) is None
+    cache.set(key, ["page one", "עמוד שני"])
+    assert cache.get(key) == ["page one", "עמוד שני"]
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    key = cache_key("document")
+    cache.set(key, "text")
+    path = cache._path(key)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"created": %f, "value": "text"}' % (time.time() - 120))
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    keys = [cache_key(index) for index in range(30)]
+    for index, key in enumerate(keys):
+        cache.set(key, "x" * 1000)
+        os.utime(cache._path(key), (index, index))
+        if index == 5:
+            # Using an entry keeps it.
+            cache.get(keys[0])
+    assert sum(size for _, size, _ in cache.entries()) <= 10_000
+    assert cache.get(keys[0]) == "x" * 1000
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[-1]) == "x" * 1000
+
+
+def test_overwriting_an_entry_does_not_grow_the_cache(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=5_000)
+    key = cache_key("document")
+    for _ in range(20):
+        cache.set(key, "x" * 1000)
+    assert cache.get(key) == "x" * 1000
@@ -0,0 +1,55 @@
+import json
+import os
+import random
+
+from generate_test_html_from_json import answer_key, generate_html, make_variant, parse_seeds, write_variants
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+EXAM = json.loads(read(os.path.join(GOLDEN_DIR, "exam.json")))
+
+
+def test_default_exam_matches_the_original_renderer():
+    # golden/exam.html was written by the baseline renderer after random.seed(7).
+    random.seed(7)
+    assert generate_html(EXAM) == read(os.path.join(GOLDEN_DIR, "exam.html"))
+
+
+def test_seeds_accept_ranges_and_lists():
+    assert parse_seeds("1-3,7") == [1, 2, 3, 7]
+
+
+def test_same_seed_gives_the_same_variant():
+    assert make_variant(EXAM, 5) == make_variant(EXAM, 5)
+    variants = [make_variant(EXAM, seed)["exam"] for seed in range(10)]
+    assert any(variant != variants[0] for variant in variants)
+
+
+def test_answer_key_follows_the_variant_order():
+    variant = make_variant(EXAM, 3)
+    key = answer_key(variant)
+    for entry, question in zip(key["multiple_choice"], variant["exam"]["multiple_choice"]):
+        original = EXAM["exam"]["multiple_choice"][entry["original_number"] - 1]
+        assert original["question"] == question["question"]
+        assert entry["answer"] == original["answer"]
+        assert question["options"]["אבגדה".index(entry["label"])] == original["answer"]
+
+
+def test_variants_have_numbered_questions_and_no_answers(tmp_path):
+    exam_files = write_variants(EXAM, [1, 2], str(tmp_path / "exam.html"))
+    assert [os.path.basename(path) for path in exam_files] == ["exam_v1.html", "exam_v2.html"]
+    page = read(exam_files[0])
+    assert "show-answer-btn\" onclick" not in page
+    assert "תשובה נכונה" not in page
+    for question in EXAM["exam"]["open_questions"]:
+        assert question["answer"] not in page
+    key = answer_key(make_variant(EXAM, 1))
+    assert f"<p>1. {make_variant(EXAM, 1)['exam']['multiple_choice'][0]['question']}</p>" in page
+    assert key["open_questions"][0]["answer"] in read(str(tmp_path / "exam_v1_key.html"))
+    assert json.loads(read(str(tmp_path / "exam_keys.json")))[1]["seed"] == 2
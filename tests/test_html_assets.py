@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from generate_summary_html_from_json import json_to_html
+from generate_test_html_from_json import generate_html
+from html_assets import PageAssets, PageTemplate, hashed_name
+
+EXAM = {"exam": {
+    "multiple_choice": [{"question": "Q", "options": ["a", "b"], "answer": "a"}],
+    "open_questions": [{"question": "O", "answer": "A"}],
+}}
+
+
+def test_template_fills_every_slot():
+    parts = []
+    PageTemplate("<title>{{title}}</title>{{body}}!").render(parts.append, title="T", body="B")
+    assert "".join(parts) == "<title>T</title>B!"
+
+
+def test_asset_names_change_with_their_content():
+    assert hashed_name("summary", b"body {}", ".css") == hashed_name("summary", b"body {}", ".css")
+    assert hashed_name("summary", b"body {}", ".css") != hashed_name("summary", b"p {}", ".css")
+
+
+def test_without_a_static_directory_styles_are_inlined():
+    head = PageAssets().head("test", "p {}\n", "<link google>", 8)
+    assert head["font_link"] == "<link google>"
+    assert head["styles"].startswith("<style>")
+
+
+def test_reports_share_one_stylesheet_per_generator(tmp_path):
+    static_dir = tmp_path / "site" / "static"
+    assets = PageAssets(static_dir=str(static_dir))
+    for name in ("a", "b"):
+        json_to_html({"Section": "text"}, str(tmp_path / "site" / f"{name}.html"), assets)
+    (tmp_path / "site" / "nested").mkdir()
+    exam_file = str(tmp_path / "site" / "nested" / "exam.html")
+    page = generate_html(EXAM, assets, exam_file)
+
+    stylesheets = sorted(os.listdir(static_dir))
+    assert len(stylesheets) == 2
+    assert all(name.endswith(".css") for name in stylesheets)
+    summary_page = (tmp_path / "site" / "a.html").read_text(encoding="utf-8")
+    summary_css = next(name for name in stylesheets if name.startswith("summary."))
+    assert f'<link rel="stylesheet" href="static/{summary_css}">' in summary_page
+    assert "<style>" not in summary_page
+    test_css = next(name for name in stylesheets if name.startswith("test."))
+    assert f'href="../static/{test_css}"' in page
+
+
+def test_self_hosted_font_is_copied_and_preloaded(tmp_path):
+    font_file = tmp_path / "Assistant.woff2"
+    font_file.write_bytes(b"font data")
+    static_dir = tmp_path / "static"
+    assets = PageAssets(static_dir=str(static_dir), font_file=str(font_file))
+    head = assets.head("summary", "p {}\n", "<link google>", 4, str(tmp_path / "report.html"))
+
+    font_name = next(name for name in os.listdir(static_dir) if name.endswith(".woff2"))
+    assert head["font_link"].startswith(f'<link rel="preload" href="static/{font_name}" as="font"')
+    css_name = next(name for name in os.listdir(static_dir) if name.endswith(".css"))
+    css = (static_dir / css_name).read_text(encoding="utf-8")
+    assert f"url('{font_name}') format('woff2')" in css
+
+
+def test_font_without_a_static_directory_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        PageAssets(font_file=str(tmp_path / "Assistant.woff2"))
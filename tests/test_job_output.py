@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+
+import pytest
+
+from job_output import JOB_MANIFEST, Job, input_stem, job_from_args, open_atomic, write_atomic
+
+
+def test_atomic_write_replaces_the_file_only_on_success(tmp_path):
+    path = tmp_path / "nested" / "out.json"
+    write_atomic(str(path), "old")
+
+    with pytest.raises(RuntimeError):
+        with open_atomic(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("interrupted")
+
+    assert path.read_text(encoding="utf-8") == "old"
+    assert os.listdir(path.parent) == ["out.json"]
+
+    with open_atomic(str(path), "wb") as f:
+        f.write(b"new")
+    assert path.read_bytes() == b"new"
+
+
+def test_job_claims_its_directory(tmp_path):
+    job = Job("run-1", str(tmp_path))
+    assert job.directory == str(tmp_path / "jobs" / "run-1")
+    assert os.path.isdir(job.directory)
+    with pytest.raises(FileExistsError):
+        Job("run-1", str(tmp_path))
+    assert Job(output_dir=str(tmp_path)).job_id != Job(output_dir=str(tmp_path)).job_id
+
+
+@pytest.mark.parametrize("job_id", ["../escape", "a/b", "with space", "name:1"])
+def test_invalid_job_ids_are_rejected(tmp_path, job_id):
+    with pytest.raises(ValueError):
+        Job(job_id, str(tmp_path))
+    assert not os.path.exists(tmp_path / "jobs")
+
+
+def test_finish_lists_the_outputs_but_not_temp_files(tmp_path):
+    job = Job("run-1", str(tmp_path))
+    write_atomic(job.path("notes", ".json"), "{}")
+    open(job.path("notes.json.123.abc", ".tmp"), "w").close()
+
+    manifest = job.finish(source="notes.pdf")
+
+    assert manifest["outputs"] == ["notes.json"]
+    assert manifest["status"] == "done"
+    assert manifest["source"] == "notes.pdf"
+    with open(job.path(JOB_MANIFEST), "r", encoding="utf-8") as f:
+        assert json.load(f) == manifest
+
+
+def test_taken_job_id_exits_with_an_error(tmp_path, capsys):
+    args = argparse.Namespace(job_id="run-1", output_dir=str(tmp_path))
+    assert job_from_args(args).job_id == "run-1"
+    with pytest.raises(SystemExit) as error:
+        job_from_args(args)
+    assert error.value.code == 1
+    assert "already exists" in capsys.readouterr().out
+
+
+def test_input_stem_drops_the_directory_and_extension():
+    assert input_stem(os.path.join("in", "lecture.1.pdf")) == "lecture.1"
+    assert input_stem("slides.pptx") == "slides"
@@ -0,0 +1,113 @@
+import json
+import os
+
+import pytest
+
+from question_bank import MAX_FAILED_TOP_UPS, QuestionBank, avoid_questions_prompt
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def exam(multiple_choice=(), open_questions=()):
+    return {"exam": {
+        "multiple_choice": [{"question": text, "options": ["a", "b"], "answer": "a"} for text in multiple_choice],
+        "open_questions": [{"question": text, "answer": "..."} for text in open_questions],
+    }}
+
+
+def test_near_duplicates_are_dropped(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    added, duplicates = bank.add("doc", exam(
+        ["What is the main purpose of cross validation in machine learning?",
+         "What is the main purpose of cross validation in machine learning ?",
+         "Which kernel does a linear support vector machine use by default?"],
+    ))
+    assert (added, duplicates) == (2, 1)
+    assert bank.counts("doc") == {"multiple_choice": 2, "open_questions": 0}
+    assert bank.counts("other") == {"multiple_choice": 0, "open_questions": 0}
+
+
+def test_missing_asks_only_for_what_the_bank_lacks(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    bank.add("doc", exam(["First question about entropy and information gain?"],
+                         ["Explain the bias variance trade-off in detail."]))
+    assert bank.missing("doc", {"num_of_american": 3, "num_of_open": 1}) == {"num_of_american": 2, "num_of_open": 0}
+
+
+def test_assembly_prefers_the_least_used_questions(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    questions = ["How does gradient descent choose its step?", "What does a confusion matrix show?"]
+    bank.add("doc", exam(questions))
+    first = bank.assemble("doc", {"num_of_american": 1, "num_of_open": 0})
+    second = bank.assemble("doc", {"num_of_american": 1, "num_of_open": 0})
+    used = [first["exam"]["multiple_choice"][0]["question"], second["exam"]["multiple_choice"][0]["question"]]
+    assert sorted(used) == sorted(questions)
+    assert second["exam"]["open_questions"] == []
+
+
+def test_failed_top_ups_are_counted_until_one_adds_questions(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    for _ in range(MAX_FAILED_TOP_UPS - 1):
+        bank.record_top_up("doc", 0)
+    assert not bank.top_ups_exhausted("doc")
+    bank.record_top_up("doc", 3)
+    bank.record_top_up("doc", 0)
+    assert not bank.top_ups_exhausted("doc")
+    for _ in range(MAX_FAILED_TOP_UPS - 1):
+        bank.record_top_up("doc", 0)
+    assert bank.top_ups_exhausted("doc")
+    assert not bank.top_ups_exhausted("other")
+
+
+def test_top_up_prompt_lists_the_stored_questions(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    bank.add("doc", exam(["What is entropy in a decision tree?"], ["Explain pruning."]))
+    known = bank.question_texts("doc")
+    assert sorted(known) == ["Explain pruning.", "What is entropy in a decision tree?"]
+    prompt = avoid_questions_prompt("Focus on chapter 2.", known)
+    assert prompt.startswith("Focus on chapter 2.\n")
+    assert "- What is entropy in a decision tree?" in prompt
+    assert avoid_questions_prompt(None, []) is None
+
+
+class RepeatingBackend:
+    """A model that answers every request with the same exam and records the prompts."""
+
+    name = "repeating"
+
+    def __init__(self):
+        self.contents = []
+
+    def response_cache_model(self, model):
+        return model
+
+    def complete(self, instructions, content, **kwargs):
+        self.contents.append(content)
+        return json.dumps(exam(
+            ["Which impurity measure does CART use by default?", "What does the learning rate control?"],
+            ["Explain the kernel trick."],
+        ))
+
+
+def test_model_is_not_asked_again_once_top_ups_only_return_duplicates(tmp_path, monkeypatch):
+    pytest.importorskip("fitz")
+    pytest.importorskip("pptx")
+    from pipeline import Pipeline
+    from response_cache import ResponseCache
+
+    monkeypatch.chdir(REPO_DIR)
+    source = tmp_path / "lecture.pdf"
+    source.write_bytes(b"lecture")
+    backend = RepeatingBackend()
+    pipeline = Pipeline(
+        backend=backend, compaction=False, question_bank=QuestionBank(str(tmp_path / "bank.sqlite3")),
+        response_cache=ResponseCache("auto", directory=str(tmp_path / "responses")),
+    )
+    params = {"num_of_american": 4, "num_of_open": 1}
+    for _ in range(5):
+        exam_data = pipeline.generate("test", "Lecture text", params=params, source=str(source))
+
+    assert len(exam_data["exam"]["multiple_choice"]) == 2
+    assert len(backend.contents) == 1 + MAX_FAILED_TOP_UPS
+    assert "Which impurity measure does CART use by default?" not in backend.contents[0]
+    assert "- Which impurity measure does CART use by default?" in backend.contents[1]
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from response_cache import ResponseCache, ResponseCacheMiss
+
+KEY = ResponseCache.key("gpt-4o-mini", "instructions", "prompt", {"exam": {}}, "text")
+
+
+class Model:
+    """Returns the given responses in turn and counts the calls."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_key_covers_the_response_format_and_the_completion_budget():
+    keys = {
+        KEY,
+        ResponseCache.key("gpt-4o-mini", "instructions", "prompt", {"exam": {}}, "text",
+                          response_format={"type": "json_object"}),
+        ResponseCache.key("gpt-4o-mini", "instructions", "prompt", {"exam": {}}, "text", max_completion_tokens=4000),
+        ResponseCache.key("gpt-4o", "instructions", "prompt", {"exam": {}}, "text"),
+    }
+    assert len(keys) == 4
+
+
+def test_auto_mode_calls_the_model_once(tmp_path):
+    cache = ResponseCache("auto", directory=str(tmp_path))
+    model = Model('{"a": 1}')
+    assert cache.fetch(KEY, model, parse=json.loads) == {"a": 1}
+    assert cache.fetch(KEY, model, parse=json.loads) == {"a": 1}
+    assert model.calls == 1
+
+
+def test_unparseable_responses_are_not_stored(tmp_path):
+    cache = ResponseCache("auto", directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.fetch(KEY, Model("not json"), parse=json.loads)
+    model = Model('{"a": 1}')
+    assert cache.fetch(KEY, model, parse=json.loads) == {"a": 1}
+    assert model.calls == 1
+
+
+def test_record_mode_overwrites_and_replay_mode_never_calls(tmp_path):
+    ResponseCache("record", directory=str(tmp_path)).fetch(KEY, Model('{"a": 1}'), parse=json.loads)
+    ResponseCache("record", directory=str(tmp_path)).fetch(KEY, Model('{"a": 2}'), parse=json.loads)
+    replay = ResponseCache("replay", directory=str(tmp_path))
+    model = Model()
+    assert replay.fetch(KEY, model, parse=json.loads) == {"a": 2}
+    with pytest.raises(ResponseCacheMiss):
+        replay.fetch(ResponseCache.key("other", "", "", {}, ""), model)
+    assert model.calls == 0
+
+
+def test_off_mode_stores_nothing(tmp_path):
+    ResponseCache("off", directory=str(tmp_path)).fetch(KEY, Model('{"a": 1}'))
+    with pytest.raises(ResponseCacheMiss):
+        ResponseCache("replay", directory=str(tmp_path)).fetch(KEY, Model())
+
+
+def test_invalid_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ResponseCache("sometimes", directory=str(tmp_path))
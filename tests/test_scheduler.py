@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import scheduler as scheduler_module
+from fake_llm_server import FakeLLMServer
+from scheduler import RequestScheduler, follow_up_request
+
+
+@pytest.fixture
+def generate_json():
+    pytest.importorskip("fitz")
+    pytest.importorskip("pptx")
+    import generate_json
+    return generate_json
+
+
+@pytest.fixture
+def server():
+    """Starts a fake model server on a free port; tests set its error rate and Retry-After."""
+    server = FakeLLMServer(("127.0.0.1", 0), latency=0.01, tokens_per_second=0, seed=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def backend_for(generate_json, server, path=""):
+    return generate_json.HTTPBackend(f"http://127.0.0.1:{server.server_port}{path}")
+
+
+class Flaky:
+    """Fails with a transient error the given number of times, then returns "ok"."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise TimeoutError("simulated timeout")
+        return "ok"
+
+
+def test_transient_errors_are_retried_up_to_the_limit(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "retry_delay", lambda attempt, error=None: 0)
+    scheduler = RequestScheduler(max_retries=2, is_transient=lambda error: isinstance(error, TimeoutError))
+    assert scheduler.call(Flaky(2)) == "ok"
+    with pytest.raises(TimeoutError):
+        scheduler.call(Flaky(3))
+    with pytest.raises(ValueError):
+        scheduler.call(lambda: int("not a number"))
+    assert scheduler.metrics()["retries"] == 4
+    assert scheduler.metrics()["failures"] == 2
+
+
+def test_follow_up_requests_count_against_the_call_rate_limit():
+    scheduler = RequestScheduler(rpm=600)
+
+    def call_with_follow_ups():
+        for _ in range(4):
+            follow_up_request()
+
+    scheduler.call(call_with_follow_ups)
+    assert scheduler.requests.available == pytest.approx(600 - 5, abs=1)
+    # Outside a scheduled call there is no limit to count against.
+    follow_up_request()
+    assert scheduler.requests.available == pytest.approx(600 - 5, abs=1)
+
+
+def test_transient_errors_are_retried_until_every_request_completes(generate_json, server):
+    server.error_rate = 0.3
+    server.retry_after = 0
+    backend = backend_for(generate_json, server)
+    scheduler = RequestScheduler(max_concurrency=4, max_retries=20, is_transient=generate_json.is_transient_error)
+
+    def complete(index):
+        return scheduler.call(lambda: backend.complete("Summarize.", f"Page {index}", stream=index % 2 == 0))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(complete, range(40)))
+
+    assert all(isinstance(json.loads(response), dict) for response in responses)
+    stats = server.snapshot()
+    assert stats["completed"] == 40
+    assert stats["errors"] > 0
+    assert stats["max_in_flight"] <= 4
+    metrics = scheduler.metrics()
+    assert metrics["retries"] == stats["errors"]
+    assert metrics["failures"] == 0
+
+
+def test_retry_after_is_honoured_and_retries_are_bounded(generate_json, server):
+    server.error_rate = 1.0
+    server.error_statuses = (429,)
+    server.retry_after = 0.3
+    backend = backend_for(generate_json, server)
+    scheduler = RequestScheduler(max_retries=2, is_transient=generate_json.is_transient_error)
+
+    start = time.monotonic()
+    with pytest.raises(generate_json.HTTPBackendError) as error:
+        scheduler.call(lambda: backend.complete("Summarize.", "Page 1", stream=False))
+
+    assert error.value.status_code == 429
+    assert time.monotonic() - start >= 2 * 0.3
+    assert server.snapshot()["requests"] == 3
+    assert scheduler.metrics()["failures"] == 1
+
+
+def test_client_errors_are_not_retried(generate_json, server):
+    backend = backend_for(generate_json, server, "/missing")
+    scheduler = RequestScheduler(max_retries=5, is_transient=generate_json.is_transient_error)
+
+    with pytest.raises(generate_json.HTTPBackendError) as error:
+        scheduler.call(lambda: backend.complete("Summarize.", "Page 1", stream=False))
+
+    assert error.value.status_code == 404
+    assert scheduler.metrics()["retries"] == 0
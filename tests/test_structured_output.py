@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from structured_output import ResponseParseError, parse_json_response, schema_from_structure
+
+STRUCTURE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_json_structure.json")
+
+
+@pytest.fixture
+def exam_schema():
+    with open(STRUCTURE_FILE, encoding="utf-8") as f:
+        return schema_from_structure(json.load(f))
+
+
+def test_code_fences_and_trailing_commas_are_tolerated():
+    assert parse_json_response('```json\n{"a": [1, 2,],}\n```') == {"a": [1, 2]}
+
+
+def test_truncated_exam_keeps_complete_questions(exam_schema):
+    # Cut off in the second question, before open_questions was reached.
+    text = (
+        '{"exam": {"multiple_choice": ['
+        '{"question": "Q1", "options": ["a", "b"], "answer": "a"}, '
+        '{"question": "Q2", "options": ["a"'
+    )
+    assert parse_json_response(text, exam_schema) == {
+        "exam": {
+            "multiple_choice": [{"question": "Q1", "options": ["a", "b"], "answer": "a"}],
+            "open_questions": [],
+        }
+    }
+
+
+def test_missing_required_value_fails(exam_schema):
+    with pytest.raises(ResponseParseError):
+        parse_json_response('{"other": 1}', exam_schema)
+
+
+def test_parse_error_is_repaired_around_the_error():
+    excerpts = []
+
+    def fix_excerpt(excerpt, message):
+        excerpts.append(excerpt)
+        return excerpt.replace("'", '"')
+
+    assert parse_json_response("{'a': 1}", fix_excerpt=fix_excerpt) == {"a": 1}
+    assert excerpts == ["{'a': 1}"]
+
+
+def test_unrepairable_response_fails():
+    with pytest.raises(ResponseParseError):
+        parse_json_response("not json", fix_excerpt=lambda excerpt, message: excerpt)
@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from generate_summary_html_from_json import format_value, json_to_html, write_html
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_default_page_matches_the_original_renderer(tmp_path):
+    # golden/summary.html was written by the renderer before it streamed its output.
+    data = json.loads(read(os.path.join(GOLDEN_DIR, "summary.json")))
+    output_file = str(tmp_path / "summary.html")
+    json_to_html(data, output_file)
+    assert read(output_file) == read(os.path.join(GOLDEN_DIR, "summary.html"))
+
+
+def test_page_is_written_in_fragments():
+    writes = []
+    write_html(writes.append, {f"Section {index}": "text" for index in range(100)})
+    assert len(writes) > 100
+    assert "".join(writes).count("<section id='Section_") == 100
+
+
+def test_values_are_rendered_by_kind():
+    assert format_value("שלום") == "<p dir='rtl'>שלום</p>"
+    assert format_value("Intro 1. first 2. second") == (
+        "<p dir='ltr'>Intro</p><ul class='numbered-list'><li dir='ltr'>1. first</li><li dir='ltr'>2. second</li></ul>"
+    )
+    assert format_value('["a", "b"]') == "<ul><li><p dir='ltr'>a</p></li><li><p dir='ltr'>b</p></li></ul>"
+    assert format_value("def f():\n    pass").startswith('<pre><code class="code-block">')
+
+
+def test_non_dict_input_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        json_to_html(["not", "a", "summary"], str(tmp_path / "summary.html"))
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from token_budget import (
+    DEFAULT_ROUTING_RULES, TokenBudgetExceeded, estimate_tokens, load_routing_rules, max_prompt_tokens, plan_request,
+)
+
+RULES = {
+    "tiers": [
+        {"model": "small", "context_window": 10000, "max_completion_tokens": 2000},
+        {"model": "large", "context_window": 100000, "max_completion_tokens": 8000},
+    ],
+    "completion_budget": {
+        "summary": {"min_tokens": 1000, "input_ratio": 0.5},
+        "test": {"base_tokens": 500, "tokens_per_question": 100},
+    },
+}
+
+
+def test_estimate_grows_with_the_text():
+    assert estimate_tokens("") == 0
+    assert 0 < estimate_tokens("short text") < estimate_tokens("short text " * 100)
+
+
+def test_requests_go_to_the_first_model_that_fits():
+    assert plan_request("summary", 1000, {}, RULES) == {
+        "model": "small", "max_completion_tokens": 1000, "prompt_tokens": 1000,
+    }
+    # 9000 prompt tokens leave the small model no room for the 4500-token summary budget.
+    assert plan_request("summary", 9000, {}, RULES)["model"] == "large"
+    assert plan_request("summary", 9000, {}, RULES)["max_completion_tokens"] == 4500
+
+
+def test_exam_budget_follows_the_number_of_questions():
+    plan = plan_request("test", 1000, {"num_of_american": 8, "num_of_open": 3}, RULES)
+    assert plan["max_completion_tokens"] == 500 + 100 * 11
+
+
+def test_prompt_that_fits_no_model_is_rejected():
+    assert max_prompt_tokens(RULES) == 92000
+    with pytest.raises(TokenBudgetExceeded):
+        plan_request("summary", 95000, {}, RULES)
+
+
+def test_rules_file_overrides_only_what_it_sets(tmp_path):
+    path = tmp_path / "routing.json"
+    path.write_text(json.dumps({"completion_budget": {"test": {"tokens_per_question": 500}}}), encoding="utf-8")
+    rules = load_routing_rules(str(path))
+    assert rules["tiers"] == DEFAULT_ROUTING_RULES["tiers"]
+    assert rules["completion_budget"]["summary"] == DEFAULT_ROUTING_RULES["completion_budget"]["summary"]
+    assert rules["completion_budget"]["test"] == {"base_tokens": 1500, "tokens_per_question": 500}
+    assert plan_request("summary", 1000, {}, rules)["model"] == "gpt-4o-mini"
+    assert DEFAULT_ROUTING_RULES["completion_budget"]["test"]["tokens_per_question"] == 350
+
+
+def test_tiers_in_a_rules_file_replace_the_defaults(tmp_path):
+    path = tmp_path / "routing.json"
+    path.write_text(json.dumps({"tiers": RULES["tiers"][:1]}), encoding="utf-8")
+    assert [tier["model"] for tier in load_routing_rules(str(path))["tiers"]] == ["small"]
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from watch_folder import FileQueue, FolderScanner, InotifyWatcher, try_watch
+
+
+def test_queue_survives_a_restart(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    queue = FileQueue(path)
+    assert queue.add("a.pdf", "digest-1")
+    assert not queue.add("a.pdf", "digest-1")
+    assert queue.add("b.pdf", "digest-1")
+    file_id, claimed = queue.claim()
+    assert claimed == "a.pdf"
+
+    # A new watcher queues the file that was in progress again, ahead of the others.
+    queue = FileQueue(path)
+    assert queue.recover() == 1
+    assert queue.claim() == (file_id, "a.pdf")
+    queue.finish(file_id, "done", job_dir="output/jobs/1")
+    assert queue.counts() == {"done": 1, "queued": 1}
+
+
+def test_changed_content_is_queued_again(tmp_path):
+    queue = FileQueue(str(tmp_path / "queue.sqlite3"))
+    queue.add("a.pdf", "digest-1")
+    queue.finish(queue.claim()[0], "failed", error="boom")
+    assert not queue.add("a.pdf", "digest-1")
+    assert queue.add("a.pdf", "digest-2")
+    assert queue.claim()[1] == "a.pdf"
+    assert queue.claim() is None
+
+
+def test_files_are_reported_once_they_settle(tmp_path):
+    path = str(tmp_path / "lecture.pdf")
+    with open(path, "wb") as f:
+        f.write(b"partial")
+    scanner = FolderScanner(lambda: [path], debounce=5)
+    assert scanner.scan(now=100) == []
+    assert scanner.timeout(2, now=104) == 1
+    assert scanner.scan(now=105) == [path]
+    assert scanner.scan(now=200) == []
+
+    with open(path, "ab") as f:
+        f.write(b" and the rest")
+    os.utime(path, ns=(0, 1))
+    assert scanner.scan(now=201) == []
+    assert scanner.scan(now=206) == [path]
+
+
+class LimitedWatcher:
+    """Fails like inotify_add_watch once max_user_watches is reached."""
+
+    def __init__(self):
+        self.full = True
+
+    def watch(self, directory):
+        if self.full:
+            raise OSError(28, f"Could not watch {directory}")
+
+
+def test_unwatchable_directories_are_reported_once(capsys):
+    watcher = LimitedWatcher()
+    unwatched = set()
+    assert not try_watch(watcher, "in/sub", unwatched)
+    assert not try_watch(watcher, "in/sub", unwatched)
+    assert capsys.readouterr().out.count("Could not watch in/sub") == 1
+    assert unwatched == {"in/sub"}
+
+    watcher.full = False
+    assert try_watch(watcher, "in/sub", unwatched)
+    assert unwatched == set()
+
+
+def test_removed_directory_does_not_stop_inotify(tmp_path):
+    try:
+        watcher = InotifyWatcher()
+    except (OSError, AttributeError):
+        pytest.skip("inotify is not available")
+    try:
+        unwatched = set()
+        assert not try_watch(watcher, str(tmp_path / "removed"), unwatched)
+        assert try_watch(watcher, str(tmp_path), unwatched)
+        assert unwatched == {str(tmp_path / "removed")}
+    finally:
+        watcher.close()